@@ -0,0 +1,103 @@
+"""
+Push notifications sent by the ExpoPushSender against the loop it replaces
+(a requests.post per token, with a new connection each time), both to the
+Expo stand-in of the tests (tests/expo_stand_in.py) answering each request
+after --latency seconds: the messages per second, and the requests and
+connections that each one needed.
+
+The loop sends only the first --loop-tokens of the --tokens tokens (it
+takes a request per token), the sender sends all of them with each one of
+the --concurrency values.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_push.py --tokens 1000 --latency 0.1
+"""
+import argparse
+import time
+
+import requests
+
+from control.utils.push import EXPO_HEADERS, ExpoPushSender
+from tests.expo_stand_in import ExpoStandIn
+
+
+def messages_of(tokens):
+    """
+    Returns the messages of a notification to the tokens
+    """
+    return [
+        {"to": token, "title": "title", "body": "body", "sound": "default"}
+        for token in tokens
+    ]
+
+
+def send_one_by_one(url, messages):
+    """
+    Sends the messages as the old send_push_notification did
+    """
+    for message in messages:
+        try:
+            requests.post(url, headers=EXPO_HEADERS, json=message, timeout=5)
+        except requests.exceptions.RequestException:
+            pass
+
+
+def measure(latency, send, messages):
+    """
+    Returns the messages per second, and the requests and connections
+    that the stand-in got, of sending the messages with send(url, messages)
+    """
+    server = ExpoStandIn(latency=latency)
+    url = server.start()
+    start = time.perf_counter()
+    send(url, messages)
+    seconds = time.perf_counter() - start
+    server.stop()
+    return len(messages) / seconds, len(server.batches), server.connections
+
+
+def send_with_sender(concurrency):
+    """
+    Returns send(url, messages) with an ExpoPushSender of that concurrency
+    """
+
+    def send(url, messages):
+        sender = ExpoPushSender(url, concurrency=concurrency)
+        tickets = sender.send(messages)
+        sender.close()
+        assert all(ticket["status"] == "ok" for ticket in tickets)
+
+    return send
+
+
+def main():
+    """
+    Prints the messages per second of the loop and of the sender
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--tokens", type=int, default=1000)
+    parser.add_argument("--loop-tokens", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    messages = messages_of([f"ExponentPushToken[{n}]" for n in range(args.tokens)])
+    rate, sent, connections = measure(
+        args.latency, send_one_by_one, messages[: args.loop_tokens]
+    )
+    print(
+        f"one by one:      {rate:8.1f} messages/s ({sent} requests, {connections}"
+        f" connections), {args.tokens / rate:.1f} s for {args.tokens} tokens"
+    )
+    for concurrency in args.concurrency:
+        rate, sent, connections = measure(
+            args.latency, send_with_sender(concurrency), messages
+        )
+        print(
+            f"concurrency {concurrency:>3}: {rate:8.1f} messages/s ({sent} requests,"
+            f" {connections} connections), {args.tokens / rate:.2f} s"
+        )
+
+
+if __name__ == "__main__":
+    main()
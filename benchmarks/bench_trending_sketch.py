@@ -0,0 +1,154 @@
+"""
+Accuracy and memory of the ApproximateTrendingCounters against the exact
+TrendingCounters on a zipf-distributed workload: --uses uses of --hashtags
+possible hashtags (the nth used about 1 / n ** --skew times as much as the
+first one) spread over the last 30 days.
+
+For the windows of 1, 7 and 30 days it prints the recall of the top 10 and
+top 100 (how many of the real ones the approximate top has), the mean
+relative error of the uses estimated for the real top 100 and the median
+latency of a top 10; and the memory of both (tracemalloc). It also splits
+the uses between two counters (two workers) and measures the top of their
+merge.
+
+Usage:
+    PYTHONPATH=. python benchmarks/bench_trending_sketch.py --uses 2000000
+"""
+import argparse
+import datetime
+import itertools
+import random
+import statistics
+import time
+import tracemalloc
+
+from repository.trending import TrendingCounters, ApproximateTrendingCounters
+
+WINDOWS = [1, 7, 30]
+
+
+def generate_uses(uses, hashtags, skew, now, rng):
+    """
+    Returns uses (hashtag, moment) of the last 30 days
+    """
+    weights = itertools.accumulate(1 / (rank + 1) ** skew for rank in range(hashtags))
+    ranks = rng.choices(range(hashtags), cum_weights=list(weights), k=uses)
+    return [
+        (
+            f"#hashtag{rank}",
+            now - datetime.timedelta(seconds=rng.uniform(0, 30 * 86400)),
+        )
+        for rank in ranks
+    ]
+
+
+def build(counters, uses, now):
+    """
+    Adds the uses to the counters and reads every window once, returns the
+    seconds it took and the bytes allocated (that are still in use)
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    for hashtag, moment in uses:
+        counters.add(hashtag, moment, now=now)
+    for days in WINDOWS:
+        counters.top(days, 0, 1, now=now)
+    seconds = time.perf_counter() - start
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return seconds, allocated
+
+
+def compare(exact, approximate, days, now):
+    """
+    Returns the recall of the top 10 and top 100 and the mean relative error
+    of the uses of the real top 100
+    """
+    real = exact.top(days, 0, 100, now=now)
+    estimated = approximate.top(days, 0, 100, now=now)
+    recalls = [
+        len({row[0] for row in real[:size]} & {row[0] for row in estimated[:size]})
+        / size
+        for size in (10, 100)
+    ]
+    estimations = {
+        hashtag: uses for hashtag, uses, _ in approximate.top(days, 0, 10000, now=now)
+    }
+    error = statistics.mean(
+        abs(estimations.get(hashtag, 0) - uses) / uses for hashtag, uses, _ in real
+    )
+    return recalls[0], recalls[1], error
+
+
+def top_us(counters, days, now, samples=20):
+    """
+    Returns the median microseconds of a top 10
+    """
+    times = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        counters.top(days, 0, 10, now=now)
+        times.append((time.perf_counter() - start) * 1000000)
+    return statistics.median(times)
+
+
+def print_accuracy(exact, sketched, merged, now):
+    """
+    Prints the accuracy and the latency of the top of each window
+    """
+    print(
+        f"{'window':<20} {'recall@10':>10} {'recall@100':>11} {'error':>8}"
+        f" {'exact us':>10} {'approx us':>10}"
+    )
+    for days in WINDOWS:
+        for label, counters in ((f"{days} days", sketched), ("  merged", merged)):
+            recall_10, recall_100, error = compare(exact, counters, days, now)
+            print(
+                f"{label:<20} {recall_10:>10.2f} {recall_100:>11.2f}"
+                f" {error:>8.2%} {top_us(exact, days, now):>10.1f}"
+                f" {top_us(counters, days, now):>10.1f}"
+            )
+
+
+def main():
+    """
+    Prints the accuracy, the memory and the latencies
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uses", type=int, default=2000000)
+    parser.add_argument("--hashtags", type=int, default=1000000)
+    parser.add_argument("--skew", type=float, default=1.1)
+    parser.add_argument("--width", type=int, default=2048)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--heavy-hitters", type=int, default=256)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    now = datetime.datetime.utcnow()
+    uses = generate_uses(args.uses, args.hashtags, args.skew, now, rng)
+    print(f"{len(uses)} uses of {len({hashtag for hashtag, _ in uses})} hashtags")
+
+    def approximate():
+        return ApproximateTrendingCounters(
+            30, 24, args.width, args.depth, args.heavy_hitters, now=now
+        )
+
+    exact = TrendingCounters(30, 24, now=now)
+    seconds, allocated = build(exact, uses, now)
+    print(f"exact:       build {seconds:6.1f} s, {allocated / 2**20:7.1f} MiB")
+    sketched = approximate()
+    seconds, allocated = build(sketched, uses, now)
+    print(f"approximate: build {seconds:6.1f} s, {allocated / 2**20:7.1f} MiB")
+
+    workers = [approximate(), approximate()]
+    for number, (hashtag, moment) in enumerate(uses):
+        workers[number % 2].add(hashtag, moment, now=now)
+    start = time.perf_counter()
+    workers[0].merge(workers[1])
+    print(f"merge of two workers: {time.perf_counter() - start:.1f} s")
+
+    print_accuracy(exact, sketched, workers[0], now)
+
+
+if __name__ == "__main__":
+    main()
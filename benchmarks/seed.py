@@ -0,0 +1,171 @@
+# pylint: disable=R0801
+"""
+Seeds a database with a synthetic dataset for the benchmarks.
+
+Every benchmark should run against a scratch database (never production):
+the seeded users have emails that start with BENCH_PREFIX so that they
+(and everything they made) can be removed with cleanup().
+"""
+import datetime
+import random
+
+from sqlalchemy import delete, insert, select
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.tables.posts import Post, Content, Like, Hashtag, Favorite, Mention
+from repository.tables.users import User, Following, Interests
+from repository.jobs.reconcile_counters import (
+    reconcile_counters,
+    reconcile_user_counters,
+)
+from repository.jobs.backfill_daily_stats import backfill_daily_stats
+
+BENCH_PREFIX = "bench_"
+LOCATIONS = ["Buenos Aires", "Cordoba", "Rosario", "Mendoza", "La Plata"]
+WORDS = (
+    "hola mundo futbol river boca asado mate taller fiuba examen parcial final "
+    "codigo python fastapi postgres indice consulta rapido lento feed trending "
+    "gol partido cancha noticia lluvia sol verano invierno facultad trabajo"
+).split()
+
+
+# pylint: disable=R0913, R0914
+def seed(
+    session,
+    users=200,
+    posts_per_user=25,
+    hashtags=500,
+    follows_per_user=20,
+    likes_per_post=3,
+    seed_value=42,
+):
+    """
+    Seeds the database and returns the ids of the seeded users.
+
+    Posts are spread over the last 90 days, every post has 1 to 3 hashtags
+    taken from a zipf-like vocabulary and some of them are reposted.
+    """
+    rng = random.Random(seed_value)
+    now = datetime.datetime.utcnow()
+    vocabulary = [f"#tag{number}" for number in range(hashtags)]
+    weights = [1 / (rank + 1) for rank in range(hashtags)]
+
+    user_ids = session.scalars(
+        insert(User).returning(User.id),
+        [
+            {
+                "username": f"{BENCH_PREFIX}{number}",
+                "email": f"{BENCH_PREFIX}{number}@bench.com",
+                "name": "bench",
+                "surname": "bench",
+                "password": "bench",
+                "date_of_birth": datetime.datetime(1990, 1, 1),
+                "bio": "",
+                "avatar": "",
+                "location": rng.choice(LOCATIONS),
+                "blocked": False,
+                "is_public": rng.random() > 0.1,
+            }
+            for number in range(users)
+        ],
+    ).all()
+
+    follows = {
+        (user_id, followed)
+        for user_id in user_ids
+        for followed in rng.sample(user_ids, min(follows_per_user, len(user_ids)))
+        if followed != user_id
+    }
+    session.execute(
+        insert(Following),
+        [{"user_id": user, "following_id": followed} for user, followed in follows],
+    )
+    session.execute(
+        insert(Interests),
+        [
+            {"user_id": user_id, "interest": interest}
+            for user_id in user_ids
+            for interest in set(rng.choices(vocabulary, weights, k=3))
+        ],
+    )
+
+    amount_posts = users * posts_per_user
+    content_ids = session.scalars(
+        insert(Content).returning(Content.content_id),
+        [
+            {
+                "text": f"bench post number {number} " + " ".join(rng.sample(WORDS, 8)),
+                "image": "",
+            }
+            for number in range(amount_posts)
+        ],
+    ).all()
+
+    creators = [rng.choice(user_ids) for _ in content_ids]
+    dates = [
+        now - datetime.timedelta(seconds=rng.randint(0, 90 * 24 * 3600))
+        for _ in content_ids
+    ]
+    posts = [
+        {
+            "user_poster_id": creator,
+            "user_creator_id": creator,
+            "content_id": content_id,
+            "created_at": created_at,
+        }
+        for content_id, creator, created_at in zip(content_ids, creators, dates)
+    ]
+    for content_id, creator, created_at in zip(content_ids, creators, dates):
+        reposter = rng.choice(user_ids)
+        if reposter != creator and rng.random() < 0.2:
+            posts.append(
+                {
+                    "user_poster_id": reposter,
+                    "user_creator_id": creator,
+                    "content_id": content_id,
+                    "created_at": created_at + datetime.timedelta(hours=1),
+                }
+            )
+    session.execute(insert(Post), posts)
+
+    session.execute(
+        insert(Hashtag),
+        [
+            {"content_id": content_id, "hashtag": hashtag, "created_at": created_at}
+            for content_id, created_at in zip(content_ids, dates)
+            for hashtag in set(rng.choices(vocabulary, weights, k=rng.randint(1, 3)))
+        ],
+    )
+    session.execute(
+        insert(Like),
+        [
+            {"content_id": content_id, "user_id": user_id, "created_at": created_at}
+            for content_id, created_at in zip(content_ids, dates)
+            for user_id in rng.sample(user_ids, min(likes_per_post, len(user_ids)))
+        ],
+    )
+    session.commit()
+    # the counters and the daily statistics are not set by the bulk inserts
+    reconcile_counters()
+    reconcile_user_counters()
+    backfill_daily_stats()
+    return user_ids
+
+
+def cleanup(session):
+    """
+    Deletes everything that seed() created
+    """
+    bench_users = select(User.id).filter(User.email.startswith(BENCH_PREFIX))
+    bench_contents = select(Post.content_id).filter(
+        Post.user_creator_id.in_(bench_users)
+    )
+    for table in (Like, Favorite, Hashtag, Mention):
+        session.execute(delete(table).where(table.content_id.in_(bench_contents)))
+    content_ids = session.scalars(bench_contents.distinct()).all()
+    session.execute(delete(Post).where(Post.content_id.in_(content_ids)))
+    session.execute(delete(Content).where(Content.content_id.in_(content_ids)))
+    session.execute(delete(Following).where(Following.user_id.in_(bench_users)))
+    session.execute(delete(Interests).where(Interests.user_id.in_(bench_users)))
+    session.execute(delete(User).where(User.id.in_(bench_users)))
+    session.commit()
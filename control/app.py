@@ -1,8 +1,11 @@
 """
 Set up for the app class
 """
+import threading
+from contextlib import asynccontextmanager
+from os import getenv
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from control.controller_like import router as router_like
 from control.controller_post import router as router_post
 from control.controller_repost import router as router_repost
@@ -11,6 +14,15 @@ from control.controller_favorite import router as router_favorites
 from control.controller_recommended_user import router as router_recommended_users
 from control.controller_trending_topic import router as router_trending_topic
 from control.controller_admin import router as router_admin
+from control.controller_post_async import router as router_post_async
+from control.controller_autocomplete import router as router_autocomplete
+from repository.queries.common_setup import request_session_scope
+from repository.queries.queries_autocomplete import autocomplete_indexes
+from repository.queries.queries_trending_topic import (
+    trending_counters,
+    location_counters,
+)
+from repository.jobs.trending_snapshots import start_trending_snapshots
 
 tags_metadata = [
     {"name": "Likes", "description": "Endpoints Likes"},
@@ -21,11 +33,29 @@ tags_metadata = [
     {"name": "Recommended users", "description": "Recommended users"},
     {"name": "Trending topics", "description": "Endpoints Trending topics"},
     {"name": "Admin", "description": "Endpoints for admins"},
+    {"name": "Autocomplete", "description": "Autocomplete of hashtags and usernames"},
 ]
 
 origins = ["*"]
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    """
+    Builds the autocomplete indexes and the trending counters (global and
+    of the hot locations) in memory before the first request, and runs the
+    trending snapshots job while the app is up
+    """
+    autocomplete_indexes.get()
+    trending_counters.get()
+    location_counters.get()
+    stop = threading.Event()
+    start_trending_snapshots(stop)
+    yield
+    stop.set()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -35,6 +65,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def db_session_per_request(request: Request, call_next):
+    """
+    Each request works with its own database session, which is closed
+    (and its connection given back to the pool) once the request is done.
+    """
+    with request_session_scope():
+        return await call_next(request)
+
+
+# The async read endpoints have the same routes as the sync ones, so when they
+# are enabled they must be included first to take precedence.
+if getenv("DB_ASYNC_READS", "false").lower() == "true":
+    app.include_router(router_post_async, prefix="")
+
 app.include_router(router_like, prefix="")
 app.include_router(router_post, prefix="")
 app.include_router(router_repost, prefix="")
@@ -43,3 +89,4 @@ app.include_router(router_favorites, prefix="")
 app.include_router(router_recommended_users, prefix="")
 app.include_router(router_trending_topic, prefix="")
 app.include_router(router_admin, prefix="")
+app.include_router(router_autocomplete, prefix="")
@@ -3,14 +3,16 @@ Clases for the response bodies of the posts and likes controller.
 There are also functions to generate the correct classes from the db objects
 and from the json objects.
 """
+import datetime
 from os import getenv
-from typing import List, Dict
+from typing import List, Dict, Optional
 from fastapi import HTTPException, Header
 from pydantic import BaseModel
 import requests
 
 from repository.errors import ThisUserIsBlocked
 from control.utils.logger import logger
+from control.utils.push import ExpoPushSender
 
 POST_NOT_FOUND = 404
 USER_NOT_FOUND = 404
@@ -278,43 +280,27 @@ class NotificationRequest(BaseModel):
         from_attributes = True
 
 
-URL_EXPO = "https://exp.host/--/api/v2/push/send"
-
-headers_expo = {
-    "host": "exp.host",
-    "accept": "application/json",
-    "accept-encoding": "gzip, deflate",
-    "content-type": "application/json",
-}
-
-
-def send_push_notification(token, notificacion_request):
-    """
-    This function send a push notification to the user
-    """
-    data = {
-        "to": token,
-        "title": notificacion_request.title,
-        "body": notificacion_request.body,
-        "sound": "default",
-        "data": notificacion_request.data,
-    }
-
-    try:
-        response = requests.post(URL_EXPO, headers=headers_expo, json=data, timeout=5)
-        response.raise_for_status()
-
-    except requests.exceptions.RequestException as error:
-        print("Error al enviar la notificación:", str(error))
+push_sender = ExpoPushSender()
 
 
 def send_push_notifications(tokens_db, notificacion_request):
     """
-    This function sends a push notification to the users
+    This function sends a push notification to the users, in batches
+    (see control/utils/push.py), and returns the ticket of each device token.
+    A device token of several users gets the notification once.
     """
-    device_tokens = [token.device_token for token in tokens_db]
-    for device_token in device_tokens:
-        send_push_notification(device_token, notificacion_request)
+    device_tokens = list(dict.fromkeys(token.device_token for token in tokens_db))
+    messages = [
+        {
+            "to": device_token,
+            "title": notificacion_request.title,
+            "body": notificacion_request.body,
+            "sound": "default",
+            "data": notificacion_request.data,
+        }
+        for device_token in device_tokens
+    ]
+    return dict(zip(device_tokens, push_sender.send(messages)))
 
 
 # ------------------------ RECOMMENDED USERS --------------------------------
@@ -389,6 +375,9 @@ class TrendingTopic(BaseModel):
 
     trending_topic: str
     number_of_posts: int
+    score: Optional[float] = None
+    # when the trending topics were computed
+    computed_at: Optional[datetime.datetime] = None
 
     # I disable it since it's a pydantic configuration
     # pylint: disable=too-few-public-methods
@@ -402,30 +391,51 @@ class TrendingTopic(BaseModel):
         from_attributes = True
 
 
-def generate_trending_topic_from_db(trending_topic_db):
+def generate_trending_topic_from_db(trending_topic_db, computed_at=None):
     """
     This function casts the orm_object into a pydantic model.
     """
-    (trending_topic, number_of_posts) = trending_topic_db
+    (trending_topic, number_of_posts, score) = trending_topic_db
 
     if number_of_posts is None:
         number_of_posts = 0
 
-    return TrendingTopic(trending_topic=trending_topic, number_of_posts=number_of_posts)
+    return TrendingTopic(
+        trending_topic=trending_topic,
+        number_of_posts=number_of_posts,
+        score=score,
+        computed_at=computed_at,
+    )
 
 
-def generate_response_trending_topics_from_db(trending_topics_db):
+def generate_response_trending_topics_from_db(trending_topics_db, computed_at=None):
     """
     This function casts the orm_object into a pydantic model.
     """
     response = []
     for trending_topic_db in trending_topics_db:
-        trending_topic = generate_trending_topic_from_db(trending_topic_db)
+        trending_topic = generate_trending_topic_from_db(trending_topic_db, computed_at)
         response.append(trending_topic)
 
     return response
 
 
+class Completion(BaseModel):
+    """This class is a Pydantic model for the response body."""
+
+    completion: str
+    uses: int
+
+
+def generate_response_completions(completions):
+    """
+    This function casts the (completion, uses) tuples into pydantic models.
+    """
+    return [
+        Completion(completion=completion, uses=uses) for completion, uses in completions
+    ]
+
+
 # ----------------- Common functions -----------------
 
 
@@ -14,12 +14,15 @@ from control.common_setup import (
     generate_response_posts_from_db_for_admin,
 )
 from control.utils.logger import logger
+from control.utils.pagination import decode_post_cursor, posts_page_envelope
 from repository.errors import (
     UserNotFound,
     UserDoesntHavePosts,
+    InvalidCursor,
 )
 from repository.queries.queries_get import (
     get_user_id_from_email,
+    get_recommended_users_cache_status,
 )
 
 from repository.queries.queries_admin import (
@@ -28,6 +31,7 @@ from repository.queries.queries_admin import (
     get_posts_by_text_admin,
 )
 from repository.queries.common_setup import session
+from repository.pool import get_pool_status
 
 router = APIRouter()
 
@@ -48,11 +52,32 @@ def get_service_health_and_description():
     }
 
 
+@router.get("/admin/health/db_pool", tags=["Admin"])
+@tracer.start_as_current_span("Database pool status")
+def get_database_pool_status():
+    """
+    Returns the status of the database connection pools (saturation,
+    checkout wait times, etc) so workers and connections can be sized.
+    """
+    return get_pool_status()
+
+
+@router.get("/admin/health/recommended_users_cache", tags=["Admin"])
+@tracer.start_as_current_span("Recommended users cache status")
+def get_recommended_users_cache_health():
+    """
+    Returns the status of the cache of recommended users of this worker
+    (cached users, max amount, hits and misses)
+    """
+    return get_recommended_users_cache_status()
+
+
 @router.get("/posts/admin/all", tags=["Admin"])
 @tracer.start_as_current_span("Get all posts - Admin")
 def api_get_posts_for_admin(
     start: int = Query(0, title="start", description="start for pagination"),
     ammount: int = Query(10, title="ammount", description="ammount of posts"),
+    cursor: str = None,
     is_admin: callable = Depends(token_is_admin),
 ):
     """
@@ -75,8 +100,15 @@ def api_get_posts_for_admin(
             )
         if not is_admin:
             raise HTTPException(status_code=403, detail="Invalid token")
-        posts_db = get_posts_and_reposts_for_admin(start, ammount)
-        return generate_response_posts_from_db_for_admin(posts_db)
+        posts_db = get_posts_and_reposts_for_admin(
+            start, ammount, decode_post_cursor(cursor)
+        )
+        posts = generate_response_posts_from_db_for_admin(posts_db)
+        if cursor is not None:
+            return posts_page_envelope(posts, ammount)
+        return posts
+    except InvalidCursor as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
     except UserDoesntHavePosts as error:
         logger.error("Error in /posts/admin/all: User doesnt have posts.")
         raise HTTPException(status_code=BAD_REQUEST, detail=str(error)) from error
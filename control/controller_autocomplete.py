@@ -0,0 +1,61 @@
+"""
+    Fast API Controller for the autocomplete of hashtags and usernames
+"""
+from fastapi import HTTPException, APIRouter, Query, Depends
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.queries_autocomplete import *
+from repository.errors import ThisUserIsBlocked, InvalidAutocompleteQuery
+from control.common_setup import *
+
+from control.utils.tracer import tracer
+from control.utils.logger import logger
+
+router = APIRouter()
+
+
+@router.get(
+    "/autocomplete",
+    tags=["Autocomplete"],
+)
+@tracer.start_as_current_span("Autocomplete")
+def api_autocomplete(
+    text: str = Query(
+        ...,
+        title="text",
+        description="what was typed: #prefix for hashtags, @prefix for usernames",
+    ),
+    amount: int = Query(
+        10, title="amount", description="max amount of completions to return"
+    ),
+    user: callable = Depends(get_user_from_token),
+):
+    """
+    Returns the most used hashtags (or the most mentioned usernames) that
+    start with what was typed
+    """
+    try:
+        if amount > MAX_AMMOUNT:
+            raise HTTPException(status_code=400, detail=f"Max ammount is {MAX_AMMOUNT}")
+        completions = generate_response_completions(get_completions(text, amount))
+        logger.info(
+            "User %s got %s completions of %s",
+            user.get("email"),
+            len(completions),
+            text,
+        )
+        return completions
+    except InvalidAutocompleteQuery as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
+    except ThisUserIsBlocked as error:
+        raise HTTPException(status_code=403, detail=str(error)) from error
+    except HTTPException:
+        raise
+    except Exception as error:
+        logger.error(
+            "User %s got an exception while trying to autocomplete %s: %s",
+            user.get("email"),
+            text,
+            str(error),
+        )
+        raise HTTPException(status_code=500, detail=str(error)) from error
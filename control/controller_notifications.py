@@ -109,8 +109,15 @@ def api_send_notificacion(
         )
         users_ids = [user.id for user in users_ids_db]
         tokens_db = get_device_tokens(users_ids)
-        send_push_notifications(tokens_db, notificacion_request)
-        return {"mensaje": "Notification sent successfully"}
+        tickets = send_push_notifications(tokens_db, notificacion_request)
+        failed = [
+            token for token, ticket in tickets.items() if ticket.get("status") != "ok"
+        ]
+        if failed:
+            logger.error(
+                "%s of %s push notifications were not sent", len(failed), len(tickets)
+            )
+        return {"mensaje": "Notification sent successfully", "tickets": tickets}
     except UserNotFound as error:
         logger.error(
             "Tried to send notifications but at least one user was not found: %s",
@@ -1,8 +1,9 @@
 """
     Fast API Controller for Posts
 """
+import os
 from datetime import datetime
-from fastapi import HTTPException, APIRouter, Query, Depends
+from fastapi import HTTPException, APIRouter, Query, Depends, Response
 
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from repository.queries.queries_posts import *
@@ -26,11 +27,25 @@ from repository.errors import *
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from control.utils.tracer import tracer
 from control.utils.logger import logger
+from control.utils.pagination import (
+    decode_post_cursor,
+    decode_engagement_cursor,
+    decode_text_search_cursor,
+    page_envelope,
+    posts_page_envelope,
+    posts_by_engagement_page_envelope,
+)
 from control.common_setup import *
 
 
 router = APIRouter()
 
+# seconds that a client can keep the statistics of a range that already ended
+# (they only change if a post of the range is deleted)
+STATISTICS_CLOSED_RANGE_MAX_AGE = int(
+    os.environ.get("STATISTICS_CLOSED_RANGE_MAX_AGE", "3600")
+)
+
 # ------------ POST  ------------
 
 
@@ -244,6 +259,43 @@ def api_get_amount_posts_from_user_visited(
         raise HTTPException(status_code=500, detail=str(error)) from error
 
 
+@router.get(
+    "/posts/profile/{user_visited_email}/counters",
+    tags=["Posts"],
+)
+@tracer.start_as_current_span("Get profile counters of user visited")
+def api_get_profile_counters_from_user_visited(
+    user_visited_email: str,
+    user: callable = Depends(get_user_from_token),
+):
+    """
+    Gets the profile counters of the user visited as user visitor
+
+    Returns: {posts_count, reposts_count, likes_received}
+    """
+    try:
+        user_visited = get_user_id_from_email(user_visited_email)
+        logger.info(
+            "User %s got the profile counters of %s successfully",
+            user.get("email"),
+            user_visited_email,
+        )
+        return get_profile_counters(int(user.get("id")), user_visited)
+
+    except ThisUserIsBlocked as error:
+        raise HTTPException(status_code=403, detail=str(error)) from error
+    except OtherUserIsBlocked as error:
+        raise HTTPException(status_code=405, detail=str(error)) from error
+    except Exception as error:
+        logger.error(
+            "User %s got an exception while trying to get the profile counters of %s: %s",
+            user.get("email"),
+            user_visited_email,
+            str(error),
+        )
+        raise HTTPException(status_code=500, detail=str(error)) from error
+
+
 @router.get(
     "/posts/feed/oldest_date/{oldest_date_str}/amount/{amount}",
     tags=["Posts"],
@@ -316,18 +368,20 @@ def api_get_feed(
 def api_get_statistics(
     from_date_str: str,
     to_date_str: str,
+    series: bool = False,
     user: callable = Depends(get_user_from_token),
 ):
     """
-    Gets all posts from user visited as user visitor
+    Gets the statistics of the posts of the user from from_date to to_date
 
-    Returns: All posts and reposts made by that user
+    Returns: the amount of posts, reposts, reposts received and likes
+    received, and with series the ones of every day
     """
     try:
         from_date = datetime.datetime.strptime(from_date_str, "%Y-%m-%d_%H:%M:%S")
         to_date = datetime.datetime.strptime(to_date_str, "%Y-%m-%d_%H:%M:%S")
 
-        statistics = get_statistics(int(user.get("id")), from_date, to_date)
+        statistics = get_statistics(int(user.get("id")), from_date, to_date, series)
         logger.info(
             "User %s got their statistics from %s to %s successfully",
             user.get("email"),
@@ -357,30 +411,109 @@ def api_get_statistics(
         raise HTTPException(status_code=500, detail=str(error)) from error
 
 
+@router.get(
+    "/posts/statistics/series/from_date/{from_date_str}/to_date/{to_date_str}",
+    tags=["Posts"],
+)
+@tracer.start_as_current_span("Get statistics series")
+def api_get_statistics_series(
+    from_date_str: str,
+    to_date_str: str,
+    response: Response,
+    granularity: str = "day",
+    user: callable = Depends(get_user_from_token),
+):
+    """
+    Gets the statistics of the posts of the user from from_date to to_date
+    in buckets of an hour, a day or a week (granularity)
+
+    Returns: the amount of posts, reposts, reposts received and likes
+    received of every bucket, oldest first
+    """
+    try:
+        from_date = datetime.datetime.strptime(from_date_str, "%Y-%m-%d_%H:%M:%S")
+        to_date = datetime.datetime.strptime(to_date_str, "%Y-%m-%d_%H:%M:%S")
+
+        buckets = get_statistics_series(
+            int(user.get("id")), from_date, to_date, granularity
+        )
+        if (
+            get_statistics_series_end(to_date, granularity)
+            <= datetime.datetime.utcnow()
+        ):
+            response.headers[
+                "Cache-Control"
+            ] = f"private, max-age={STATISTICS_CLOSED_RANGE_MAX_AGE}"
+        else:
+            response.headers["Cache-Control"] = "private, no-cache"
+        logger.info(
+            "User %s got their statistics by %s from %s to %s successfully",
+            user.get("email"),
+            granularity,
+            from_date_str,
+            to_date_str,
+        )
+
+        return {"granularity": granularity, "buckets": buckets}
+    except (InvalidGranularity, TooManyBuckets) as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
+    except Exception as error:
+        logger.error(
+            "User %s got an exception while trying to get their statistics by %s"
+            " from %s to %s: %s",
+            user.get("email"),
+            granularity,
+            from_date_str,
+            to_date_str,
+            str(error),
+        )
+        raise HTTPException(status_code=500, detail=str(error)) from error
+
+
 @router.get(
     "/posts/search/hashtags/{hashtags}",
     tags=["Posts"],
 )
 @tracer.start_as_current_span("Get posts by hashtags")
+# pylint: disable=R0913
 def api_get_posts_by_hashtags(
     hashtags: str,
     offset=Query(0, title="offset", description="offset for pagination"),
     amount=Query(10, title="ammount", description="max ammount of users to return"),
+    cursor: str = None,
+    mode: str = "or",
+    order: str = "recency",
     user: callable = Depends(get_user_from_token),
 ):
     """
     This fuction gets all posts that have the hashtags passed as parameter
-    :param hashtags: The hashtags to search for
+    :param hashtags: The hashtags to search for, separated by commas (#foot*
+    for the ones that start with foot)
     :param offset: The offset for pagination
     :param amount: The max amount of posts to return
+    :param cursor: The cursor of the page (empty for the first one), if it's
+    passed the offset is ignored and it returns {data, next_cursor}
+    :param mode: "or" (any of the hashtags) or "and" (all of them)
+    :param order: "recency" or "engagement" (likes + reposts)
     :param token: The authentication token.
     :return: A list of posts
     """
     try:
         hashtag_list = hashtags.split(",")
+        by_engagement = order == "engagement"
 
         posts_db = get_posts_by_hashtags(
-            int(user.get("id")), hashtag_list, offset, amount
+            int(user.get("id")),
+            hashtag_list,
+            offset,
+            amount,
+            (
+                decode_engagement_cursor(cursor)
+                if by_engagement
+                else decode_post_cursor(cursor)
+            ),
+            mode,
+            order,
         )
         posts = generate_response_posts_from_db(posts_db)
         logger.info(
@@ -391,7 +524,13 @@ def api_get_posts_by_hashtags(
             offset,
             amount,
         )
+        if cursor is not None and by_engagement:
+            return posts_by_engagement_page_envelope(posts, amount)
+        if cursor is not None:
+            return posts_page_envelope(posts, amount)
         return posts
+    except (InvalidCursor, InvalidHashtagSearch) as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
     except ThisUserIsBlocked as error:
         raise HTTPException(status_code=403, detail=str(error)) from error
     except UserIsPrivate as error:
@@ -436,18 +575,28 @@ def api_get_posts_by_text(
     text: str,
     offset=Query(0, title="offset", description="offset for pagination"),
     amount=Query(10, title="ammount", description="max ammount of users to return"),
+    cursor: str = None,
     user: callable = Depends(get_user_from_token),
 ):
     """
     This fuction gets all posts that have the text passed as parameter on it's body.
-    :param text: The text to search for
+    :param text: The text to search for (words, "a phrase", or, -word, or a
+    fragment of a word)
     :param offset: The offset for pagination
     :param amount: The max amount of posts to return
+    :param cursor: The cursor of the page (empty for the first one), if it's
+    passed the offset is ignored and it returns {data, next_cursor}
     :param token: The authentication token.
-    :return: A list of posts
+    :return: A list of posts, the most relevant first
     """
     try:
-        posts_db = get_posts_by_text(int(user.get("id")), text, offset, amount)
+        posts_db, last_sort_keys = search_posts_by_text(
+            int(user.get("id")),
+            text,
+            offset,
+            amount,
+            decode_text_search_cursor(cursor),
+        )
         posts = generate_response_posts_from_db(posts_db)
 
         logger.info(
@@ -459,7 +608,11 @@ def api_get_posts_by_text(
             offset,
             amount,
         )
+        if cursor is not None:
+            return page_envelope(posts, amount, last_sort_keys)
         return posts
+    except InvalidCursor as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
     except ThisUserIsBlocked as error:
         raise HTTPException(status_code=403, detail=str(error)) from error
     except UserIsPrivate as error:
@@ -0,0 +1,321 @@
+# pylint: disable=R0801
+"""
+    Fast API Controller for the hot read paths (feed, profile, post by id,
+    search and trending) running on the async engine.
+
+    It has the same routes as controller_post / controller_trending_topic,
+    the app only mounts it (in front of them) when DB_ASYNC_READS=true.
+"""
+import datetime
+from fastapi import HTTPException, APIRouter, Query, Depends
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.queries_get_async import *
+from repository.errors import *
+
+from control.utils.tracer import tracer
+from control.utils.logger import logger
+from control.utils.pagination import (
+    decode_post_cursor,
+    decode_engagement_cursor,
+    decode_text_search_cursor,
+    page_envelope,
+    posts_page_envelope,
+    posts_by_engagement_page_envelope,
+)
+from control.common_setup import (
+    get_user_from_token,
+    generate_response_posts_from_db,
+    generate_response_trending_topics_from_db,
+)
+
+router = APIRouter()
+
+
+# pylint: disable=C0103, W0622
+@router.get(
+    "/posts/profile/{user_visited_email}/oldest_date/{oldest_date_str}"
+    "/amount/{amount}/only_reposts/",
+    tags=["Posts"],
+)
+@tracer.start_as_current_span("Get posts and reposts from user visited (async)")
+async def api_get_posts_and_reposts_from_user_visited_async(
+    user_visited_email: str,
+    oldest_date_str: str,
+    amount: int,
+    only_reposts: bool = Query(...),
+    user: callable = Depends(get_user_from_token),
+):
+    """
+    Gets all posts and reposts from user visited as user visitor
+
+    Returns: All posts and reposts made by that user
+    """
+    try:
+        oldest_date = datetime.datetime.strptime(oldest_date_str, "%Y-%m-%d_%H:%M:%S")
+        user_visited = await get_user_id_from_email_async(user_visited_email)
+        posts_db = await get_posts_and_reposts_from_users_async(
+            int(user.get("id")), user_visited, oldest_date, amount, only_reposts
+        )
+        logger.info(
+            "User %s got %s posts (only reposts? %s) from %s since %s successfully",
+            user.get("email"),
+            amount,
+            only_reposts,
+            user_visited_email,
+            oldest_date_str,
+        )
+        return generate_response_posts_from_db(posts_db)
+    except (UserIsPrivate, ThisUserIsBlocked) as error:
+        raise HTTPException(status_code=403, detail=str(error)) from error
+    except OtherUserIsBlocked as error:
+        raise HTTPException(status_code=405, detail=str(error)) from error
+    except UserDoesntHavePosts as error:
+        raise HTTPException(status_code=404, detail=str(error)) from error
+    except Exception as error:
+        logger.error(
+            "User %s got an exception while trying to get posts from %s since %s: %s",
+            user.get("email"),
+            user_visited_email,
+            oldest_date_str,
+            str(error),
+        )
+        raise HTTPException(status_code=500, detail=str(error)) from error
+
+
+@router.get(
+    "/posts/feed/oldest_date/{oldest_date_str}/amount/{amount}",
+    tags=["Posts"],
+)
+@tracer.start_as_current_span("Get Feed (async)")
+async def api_get_feed_async(
+    oldest_date_str: str,
+    amount: int,
+    user: callable = Depends(get_user_from_token),
+):
+    """
+    Gets the feed of the user: posts from the users they follow
+    and posts that may interest them
+    """
+    try:
+        oldest_date = datetime.datetime.strptime(oldest_date_str, "%Y-%m-%d_%H:%M:%S")
+        posts_db = await get_posts_and_reposts_feed_async(
+            int(user.get("id")), oldest_date, amount
+        )
+        logger.info(
+            "User %s got its own feed with %s posts since %s successfully",
+            user.get("email"),
+            amount,
+            oldest_date_str,
+        )
+        return generate_response_posts_from_db(posts_db)
+    except (UserIsPrivate, ThisUserIsBlocked) as error:
+        raise HTTPException(status_code=403, detail=str(error)) from error
+    except UserDoesntHavePosts as error:
+        raise HTTPException(status_code=404, detail=str(error)) from error
+    except Exception as error:
+        logger.error(
+            "User %s got an exception while trying to get its own feed: %s",
+            user.get("email"),
+            str(error),
+        )
+        raise HTTPException(status_code=500, detail=str(error)) from error
+
+
+@router.get(
+    "/posts/{post_id}",
+    tags=["Posts"],
+)
+@tracer.start_as_current_span("Get post by id (async)")
+async def api_get_post_by_id_async(
+    post_id: int,
+    user: callable = Depends(get_user_from_token),
+):
+    """
+    Get post by id
+    """
+    try:
+        post_db = await get_post_by_id_async(int(user.get("id")), post_id)
+        logger.info(
+            "User %s got post with id %s successfully", user.get("email"), post_id
+        )
+        return generate_response_posts_from_db(post_db)
+    except ThisUserIsBlocked as error:
+        raise HTTPException(status_code=403, detail=str(error)) from error
+    except PostNotFound as error:
+        raise HTTPException(status_code=404, detail=str(error)) from error
+    except Exception as error:
+        logger.error(
+            "User %s got an exception while trying to get post with id %s: %s",
+            user.get("email"),
+            post_id,
+            str(error),
+        )
+        raise HTTPException(status_code=500, detail=str(error)) from error
+
+
+@router.get(
+    "/posts/search/hashtags/{hashtags}",
+    tags=["Posts"],
+)
+@tracer.start_as_current_span("Get posts by hashtags (async)")
+# pylint: disable=R0913
+async def api_get_posts_by_hashtags_async(
+    hashtags: str,
+    offset=Query(0, title="offset", description="offset for pagination"),
+    amount=Query(10, title="ammount", description="max ammount of users to return"),
+    cursor: str = None,
+    mode: str = "or",
+    order: str = "recency",
+    user: callable = Depends(get_user_from_token),
+):
+    """
+    This fuction gets all posts that have the hashtags passed as parameter
+    (any of them or all of them, see mode), newest or most liked and
+    reposted first (see order). If the cursor is passed (empty for the
+    first page) the offset is ignored and it returns {data, next_cursor}
+    """
+    try:
+        by_engagement = order == "engagement"
+        posts_db = await get_posts_by_hashtags_async(
+            int(user.get("id")),
+            hashtags.split(","),
+            int(offset),
+            int(amount),
+            (
+                decode_engagement_cursor(cursor)
+                if by_engagement
+                else decode_post_cursor(cursor)
+            ),
+            mode,
+            order,
+        )
+        posts = generate_response_posts_from_db(posts_db)
+        logger.info(
+            "User %s got posts by hashtags %s with offset"
+            " %s and amount %s successfully",
+            user.get("email"),
+            hashtags,
+            offset,
+            amount,
+        )
+        if cursor is not None and by_engagement:
+            return posts_by_engagement_page_envelope(posts, amount)
+        if cursor is not None:
+            return posts_page_envelope(posts, amount)
+        return posts
+    except (InvalidCursor, InvalidHashtagSearch) as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
+    except (UserIsPrivate, ThisUserIsBlocked) as error:
+        raise HTTPException(status_code=403, detail=str(error)) from error
+    except UserDoesntHavePosts as error:
+        raise HTTPException(status_code=404, detail=str(error)) from error
+    except Exception as error:
+        logger.info(
+            "User %s got an exception while trying to get posts by hashtags %s: %s",
+            user.get("email"),
+            hashtags,
+            str(error),
+        )
+        raise HTTPException(status_code=500, detail=str(error)) from error
+
+
+@router.get(
+    "/posts/search/text/{text}",
+    tags=["Posts"],
+)
+@tracer.start_as_current_span("Get posts by text (async)")
+async def api_get_posts_by_text_async(
+    text: str,
+    offset=Query(0, title="offset", description="offset for pagination"),
+    amount=Query(10, title="ammount", description="max ammount of users to return"),
+    cursor: str = None,
+    user: callable = Depends(get_user_from_token),
+):
+    """
+    This fuction gets all posts that have the text passed as parameter on it's body.
+    If the cursor is passed (empty for the first page) the offset is ignored
+    and it returns {data, next_cursor}
+    """
+    try:
+        posts_db, last_sort_keys = await search_posts_by_text_async(
+            int(user.get("id")),
+            text,
+            int(offset),
+            int(amount),
+            decode_text_search_cursor(cursor),
+        )
+        posts = generate_response_posts_from_db(posts_db)
+        logger.info(
+            "User %s got posts by text %s with offset %s and amount %s successfully",
+            user.get("email"),
+            text,
+            offset,
+            amount,
+        )
+        if cursor is not None:
+            return page_envelope(posts, amount, last_sort_keys)
+        return posts
+    except InvalidCursor as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
+    except (UserIsPrivate, ThisUserIsBlocked) as error:
+        raise HTTPException(status_code=403, detail=str(error)) from error
+    except UserDoesntHavePosts as error:
+        raise HTTPException(status_code=404, detail=str(error)) from error
+    except Exception as error:
+        logger.info(
+            "User %s got an exception while trying to get posts by text %s: %s",
+            user.get("email"),
+            text,
+            str(error),
+        )
+        raise HTTPException(status_code=500, detail=str(error)) from error
+
+
+@router.get(
+    "/trending_topics",
+    tags=["Trending topics"],
+)
+@tracer.start_as_current_span("Get trending topics (async)")
+# pylint: disable=R0913
+async def api_get_trending_topics_async(
+    offset=Query(0, title="offset", description="offset for pagination"),
+    amount=Query(10, title="ammount", description="max ammount of users to return"),
+    days=Query(
+        7,
+        title="days",
+        description="to take into account" " the posts of the last x days",
+    ),
+    score: str = "count",
+    location: str = "",
+    user: callable = Depends(get_user_from_token),
+):
+    """
+    Get trending topics
+    """
+    try:
+        trending_topics_db, computed_at = await get_trending_topics_async(
+            int(offset), int(amount), int(days), score, location
+        )
+        logger.info(
+            "User %s got the trending topics with offset"
+            " %s, amount %s and days %s successfully",
+            user.get("email"),
+            offset,
+            amount,
+            days,
+        )
+        return generate_response_trending_topics_from_db(
+            trending_topics_db, computed_at
+        )
+    except InvalidTrendingScore as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
+    except ThisUserIsBlocked as error:
+        raise HTTPException(status_code=403, detail=str(error)) from error
+    except Exception as error:
+        logger.error(
+            "User %s got an exception while trying to get the trending topics: %s",
+            user.get("email"),
+            str(error),
+        )
+        raise HTTPException(status_code=500, detail=str(error)) from error
@@ -18,13 +18,17 @@ from repository.queries.queries_hashtags import *
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from repository.queries.queries_global import *
 
-from repository.errors import ThisUserIsBlocked
+from repository.errors import ThisUserIsBlocked, InvalidCursor
 
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from control.common_setup import *
 
 from control.utils.tracer import tracer
 from control.utils.logger import logger
+from control.utils.pagination import (
+    decode_recommended_users_cursor,
+    recommended_users_page_envelope,
+)
 
 router = APIRouter()
 
@@ -37,6 +41,7 @@ router = APIRouter()
 def api_get_recommended_users(
     offset=Query(0, title="offset", description="offset for pagination"),
     amount=Query(10, title="ammount", description="max ammount of users to return"),
+    cursor: str = None,
     user: callable = Depends(get_user_from_token),
 ):
     """
@@ -44,7 +49,10 @@ def api_get_recommended_users(
     """
     try:
         recommended_users_db = get_recommended_accounts_for_a_user(
-            int(user.get("id")), offset, amount
+            int(user.get("id")),
+            offset,
+            amount,
+            decode_recommended_users_cursor(cursor),
         )
         users = generate_response_recommended_users_from_db(recommended_users_db)
         logger.info(
@@ -53,7 +61,11 @@ def api_get_recommended_users(
             offset,
             amount,
         )
+        if cursor is not None:
+            return recommended_users_page_envelope(users, recommended_users_db, amount)
         return users
+    except InvalidCursor as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
     except UserIsPrivate as error:
         logger.error(
             "User %s tried to get recommended ussers with offset"
@@ -75,3 +87,26 @@ def api_get_recommended_users(
             str(error),
         )
         raise HTTPException(status_code=500, detail=str(error)) from error
+
+
+@router.post(
+    "/users/recommended/invalidate",
+    tags=["Recommended users"],
+)
+@tracer.start_as_current_span("Invalidate recommended users")
+def api_invalidate_recommended_users(
+    user: callable = Depends(get_user_from_token),
+):
+    """
+    Drops the cached recommended users of the user, it's called when they
+    follow or unfollow someone or change their interests.
+
+    The cache is kept by each worker and only the worker that handles this
+    request drops it: the others keep the ranking until it expires
+    (RECOMMENDED_USERS_CACHE_TTL), although they never return the users that
+    were followed since. Callers can't count on the next page being ranked
+    again before then.
+    """
+    invalidate_recommended_users(int(user.get("id")))
+    logger.info("User %s invalidated their recommended users", user.get("email"))
+    return {"mensaje": "recommended users invalidated successfully"}
@@ -1,3 +1,4 @@
+# pylint: disable=R0801
 """
     Fast API Controller for Trending Topics
 """
@@ -8,11 +9,12 @@ from repository.queries.queries_trending_topic import *
 from repository.queries.queries_get import *
 from repository.queries.queries_hashtags import *
 from repository.queries.queries_global import *
-from repository.errors import ThisUserIsBlocked
+from repository.errors import ThisUserIsBlocked, InvalidCursor, InvalidTrendingScore
 from control.common_setup import *
 
 from control.utils.tracer import tracer
 from control.utils.logger import logger
+from control.utils.pagination import decode_post_cursor, posts_page_envelope
 
 router = APIRouter()
 
@@ -22,6 +24,7 @@ router = APIRouter()
     tags=["Trending topics"],
 )
 @tracer.start_as_current_span("Get trending topics")
+# pylint: disable=R0913
 def api_get_trending_topics(
     offset=Query(0, title="offset", description="offset for pagination"),
     amount=Query(10, title="ammount", description="max ammount of users to return"),
@@ -30,16 +33,20 @@ def api_get_trending_topics(
         title="days",
         description="to take into account" " the posts of the last x days",
     ),
+    score: str = "count",
+    location: str = "",
     user: callable = Depends(get_user_from_token),
 ):
     """
     Get trending topics
     """
     try:
-        trending_topics_db = get_trending_topics_with_count(
-            int(offset), int(amount), int(days)
+        trending_topics_db, computed_at = get_trending_topics(
+            int(offset), int(amount), int(days), score, location
+        )
+        trending_topics = generate_response_trending_topics_from_db(
+            trending_topics_db, computed_at
         )
-        trending_topics = generate_response_trending_topics_from_db(trending_topics_db)
         logger.info(
             "User %s got the trending topics with offset"
             " %s, amount %s and days %s successfully",
@@ -49,6 +56,8 @@ def api_get_trending_topics(
             days,
         )
         return trending_topics
+    except InvalidTrendingScore as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
     # pylint: disable=R0801
     # I disable the "Similar lines in 2 files"
     except ThisUserIsBlocked as error:
@@ -83,6 +92,7 @@ def api_get_posts_on_a_trending_topic(
     hashtag: str,
     offset=Query(0, title="offset", description="offset for pagination"),
     amount=Query(10, title="ammount", description="max ammount of users to return"),
+    cursor: str = None,
     user: callable = Depends(get_user_from_token),
 ):
     """
@@ -90,7 +100,7 @@ def api_get_posts_on_a_trending_topic(
     """
     try:
         posts_db = get_posts_on_a_trending_topic(
-            int(user.get("id")), hashtag, offset, amount
+            int(user.get("id")), hashtag, offset, amount, decode_post_cursor(cursor)
         )
         posts = generate_response_posts_from_db(posts_db)
         logger.info(
@@ -101,7 +111,11 @@ def api_get_posts_on_a_trending_topic(
             offset,
             amount,
         )
+        if cursor is not None:
+            return posts_page_envelope(posts, amount)
         return posts
+    except InvalidCursor as error:
+        raise HTTPException(status_code=400, detail=str(error)) from error
     except ThisUserIsBlocked as error:
         logger.error(
             "User %s tried to get posts from the hashtag %s with"
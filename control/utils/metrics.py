@@ -0,0 +1,9 @@
+# metrics.py
+"""
+This module is for the metrics exported through opentelemetry (uptrace).
+"""
+from opentelemetry import metrics
+
+# uptrace.configure_opentelemetry (see tracer.py) sets the meter provider,
+# until then this meter is a proxy that starts exporting once it is set.
+meter = metrics.get_meter("back-snapmsg")
@@ -0,0 +1,138 @@
+# pagination.py
+"""
+This module is for the opaque cursors of the keyset pagination.
+
+A cursor is the (urlsafe base64) json of the sort keys of the last item of
+a page, e.g. (created_at, post_id). The next page starts right after it, so
+it takes the same time no matter how deep it is (unlike offset).
+"""
+import base64
+import binascii
+import datetime
+import json
+
+from repository.errors import InvalidCursor
+
+
+def encode_cursor(*values):
+    """
+    Returns the cursor that points right after an item with these sort keys
+    """
+    serializable = [
+        value.isoformat() if isinstance(value, datetime.datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(serializable, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, *types):
+    """
+    Returns the sort keys stored in the cursor, each one converted with the
+    function of types in the same position. Raises InvalidCursor if the
+    cursor was not made by encode_cursor with that many values.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+        if not isinstance(values, list) or len(values) != len(types):
+            raise InvalidCursor()
+        return tuple(kind(value) for kind, value in zip(types, values))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as error:
+        raise InvalidCursor() from error
+
+
+def decode_post_cursor(cursor):
+    """
+    Returns the (created_at, post_id) stored in a cursor of posts,
+    or None if the cursor is empty (first page)
+    """
+    if not cursor:
+        return None
+    return decode_cursor(cursor, datetime.datetime.fromisoformat, int)
+
+
+def decode_engagement_cursor(cursor):
+    """
+    Returns the (likes + reposts, post_id) stored in a cursor of posts
+    ordered by engagement, or None if the cursor is empty (first page)
+    """
+    if not cursor:
+        return None
+    return decode_cursor(cursor, int, int)
+
+
+def decode_text_search_cursor(cursor):
+    """
+    Returns the (rank, created_at, post_id) stored in a cursor of a search by
+    text, or None if the cursor is empty (first page)
+    """
+    if not cursor:
+        return None
+    return decode_cursor(cursor, int, datetime.datetime.fromisoformat, int)
+
+
+def decode_recommended_users_cursor(cursor):
+    """
+    Returns the ranking stored in a cursor of recommended users,
+    or None if the cursor is empty (first page)
+    """
+    if not cursor:
+        return None
+    return decode_cursor(cursor, int, int, int, int, int)
+
+
+def page_envelope(data, amount, last_sort_keys):
+    """
+    Returns the response of a page paginated with a cursor: the data and the
+    cursor of the next page (None if this is the last page). last_sort_keys
+    are the sort keys of the last item of data.
+    """
+    next_cursor = None
+    if data and len(data) >= int(amount):
+        next_cursor = encode_cursor(*last_sort_keys)
+    return {"data": data, "next_cursor": next_cursor}
+
+
+def posts_page_envelope(posts, amount):
+    """
+    page_envelope for a page of posts (PostResponse)
+    """
+    last_sort_keys = ()
+    if posts:
+        last_sort_keys = (
+            datetime.datetime.fromisoformat(posts[-1].created_at),
+            posts[-1].post_id,
+        )
+    return page_envelope(posts, amount, last_sort_keys)
+
+
+def posts_by_engagement_page_envelope(posts, amount):
+    """
+    page_envelope for a page of posts (PostResponse) ordered by engagement
+    """
+    last_sort_keys = ()
+    if posts:
+        last_sort_keys = (
+            posts[-1].number_likes + posts[-1].number_reposts,
+            posts[-1].post_id,
+        )
+    return page_envelope(posts, amount, last_sort_keys)
+
+
+def recommended_users_page_envelope(users, users_db, amount):
+    """
+    page_envelope for a page of recommended users, users_db are
+    the rows of the query (they have the ranking)
+    """
+    last_sort_keys = ()
+    if users_db:
+        user, location_shared, friends, interest_posts, interest_likes = users_db[-1]
+        last_sort_keys = (
+            friends or 0,
+            location_shared,
+            interest_posts or 0,
+            interest_likes or 0,
+            user.id,
+        )
+    return page_envelope(users, amount, last_sort_keys)
@@ -0,0 +1,100 @@
+# push.py
+"""
+Push notifications sent through the Expo push API.
+
+The messages are sent in batches of up to EXPO_PUSH_BATCH_SIZE (the most
+that Expo takes in a request), over a keep-alive session, and up to
+EXPO_PUSH_CONCURRENCY batches at the same time per worker (the batches of
+every request share them). Expo answers with a ticket per message, in the
+same order: {"status": "ok", "id": ...} or {"status": "error", "message":
+..., "details": ...}; a batch that fails gets an error ticket per message.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from control.utils.logger import logger
+
+EXPO_PUSH_URL = os.environ.get("EXPO_PUSH_URL", "https://exp.host/--/api/v2/push/send")
+EXPO_PUSH_BATCH_SIZE = int(os.environ.get("EXPO_PUSH_BATCH_SIZE", "100"))
+EXPO_PUSH_CONCURRENCY = int(os.environ.get("EXPO_PUSH_CONCURRENCY", "8"))
+EXPO_PUSH_TIMEOUT = float(os.environ.get("EXPO_PUSH_TIMEOUT", "10"))
+
+EXPO_HEADERS = {
+    "accept": "application/json",
+    "accept-encoding": "gzip, deflate",
+    "content-type": "application/json",
+}
+
+
+def error_ticket(message):
+    """
+    Returns the ticket of a message that could not be sent
+    """
+    return {"status": "error", "message": message}
+
+
+class ExpoPushSender:
+    """
+    Sends push messages (dicts with "to", "title", "body", ...) to the Expo
+    push API at url, in batches of batch_size, up to concurrency at a time
+    """
+
+    def __init__(
+        self,
+        url=EXPO_PUSH_URL,
+        batch_size=EXPO_PUSH_BATCH_SIZE,
+        concurrency=EXPO_PUSH_CONCURRENCY,
+        timeout=EXPO_PUSH_TIMEOUT,
+    ):
+        self.url = url
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(EXPO_HEADERS)
+        # a connection kept alive for each batch in flight
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._executor = ThreadPoolExecutor(
+            max_workers=concurrency, thread_name_prefix="expo-push"
+        )
+
+    def send(self, messages):
+        """
+        Sends the messages and returns their tickets, in the same order
+        """
+        batches = [
+            messages[start : start + self.batch_size]
+            for start in range(0, len(messages), self.batch_size)
+        ]
+        tickets = []
+        for batch_tickets in self._executor.map(self._send_batch, batches):
+            tickets += batch_tickets
+        return tickets
+
+    def _send_batch(self, batch):
+        try:
+            response = self.session.post(self.url, json=batch, timeout=self.timeout)
+            response.raise_for_status()
+            tickets = response.json().get("data")
+        except (requests.exceptions.RequestException, ValueError) as error:
+            logger.error(
+                "Could not send a batch of %s push notifications: %s",
+                len(batch),
+                str(error),
+            )
+            return [error_ticket(str(error))] * len(batch)
+        if not isinstance(tickets, list) or len(tickets) != len(batch):
+            logger.error("Expo answered a batch of %s without its tickets", len(batch))
+            return [error_ticket("No ticket in the response")] * len(batch)
+        return tickets
+
+    def close(self):
+        """
+        Waits for the batches in flight and closes the connections
+        """
+        self._executor.shutdown(wait=True)
+        self.session.close()
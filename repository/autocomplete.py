@@ -0,0 +1,210 @@
+"""
+Index of completions of prefixes (for the autocomplete of hashtags and
+usernames) kept in the memory of the process.
+
+The keys are in a sorted array, so the ones that start with a prefix are a
+contiguous range found with two binary searches. Over the weights there is
+a segment tree with the position of the heaviest key of every range: the
+top k of the range come out of a heap in O(k log n), without looking at the
+rest of it (a one letter prefix can have hundreds of thousands of keys).
+
+The weights of the keys in the array are updated in place (O(log n)). The
+new keys go to a small sorted buffer that is read next to the array and
+merged into it (a rebuild, O(n)) when it has merge_every keys.
+
+The index has a memory budget (max_bytes, an estimation of what its keys
+take): when it's built it keeps the heaviest keys that fit, and once it's
+full the new keys are left out (until it's built again).
+"""
+import bisect
+import heapq
+import sys
+import threading
+from array import array
+
+# the pointers in the keys and values lists, the weight and the two slots
+# of the segment tree (8 bytes each)
+ENTRY_OVERHEAD = 5 * 8
+
+# every key that starts with a prefix is lower than prefix + LAST_CHAR
+LAST_CHAR = "\U0010ffff"
+
+
+def entry_size(key, value):
+    """
+    Returns the estimated bytes that a key (and its value) take in the index
+    """
+    size = ENTRY_OVERHEAD + sys.getsizeof(key)
+    if value != key:
+        size += sys.getsizeof(value)
+    return size
+
+
+# pylint: disable=R0902
+class CompletionIndex:
+    """
+    Thread safe index of keys (with the value returned for them, e.g. the
+    username with its capital letters) and their weights, that returns the
+    heaviest keys that start with a prefix
+    """
+
+    def __init__(self, entries=(), max_bytes=None, merge_every=4096):
+        """
+        entries are (key, value, weight) tuples, the keys must be unique
+        """
+        self.max_bytes = max_bytes
+        self.merge_every = merge_every
+        self.bytes_used = 0
+        self._keys = []
+        self._values = []
+        self._weights = array("q")
+        self._tree = array("q")
+        self._pending_keys = []
+        self._pending = {}
+        self._lock = threading.Lock()
+
+        kept = []
+        for key, value, weight in sorted(entries, key=lambda entry: -entry[2]):
+            size = entry_size(key, value)
+            if self.max_bytes is not None and self.bytes_used + size > self.max_bytes:
+                break
+            self.bytes_used += size
+            kept.append((key, value, weight))
+        kept.sort()
+        self._rebuild(kept)
+
+    def _rebuild(self, entries):
+        self._keys = [key for key, _, _ in entries]
+        self._values = [value for _, value, _ in entries]
+        self._weights = array("q", (weight for _, _, weight in entries))
+        size = len(entries)
+        # tree[size + i] = i, tree[node] = the heaviest of its two children
+        # (the lowest key on a tie, as in _heaviest, inlined for speed)
+        tree = array("q", bytes(8 * size))
+        tree.extend(range(size))
+        weights = self._weights
+        for node in range(size - 1, 0, -1):
+            first, second = tree[2 * node], tree[2 * node + 1]
+            if weights[second] > weights[first] or (
+                weights[second] == weights[first] and second < first
+            ):
+                first = second
+            tree[node] = first
+        self._tree = tree
+
+    def _heaviest(self, first, second):
+        # the lowest key wins a tie
+        if self._weights[second] == self._weights[first]:
+            return min(first, second)
+        if self._weights[second] > self._weights[first]:
+            return second
+        return first
+
+    def _heaviest_in(self, start, end):
+        """
+        Returns the position of the heaviest key in [start, end)
+        """
+        size = len(self._keys)
+        heaviest = None
+        start += size
+        end += size
+        while start < end:
+            if start & 1:
+                heaviest = self._pick(heaviest, self._tree[start])
+                start += 1
+            if end & 1:
+                end -= 1
+                heaviest = self._pick(heaviest, self._tree[end])
+            start >>= 1
+            end >>= 1
+        return heaviest
+
+    def _pick(self, heaviest, candidate):
+        if heaviest is None:
+            return candidate
+        return self._heaviest(heaviest, candidate)
+
+    def _position(self, key):
+        position = bisect.bisect_left(self._keys, key)
+        if position < len(self._keys) and self._keys[position] == key:
+            return position
+        return None
+
+    def add(self, key, value, weight=1):
+        """
+        Adds weight (negative to take it back) to the key, adding the key if
+        it's not there (and fits)
+        """
+        with self._lock:
+            position = self._position(key)
+            if position is not None:
+                self._weights[position] += weight
+                node = (position + len(self._keys)) >> 1
+                while node:
+                    self._tree[node] = self._heaviest(
+                        self._tree[2 * node], self._tree[2 * node + 1]
+                    )
+                    node >>= 1
+                return
+            if key in self._pending:
+                self._pending[key][1] += weight
+                return
+            if weight <= 0:
+                return
+            size = entry_size(key, value)
+            if self.max_bytes is not None and self.bytes_used + size > self.max_bytes:
+                return
+            self.bytes_used += size
+            self._pending[key] = [value, weight]
+            bisect.insort(self._pending_keys, key)
+            if len(self._pending) >= self.merge_every:
+                self._merge_pending()
+
+    def _merge_pending(self):
+        entries = heapq.merge(
+            zip(self._keys, self._values, self._weights),
+            (
+                (key, self._pending[key][0], self._pending[key][1])
+                for key in self._pending_keys
+            ),
+        )
+        self._rebuild(list(entries))
+        self._pending = {}
+        self._pending_keys = []
+
+    def complete(self, prefix, amount):
+        """
+        Returns the (value, weight) of the (up to) amount heaviest keys that
+        start with the prefix, the heaviest first
+        """
+        with self._lock:
+            start = bisect.bisect_left(self._keys, prefix)
+            end = bisect.bisect_left(self._keys, prefix + LAST_CHAR)
+            candidates = []
+            heap = []
+            if start < end:
+                heaviest = self._heaviest_in(start, end)
+                heap.append((-self._weights[heaviest], heaviest, start, end))
+            while heap and len(candidates) < amount:
+                weight, position, start, end = heapq.heappop(heap)
+                candidates.append(
+                    (weight, self._keys[position], self._values[position])
+                )
+                for part_start, part_end in ((start, position), (position + 1, end)):
+                    if part_start < part_end:
+                        heaviest = self._heaviest_in(part_start, part_end)
+                        heapq.heappush(
+                            heap,
+                            (-self._weights[heaviest], heaviest, part_start, part_end),
+                        )
+
+            start = bisect.bisect_left(self._pending_keys, prefix)
+            end = bisect.bisect_left(self._pending_keys, prefix + LAST_CHAR)
+            for key in self._pending_keys[start:end]:
+                value, weight = self._pending[key]
+                candidates.append((-weight, key, value))
+
+        return [(value, -weight) for weight, _, value in sorted(candidates)[:amount]]
+
+    def __len__(self):
+        return len(self._keys) + len(self._pending)
@@ -0,0 +1,293 @@
+"""
+Small in-process cache (LRU with a time to live) for the per-user lookups
+that are repeated on every page load, the one of the per-user rankings
+that are paginated by slicing (RankingCache), and the holder of the
+structures built from the database that are kept in memory (RebuiltValue).
+
+Every worker process has its own, so what's stored must be fine to be
+a little stale (at most ttl_seconds) when another worker writes.
+"""
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Thread safe LRU cache with a time to live per entry, that counts its
+    hits and misses.
+    """
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Returns the value stored for the key, or default if it's
+        not there or it expired
+        """
+        with self._lock:
+            stored_at, value = self._entries.get(key, (None, _MISSING))
+            if value is _MISSING or time.monotonic() - stored_at > self.ttl_seconds:
+                self.misses += 1
+                self._entries.pop(key, None)
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Stores the value, dropping the least recently used entry if it's full
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def update(self, key, function):
+        """
+        Replaces the value stored for the key with function(value),
+        only if the key is cached (the expiration is not renewed)
+        """
+        with self._lock:
+            if key in self._entries:
+                stored_at, value = self._entries[key]
+                self._entries[key] = (stored_at, function(value))
+
+    def pop(self, key):
+        """
+        Removes the key from the cache, if it's there
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Removes everything from the cache
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RankingCache:
+    """
+    Per key rankings (rows of width ints, the first one first, that end with
+    an id) kept in an LRUCache, each one as a single array of int64.
+
+    Every ranking holds up to max_length rows, so the amount of keys is
+    capped by a memory budget: budget_bytes over the size of a full one.
+    A ranking is complete if it has every row, if not only the pages within
+    its rows are served from it.
+    """
+
+    # dict entry, tuple and timestamp of the LRUCache for each key
+    KEY_OVERHEAD_BYTES = 200
+
+    def __init__(self, width, max_length, budget_bytes, ttl_seconds):
+        self.width = width
+        self.max_length = max_length
+        self.ranking_bytes = (
+            sys.getsizeof(array("q", bytes(8 * width * max_length)))
+            + self.KEY_OVERHEAD_BYTES
+        )
+        self._rankings = LRUCache(
+            max(int(budget_bytes // self.ranking_bytes), 1), ttl_seconds
+        )
+
+    @property
+    def hits(self):
+        """
+        Times a ranking was found
+        """
+        return self._rankings.hits
+
+    @property
+    def misses(self):
+        """
+        Times a ranking was not found (or it expired)
+        """
+        return self._rankings.misses
+
+    def get(self, key):
+        """
+        Returns (rows, complete) of the ranking of the key, or None if it's
+        not there or it expired
+        """
+        cached = self._rankings.get(key)
+        if cached is None:
+            return None
+        complete, values = cached
+        rows = [
+            tuple(values[start : start + self.width])
+            for start in range(0, len(values), self.width)
+        ]
+        return rows, complete
+
+    def set(self, key, rows, complete):
+        """
+        Stores the first max_length rows of the ranking of the key
+        """
+        values = array("q")
+        for row in rows[: self.max_length]:
+            values.extend(row)
+        self._rankings.set(key, (complete and len(rows) <= self.max_length, values))
+
+    def pop(self, key):
+        """
+        Removes the ranking of the key, if it's there
+        """
+        self._rankings.pop(key)
+
+    def clear(self):
+        """
+        Removes every ranking
+        """
+        self._rankings.clear()
+
+    def status(self):
+        """
+        Returns the amount of rankings, the max amount, and the hits and misses
+        """
+        requests = self.hits + self.misses
+        return {
+            "entries": len(self._rankings),
+            "max_entries": self._rankings.max_entries,
+            "ttl_seconds": self._rankings.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / requests, 3) if requests else 0.0,
+        }
+
+
+def ranking_page(rows, complete, offset_and_amount, after=None, skip=()):
+    """
+    Returns the amount rows of the ranking right after the after ranking
+    row (the cursor) if it's passed, or skipping offset rows if not, without
+    the ones whose id (their last value) is in skip. Returns None if the
+    ranking is not complete and the page goes beyond its rows.
+    """
+    offset, amount = offset_and_amount
+    rows = [row for row in rows if row[-1] not in skip]
+    if after is not None:
+        after = tuple(after)
+        offset = next(
+            (position for position, row in enumerate(rows) if row < after), len(rows)
+        )
+    page = rows[offset : offset + amount]
+    if not complete and offset + amount > len(rows):
+        return None
+    return page
+
+
+# pylint: disable=R0902
+class RebuiltValue:
+    """
+    A value that takes long to build (e.g. an index built from the database):
+    it's built the first time it's read, and built again in a background
+    thread once it's older than max_age_seconds (the old one is returned
+    until the new one is ready).
+
+    build returns the value and what it was built from (e.g. the snapshot of
+    the database that it read). The value is changed in place with
+    update(apply, key), key is where the update comes from (e.g. the
+    transaction that wrote it): the updates made during a build are applied
+    to the old value and replayed on the new one before it replaces the old
+    one, except the ones that it was built with, seen(built_from, key).
+    """
+
+    def __init__(self, build, max_age_seconds, seen):
+        self.build = build
+        self.max_age_seconds = max_age_seconds
+        self.seen = seen
+        self._value = None
+        self._built_at = None
+        self._lock = threading.Lock()
+        # the (key, apply) of the updates made during the current build,
+        # None if there is none
+        self._updates = None
+        self._updates_lock = threading.Lock()
+
+    def get(self):
+        """
+        Returns the value, building it if it was never built
+        """
+        if self._built_at is None:
+            with self._lock:
+                if self._built_at is None:
+                    self._build()
+        elif time.monotonic() - self._built_at > self.max_age_seconds:
+            # released by the thread when it's done
+            # pylint: disable=R1732
+            if self._lock.acquire(blocking=False):
+                threading.Thread(target=self._rebuild, daemon=True).start()
+        return self._value
+
+    def current(self):
+        """
+        Returns the value, or None if it was never built (it doesn't build it)
+        """
+        return self._value
+
+    def update(self, apply, key):
+        """
+        Changes the value with apply(value), if it was built, and the value
+        that is being built (once it's ready, if it wasn't built with the
+        update) if there is one
+        """
+        with self._updates_lock:
+            if self._value is not None:
+                apply(self._value)
+            if self._updates is not None:
+                self._updates.append((key, apply))
+
+    def rebuild(self):
+        """
+        Builds the value again, now
+        """
+        with self._lock:
+            self._build()
+
+    def clear(self):
+        """
+        Drops the value, it's built again the next time it's read
+        """
+        with self._lock:
+            self._value = None
+            self._built_at = None
+
+    def _build(self):
+        with self._updates_lock:
+            self._updates = []
+        built = None
+        try:
+            built = self.build()
+        finally:
+            with self._updates_lock:
+                if built is not None:
+                    value, built_from = built
+                    for key, apply in self._updates:
+                        if not self.seen(built_from, key):
+                            apply(value)
+                    self._value = value
+                    self._built_at = time.monotonic()
+                self._updates = None
+
+    def _rebuild(self):
+        try:
+            self._build()
+        finally:
+            self._lock.release()
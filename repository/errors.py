@@ -157,3 +157,79 @@ class TextTooLongError(Exception):
 
     def __init__(self, message="Text exceeds maximum length of 1000 characters."):
         super().__init__(message)
+
+
+class InvalidCursor(Exception):
+    """
+    Exception raised when the pagination cursor can't be decoded.
+    """
+
+    def __init__(self):
+        super().__init__("Invalid cursor.")
+
+
+class TimelineStoreError(Exception):
+    """
+    Exception raised when the timeline store (Redis) answers with an error
+    or closes the connection.
+    """
+
+    def __init__(self, message="The timeline store failed."):
+        super().__init__(message)
+
+
+class InvalidHashtagSearch(Exception):
+    """
+    Exception raised when the mode or the order of a search by hashtags is
+    unknown.
+    """
+
+    def __init__(self):
+        super().__init__(
+            "Invalid search. The mode must be and or or, and the order"
+            " recency or engagement."
+        )
+
+
+class InvalidGranularity(Exception):
+    """
+    Exception raised when the granularity of a statistics series is unknown.
+    """
+
+    def __init__(self):
+        super().__init__("Invalid granularity. It must be hour, day or week.")
+
+
+class TooManyBuckets(Exception):
+    """
+    Exception raised when a statistics series would have too many buckets.
+    """
+
+    def __init__(self, max_buckets):
+        super().__init__(f"The range has too many buckets, the max is {max_buckets}.")
+
+
+class InvalidAutocompleteQuery(Exception):
+    """
+    Exception raised when the text to autocomplete doesn't start with # or @
+    or has nothing after it.
+    """
+
+    def __init__(self):
+        super().__init__(
+            "Invalid text. It must start with # (hashtags) or @ (usernames)"
+            " followed by at least one character."
+        )
+
+
+class InvalidTrendingScore(Exception):
+    """
+    Exception raised when the score of the trending topics is unknown, or is
+    decayed for a window longer than the one kept in memory.
+    """
+
+    def __init__(self, max_days):
+        super().__init__(
+            "Invalid score. It must be count or decayed, decayed only for"
+            f" up to {max_days} days."
+        )
@@ -0,0 +1,72 @@
+"""
+Job that builds the daily rollup of statistics of the users
+(user_daily_stats) from the history of posts, reposts and likes. It
+replaces the rows of the users batch by batch (a transaction per batch of
+user ids), so it can be run after the migration that creates the table and
+again at any time to fix the rows that drifted.
+
+Usage:
+    PYTHONPATH=. python repository/jobs/backfill_daily_stats.py --batch-size 1000
+"""
+import argparse
+from sqlalchemy import Date, cast, delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.common_setup import *
+from repository.queries.queries_counters import STATISTICS, query_statistics_history
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.tables.posts import UserDailyStats
+from repository.tables.users import User
+
+from control.utils.logger import logger
+
+BATCH_SIZE = 1000
+
+
+def backfill_user_batch(first_user_id, last_user_id):
+    """
+    Replaces the daily statistics of the users with ids in [first, last]
+    with the ones computed from the history, returns how many rows it wrote
+    """
+
+    def in_batch(column):
+        return column.between(first_user_id, last_user_id)
+
+    daily_stats = query_statistics_history(
+        in_batch, lambda created_at: cast(created_at, Date)
+    )
+
+    session.execute(delete(UserDailyStats).where(in_batch(UserDailyStats.user_id)))
+    result = session.execute(
+        insert(UserDailyStats).from_select(["user_id", "day", *STATISTICS], daily_stats)
+    )
+    session.commit()
+    return result.rowcount
+
+
+def backfill_daily_stats(batch_size=BATCH_SIZE):
+    """
+    Rebuilds the daily statistics of every user, batch by batch.
+    Returns how many rows were written.
+    """
+    first_id, last_id = session.execute(
+        select(func.min(User.id), func.max(User.id))
+    ).one()
+    if first_id is None:
+        return 0
+
+    written = 0
+    for batch_start in range(first_id, last_id + 1, batch_size):
+        written += backfill_user_batch(batch_start, batch_start + batch_size - 1)
+
+    logger.info("Backfilled the daily statistics, %s rows were written", written)
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    arguments = parser.parse_args()
+    print(backfill_daily_stats(arguments.batch_size))
@@ -0,0 +1,244 @@
+"""
+Job that computes the recommended users of every user (the first
+RECOMMENDED_USERS_SIZE, with the features they are ranked by) and writes
+them to recommended_users, where GET /users/recommended reads them from
+(see get_recommended_accounts_for_a_user).
+
+It's incremental: it keeps a fingerprint of the location, the followings
+and the interests of each user, and only recomputes the users whose
+fingerprint changed since the last run, or that were computed more than
+RECOMMENDED_USERS_MAX_AGE seconds ago (the follows, posts and likes of the
+other users also change the ranking). It walks the users in batches of
+ids, so every transaction is short.
+
+With RECOMMENDED_USERS_SCORER (or --scorer) "sparse" it loads the follows,
+interests, posts and likes once into a SparseRecommender and ranks the
+stale users of each batch at once, instead of running the query of
+get_recommended_accounts_for_a_user for each one (the users created after
+it was loaded still go through the query).
+
+Usage:
+    PYTHONPATH=. python repository/jobs/recommend_users.py --batch-size 1000
+    PYTHONPATH=. python repository/jobs/recommend_users.py --scorer sparse
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import String, cast, delete, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.common_setup import *
+from repository.queries.queries_get import (
+    RECOMMENDED_USERS_MAX_AGE,
+    RECOMMENDED_USERS_SCORER,
+    RECOMMENDED_USERS_SIZE,
+    query_recommended_accounts,
+)
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.tables.posts import Hashtag, Like, Post
+from repository.tables.posts import RecommendationFingerprint, RecommendedUserRow
+from repository.tables.users import Following, Interests, User
+from repository.recommendations import SparseRecommender
+
+from control.utils.logger import logger
+
+BATCH_SIZE = 1000
+
+
+def fingerprint_of_users():
+    """
+    Returns the fingerprint of the location, followings and interests of
+    the user of each row of User (a column)
+    """
+
+    def joined(column, user_column):
+        # the values of the user, sorted and separated by commas
+        return (
+            select(
+                func.string_agg(
+                    cast(column, String),
+                    aggregate_order_by(literal_column("','"), column),
+                )
+            )
+            .where(user_column == User.id)
+            .scalar_subquery()
+        )
+
+    return func.md5(
+        func.concat_ws(
+            "|",
+            User.location,
+            func.coalesce(joined(Following.following_id, Following.user_id), ""),
+            func.coalesce(joined(Interests.interest, Interests.user_id), ""),
+        )
+    )
+
+
+def stale_users(first_user_id, last_user_id, computed_before):
+    """
+    Returns (user_id, fingerprint) of the users with ids in [first, last]
+    whose recommended users were never computed, were computed before
+    computed_before, or whose fingerprint changed since
+    """
+    fingerprint = fingerprint_of_users()
+    return session.execute(
+        select(User.id, fingerprint)
+        .outerjoin(
+            RecommendationFingerprint,
+            RecommendationFingerprint.user_id == User.id,
+        )
+        .where(
+            User.id.between(first_user_id, last_user_id),
+            or_(
+                RecommendationFingerprint.user_id.is_(None),
+                RecommendationFingerprint.computed_at < computed_before,
+                RecommendationFingerprint.fingerprint != fingerprint,
+            ),
+        )
+    ).all()
+
+
+def replace_recommended_users(user_id, recommended, fingerprint, computed_at):
+    """
+    Replaces the recommended users of the user with recommended, rows of
+    (recommended_id, mutual_friends, location_shared, interest_posts,
+    interest_likes) (not committed)
+    """
+    session.execute(
+        delete(RecommendedUserRow).where(RecommendedUserRow.user_id == user_id)
+    )
+    session.add_all(RecommendedUserRow(user_id, *row) for row in recommended)
+    session.merge(RecommendationFingerprint(user_id, fingerprint, computed_at))
+
+
+def recommend_user(user_id, size=RECOMMENDED_USERS_SIZE):
+    """
+    Returns the rows of the first size recommended users of the user,
+    computed with query_recommended_accounts
+    """
+    recommended_users, _ = query_recommended_accounts(user_id)
+    return [
+        (
+            user.id,
+            mutual_friends or 0,
+            location_shared,
+            interest_posts or 0,
+            interest_likes or 0,
+        )
+        for user, location_shared, mutual_friends, interest_posts, interest_likes in (
+            recommended_users.limit(size).all()
+        )
+    ]
+
+
+def columns(rows, width):
+    """
+    Returns the width columns of the rows
+    """
+    return tuple(zip(*rows)) or ((),) * width
+
+
+def load_sparse_recommender():
+    """
+    Returns the SparseRecommender of the users, follows, interests, posts
+    and likes on the db (the same ones that query_recommended_accounts
+    counts)
+    """
+    start = time.monotonic()
+    users = session.execute(select(User.id, User.location)).all()
+    follows = session.execute(select(Following.user_id, Following.following_id)).all()
+    interests = session.execute(select(Interests.user_id, Interests.interest)).all()
+    posts = session.execute(
+        # pylint: disable=E1102
+        select(Hashtag.hashtag, Post.user_creator_id, func.count())
+        .join(Post, Post.content_id == Hashtag.content_id)
+        .group_by(Hashtag.hashtag, Post.user_creator_id)
+    ).all()
+    likes = session.execute(
+        # pylint: disable=E1102
+        select(Hashtag.hashtag, Like.user_id, func.count())
+        .join(Post, Post.content_id == Like.content_id)
+        .join(Hashtag, Post.content_id == Hashtag.content_id)
+        .where(Post.user_creator_id == Post.user_poster_id)
+        .group_by(Hashtag.hashtag, Like.user_id)
+    ).all()
+    recommender = SparseRecommender(
+        *columns(users, 2),
+        columns(follows, 2),
+        columns(interests, 2),
+        columns(posts, 3),
+        columns(likes, 3),
+    )
+    logger.info(
+        "Loaded the recommender of %s users in %.2f s",
+        len(users),
+        time.monotonic() - start,
+    )
+    return recommender
+
+
+def recommend_users_batch(first_user_id, last_user_id, max_age, recommender=None):
+    """
+    Recomputes the recommended users of the stale users with ids in
+    [first, last] (with the recommender if it's passed) and returns how
+    many were recomputed
+    """
+    computed_at = datetime.utcnow()
+    stale = stale_users(
+        first_user_id, last_user_id, computed_at - timedelta(seconds=max_age)
+    )
+    recommended = {}
+    if recommender is not None:
+        recommended = recommender.recommend(
+            [user_id for user_id, _ in stale], RECOMMENDED_USERS_SIZE
+        )
+    for user_id, fingerprint in stale:
+        replace_recommended_users(
+            user_id,
+            recommended[user_id] if user_id in recommended else recommend_user(user_id),
+            fingerprint,
+            computed_at,
+        )
+    session.commit()
+    return len(stale)
+
+
+def recommend_users(
+    batch_size=BATCH_SIZE,
+    max_age=RECOMMENDED_USERS_MAX_AGE,
+    scorer=RECOMMENDED_USERS_SCORER,
+):
+    """
+    Recomputes the recommended users of the stale users, batch by batch,
+    with the scorer ("sql" or "sparse"). Returns how many users were
+    recomputed.
+    """
+    with request_session_scope():
+        first_id, last_id = session.execute(
+            select(func.min(User.id), func.max(User.id))
+        ).one()
+        if first_id is None:
+            return 0
+
+        recommender = load_sparse_recommender() if scorer == "sparse" else None
+        recomputed = 0
+        for batch_start in range(first_id, last_id + 1, batch_size):
+            recomputed += recommend_users_batch(
+                batch_start, batch_start + batch_size - 1, max_age, recommender
+            )
+
+    logger.info("Recommended users, %s users were recomputed", recomputed)
+    return recomputed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--max-age", type=float, default=RECOMMENDED_USERS_MAX_AGE)
+    parser.add_argument(
+        "--scorer", choices=["sql", "sparse"], default=RECOMMENDED_USERS_SCORER
+    )
+    arguments = parser.parse_args()
+    print(recommend_users(arguments.batch_size, arguments.max_age, arguments.scorer))
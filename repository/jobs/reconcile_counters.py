@@ -0,0 +1,219 @@
+"""
+Job that recomputes the like and repost counters of the contents, and the
+profile counters of the users, and fixes the ones that drifted (e.g. rows
+deleted by a cascade, or a write that failed half way). It walks the tables
+in batches of ids, so every transaction is short and the tables are never
+locked as a whole.
+
+Usage:
+    PYTHONPATH=. python repository/jobs/reconcile_counters.py --batch-size 1000
+"""
+import argparse
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.common_setup import *
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.tables.posts import Content, Like, Post, UserCounters
+from repository.tables.users import User
+
+from control.utils.logger import logger
+
+BATCH_SIZE = 1000
+
+
+def reconcile_batch(first_content_id, last_content_id):
+    """
+    Fixes the counters of the contents with ids in [first, last] that drifted
+    and returns how many were fixed.
+    """
+    in_batch = Content.content_id.between(first_content_id, last_content_id)
+    likes = (
+        # pylint: disable=E1102
+        select(Like.content_id, func.count().label("amount"))
+        .where(Like.content_id.between(first_content_id, last_content_id))
+        .group_by(Like.content_id)
+        .subquery()
+    )
+    reposts = (
+        # pylint: disable=E1102
+        select(Post.content_id, func.count().label("amount"))
+        .where(
+            Post.content_id.between(first_content_id, last_content_id),
+            Post.user_poster_id != Post.user_creator_id,
+        )
+        .group_by(Post.content_id)
+        .subquery()
+    )
+    real_counts = (
+        select(
+            Content.content_id,
+            func.coalesce(likes.c.amount, 0).label("like_count"),
+            func.coalesce(reposts.c.amount, 0).label("repost_count"),
+        )
+        .outerjoin(likes, likes.c.content_id == Content.content_id)
+        .outerjoin(reposts, reposts.c.content_id == Content.content_id)
+        .where(in_batch)
+        .subquery()
+    )
+    result = session.execute(
+        update(Content)
+        .where(
+            Content.content_id == real_counts.c.content_id,
+            or_(
+                Content.like_count != real_counts.c.like_count,
+                Content.repost_count != real_counts.c.repost_count,
+            ),
+        )
+        .values(
+            like_count=real_counts.c.like_count,
+            repost_count=real_counts.c.repost_count,
+        )
+    )
+    session.commit()
+    return result.rowcount
+
+
+def reconcile_counters(batch_size=BATCH_SIZE):
+    """
+    Reconciles the counters of every content, batch by batch.
+    Returns how many contents had their counters fixed.
+    """
+    first_id, last_id = session.execute(
+        select(func.min(Content.content_id), func.max(Content.content_id))
+    ).one()
+    if first_id is None:
+        return 0
+
+    fixed = 0
+    for batch_start in range(first_id, last_id + 1, batch_size):
+        fixed += reconcile_batch(batch_start, batch_start + batch_size - 1)
+
+    logger.info("Reconciled content counters, %s contents were fixed", fixed)
+    return fixed
+
+
+def count_posts_by(user_column, in_batch, *conditions):
+    """
+    Returns the subquery (user_id, amount) of the posts in the batch
+    counted by user_column
+    """
+    return (
+        # pylint: disable=E1102
+        select(user_column.label("user_id"), func.count().label("amount"))
+        .where(in_batch(user_column), *conditions)
+        .group_by(user_column)
+        .subquery()
+    )
+
+
+def reconcile_user_batch(first_user_id, last_user_id):
+    """
+    Fixes the profile counters of the users with ids in [first, last] that
+    drifted (creating the missing ones) and returns how many were fixed.
+    """
+
+    def in_batch(column):
+        return column.between(first_user_id, last_user_id)
+
+    posts = count_posts_by(
+        Post.user_poster_id, in_batch, Post.user_poster_id == Post.user_creator_id
+    )
+    reposts = count_posts_by(
+        Post.user_poster_id, in_batch, Post.user_poster_id != Post.user_creator_id
+    )
+    likes = (
+        # pylint: disable=E1102
+        select(Post.user_creator_id.label("user_id"), func.count().label("amount"))
+        .join(Like, Like.content_id == Post.content_id)
+        .where(
+            in_batch(Post.user_creator_id),
+            Post.user_poster_id == Post.user_creator_id,
+        )
+        .group_by(Post.user_creator_id)
+        .subquery()
+    )
+    real_counts = (
+        select(
+            User.id,
+            func.coalesce(posts.c.amount, 0),
+            func.coalesce(reposts.c.amount, 0),
+            func.coalesce(likes.c.amount, 0),
+        )
+        .outerjoin(posts, posts.c.user_id == User.id)
+        .outerjoin(reposts, reposts.c.user_id == User.id)
+        .outerjoin(likes, likes.c.user_id == User.id)
+        .where(
+            in_batch(User.id),
+            or_(
+                posts.c.amount.isnot(None),
+                reposts.c.amount.isnot(None),
+                likes.c.amount.isnot(None),
+            ),
+        )
+    )
+    statement = insert(UserCounters).from_select(
+        ["user_id", "posts_count", "reposts_count", "likes_received"], real_counts
+    )
+    result = session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[UserCounters.user_id],
+            set_={
+                "posts_count": statement.excluded.posts_count,
+                "reposts_count": statement.excluded.reposts_count,
+                "likes_received": statement.excluded.likes_received,
+            },
+            where=or_(
+                UserCounters.posts_count != statement.excluded.posts_count,
+                UserCounters.reposts_count != statement.excluded.reposts_count,
+                UserCounters.likes_received != statement.excluded.likes_received,
+            ),
+        )
+    )
+    # the users that have counters but nothing to count anymore
+    stale = session.execute(
+        update(UserCounters)
+        .where(
+            in_batch(UserCounters.user_id),
+            ~UserCounters.user_id.in_(select(posts.c.user_id)),
+            ~UserCounters.user_id.in_(select(reposts.c.user_id)),
+            ~UserCounters.user_id.in_(select(likes.c.user_id)),
+            or_(
+                UserCounters.posts_count != 0,
+                UserCounters.reposts_count != 0,
+                UserCounters.likes_received != 0,
+            ),
+        )
+        .values(posts_count=0, reposts_count=0, likes_received=0)
+    )
+    session.commit()
+    return result.rowcount + stale.rowcount
+
+
+def reconcile_user_counters(batch_size=BATCH_SIZE):
+    """
+    Reconciles the profile counters of every user, batch by batch.
+    Returns how many users had their counters fixed.
+    """
+    first_id, last_id = session.execute(
+        select(func.min(User.id), func.max(User.id))
+    ).one()
+    if first_id is None:
+        return 0
+
+    fixed = 0
+    for batch_start in range(first_id, last_id + 1, batch_size):
+        fixed += reconcile_user_batch(batch_start, batch_start + batch_size - 1)
+
+    logger.info("Reconciled user counters, %s users were fixed", fixed)
+    return fixed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    arguments = parser.parse_args()
+    print(reconcile_counters(arguments.batch_size))
+    print(reconcile_user_counters(arguments.batch_size))
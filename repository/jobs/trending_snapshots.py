@@ -0,0 +1,138 @@
+"""
+Job that computes on the database the trending topics of the standard
+windows (TRENDING_SNAPSHOT_DAYS days, by count and by decayed score) and
+writes them to trending_snapshots, where GET /trending_topics reads them
+from (see repository/queries/queries_trending_topic.py).
+
+The app runs it every TRENDING_SNAPSHOT_SECONDS, with schedule, in a thread
+of every worker: a run takes a Postgres advisory lock for its transaction,
+and doesn't compute anything if another worker holds it or wrote snapshots
+less than half the interval ago, so only one of the workers computes them
+each time. How long every run took is logged and stored with the snapshots.
+
+Usage:
+    PYTHONPATH=. python repository/jobs/trending_snapshots.py
+    PYTHONPATH=. python repository/jobs/trending_snapshots.py --every 60
+"""
+import argparse
+import threading
+import time
+from datetime import datetime, timedelta
+import schedule
+from sqlalchemy import delete, func, select
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.common_setup import *
+from repository.queries.queries_trending_topic import (
+    TRENDING_MAX_DAYS,
+    TRENDING_SNAPSHOT_DAYS,
+    TRENDING_SNAPSHOT_SECONDS,
+    TRENDING_SNAPSHOT_SIZE,
+    query_trending_topics_decayed,
+    query_trending_topics_with_count,
+)
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.tables.posts import TrendingSnapshot
+
+from control.utils.logger import logger
+
+# key of the advisory lock, the same in every worker
+SNAPSHOTS_LOCK_KEY = 7482697868
+
+
+def compute_trending_snapshots():
+    """
+    Returns the (days, score, topics) of every standard window, the topics
+    as [hashtag, posts, score]
+    """
+    snapshots = []
+    for days in TRENDING_SNAPSHOT_DAYS:
+        counted = query_trending_topics_with_count(0, TRENDING_SNAPSHOT_SIZE, days)
+        snapshots.append(
+            (days, "count", [[hashtag, posts, None] for hashtag, posts in counted])
+        )
+        if days <= TRENDING_MAX_DAYS:
+            decayed = query_trending_topics_decayed(0, TRENDING_SNAPSHOT_SIZE, days)
+            snapshots.append((days, "decayed", [list(topic) for topic in decayed]))
+    return snapshots
+
+
+def snapshot_trending_topics(every_seconds=0):
+    """
+    Computes and writes the snapshots, unless another worker is doing it or
+    the last ones are less than half of every_seconds old. Returns whether
+    it wrote them.
+    """
+    start = time.monotonic()
+    started_at = datetime.utcnow()
+    with request_session_scope():
+        # released when the transaction ends
+        if not session.execute(
+            select(func.pg_try_advisory_xact_lock(SNAPSHOTS_LOCK_KEY))
+        ).scalar():
+            return False
+        newest = session.query(func.max(TrendingSnapshot.computed_at)).scalar()
+        if newest is not None and newest > started_at - timedelta(
+            seconds=every_seconds / 2
+        ):
+            return False
+        snapshots = compute_trending_snapshots()
+        duration = time.monotonic() - start
+        session.execute(delete(TrendingSnapshot))
+        session.add_all(
+            TrendingSnapshot(days, score, topics, started_at, duration)
+            for days, score, topics in snapshots
+        )
+        session.commit()
+    logger.info("Computed the trending snapshots in %.2f s", duration)
+    return True
+
+
+def run_trending_snapshots(every_seconds, stop=None):
+    """
+    Runs the job now and every every_seconds, until stop (an Event) is set
+    """
+    scheduler = schedule.Scheduler()
+    scheduler.every(every_seconds).seconds.do(_run_logging_errors, every_seconds)
+    scheduler.run_all()
+    stop = stop or threading.Event()
+    while not stop.wait(min(1, every_seconds)):
+        scheduler.run_pending()
+
+
+def _run_logging_errors(every_seconds):
+    try:
+        snapshot_trending_topics(every_seconds)
+    except Exception as error:  # pylint: disable=W0718
+        logger.error("The trending snapshots job failed: %s", str(error))
+
+
+def start_trending_snapshots(stop):
+    """
+    Runs the job every TRENDING_SNAPSHOT_SECONDS in a thread of this
+    process (if it's not 0), until stop (an Event) is set
+    """
+    if TRENDING_SNAPSHOT_SECONDS > 0:
+        threading.Thread(
+            target=run_trending_snapshots,
+            args=(TRENDING_SNAPSHOT_SECONDS, stop),
+            daemon=True,
+        ).start()
+
+
+def main():
+    """
+    Runs the job once, or every --every seconds
+    """
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--every", type=float, default=0)
+    args = parser.parse_args()
+    if args.every:
+        run_trending_snapshots(args.every)
+    else:
+        snapshot_trending_topics()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# pylint: skip-file
+"""hashtag normalizado para las busquedas
+
+Revision ID: 2e6f8a0b4c57
+Revises: 7d4b9e3c2a18
+Create Date: 2026-10-18 16:05:41.208519
+
+hashtag_normalized is a stored generated column (lowercase, without the
+leading #), so every write path and the bulk inserts fill it. Adding it
+rewrites the hashtags table once. The index is built with CREATE INDEX
+CONCURRENTLY afterwards (outside of the transaction), with text_pattern_ops
+so that the prefix searches (LIKE 'foot%') use it too.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "2e6f8a0b4c57"
+down_revision: Union[str, None] = "7d4b9e3c2a18"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "hashtags",
+        sa.Column(
+            "hashtag_normalized",
+            sa.String(length=75),
+            sa.Computed("lower(ltrim(hashtag, '#'))", persisted=True),
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_hashtags_hashtag_normalized",
+            "hashtags",
+            ["hashtag_normalized", "content_id"],
+            postgresql_ops={"hashtag_normalized": "text_pattern_ops"},
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_hashtags_hashtag_normalized",
+            table_name="hashtags",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+    op.drop_column("hashtags", "hashtag_normalized")
@@ -0,0 +1,53 @@
+# pylint: skip-file
+"""contadores de likes y reposts en la tabla de contents
+
+Revision ID: 3f9a1c2d7b64
+Revises: eaa861baac9d
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "3f9a1c2d7b64"
+down_revision: Union[str, None] = "eaa861baac9d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "contents",
+        sa.Column("like_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "contents",
+        sa.Column("repost_count", sa.Integer(), nullable=False, server_default="0"),
+    )
+    # backfill of the counters with the rows that already exist
+    op.execute(
+        """
+        UPDATE contents SET like_count = counts.amount
+        FROM (SELECT content_id, count(*) AS amount FROM likes GROUP BY content_id)
+        AS counts
+        WHERE contents.content_id = counts.content_id
+        """
+    )
+    op.execute(
+        """
+        UPDATE contents SET repost_count = counts.amount
+        FROM (
+            SELECT content_id, count(*) AS amount FROM posts
+            WHERE user_poster_id != user_creator_id GROUP BY content_id
+        ) AS counts
+        WHERE contents.content_id = counts.content_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("contents", "repost_count")
+    op.drop_column("contents", "like_count")
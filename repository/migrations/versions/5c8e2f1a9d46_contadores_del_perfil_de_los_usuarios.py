@@ -0,0 +1,62 @@
+# pylint: skip-file
+"""contadores del perfil de los usuarios (posts, reposts y likes recibidos)
+
+Revision ID: 5c8e2f1a9d46
+Revises: 9b2e5d4c1a73
+Create Date: 2026-10-18 13:05:27.641093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "5c8e2f1a9d46"
+down_revision: Union[str, None] = "9b2e5d4c1a73"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_counters",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("posts_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("reposts_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("likes_received", sa.Integer(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    # backfill of the counters of the users that already have posts or likes
+    op.execute(
+        """
+        INSERT INTO user_counters (user_id, posts_count, reposts_count, likes_received)
+        SELECT users.id,
+               coalesce(posts.amount, 0),
+               coalesce(reposts.amount, 0),
+               coalesce(likes.amount, 0)
+        FROM users
+        LEFT JOIN (
+            SELECT user_poster_id AS user_id, count(*) AS amount FROM posts
+            WHERE user_poster_id = user_creator_id GROUP BY user_poster_id
+        ) AS posts ON posts.user_id = users.id
+        LEFT JOIN (
+            SELECT user_poster_id AS user_id, count(*) AS amount FROM posts
+            WHERE user_poster_id != user_creator_id GROUP BY user_poster_id
+        ) AS reposts ON reposts.user_id = users.id
+        LEFT JOIN (
+            SELECT posts.user_creator_id AS user_id, count(*) AS amount
+            FROM likes JOIN posts ON posts.content_id = likes.content_id
+            AND posts.user_poster_id = posts.user_creator_id
+            GROUP BY posts.user_creator_id
+        ) AS likes ON likes.user_id = users.id
+        WHERE posts.amount IS NOT NULL
+           OR reposts.amount IS NOT NULL
+           OR likes.amount IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_counters")
@@ -0,0 +1,85 @@
+# pylint: skip-file
+"""busqueda de texto completo en los contenidos
+
+Revision ID: 6a1d3f5e7b92
+Revises: 2e6f8a0b4c57
+Create Date: 2026-10-18 17:31:26.640182
+
+contents.text_search is a stored generated tsvector (spanish configuration,
+see TEXT_SEARCH_CONFIG), so create_post and update_post don't have to
+maintain it. Adding it rewrites the contents table once. The indexes are
+built with CREATE INDEX CONCURRENTLY afterwards:
+
+- ix_contents_text_search: GIN of text_search, for websearch_to_tsquery.
+- ix_contents_text_trgm: GIN trigram index of text (gin_trgm_ops), for the
+  substring fallback (text ILIKE '%...%'). Only if the server has the pg_trgm
+  extension, without it the fallback is a sequential scan as before. The
+  extension is left installed on downgrade.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = "6a1d3f5e7b92"
+down_revision: Union[str, None] = "2e6f8a0b4c57"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def has_pg_trgm():
+    return (
+        op.get_bind()
+        .execute(
+            sa.text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        )
+        .scalar()
+        is not None
+    )
+
+
+def upgrade() -> None:
+    trigrams = has_pg_trgm()
+    if trigrams:
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.add_column(
+        "contents",
+        sa.Column(
+            "text_search",
+            postgresql.TSVECTOR(),
+            sa.Computed("to_tsvector('spanish', coalesce(text, ''))", persisted=True),
+        ),
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_contents_text_search",
+            "contents",
+            ["text_search"],
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        if trigrams:
+            op.create_index(
+                "ix_contents_text_trgm",
+                "contents",
+                ["text"],
+                postgresql_using="gin",
+                postgresql_ops={"text": "gin_trgm_ops"},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in ["ix_contents_text_trgm", "ix_contents_text_search"]:
+            op.drop_index(
+                name,
+                table_name="contents",
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    op.drop_column("contents", "text_search")
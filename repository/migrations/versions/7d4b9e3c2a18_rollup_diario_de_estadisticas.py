@@ -0,0 +1,38 @@
+# pylint: skip-file
+"""rollup diario de las estadisticas de los usuarios
+
+Revision ID: 7d4b9e3c2a18
+Revises: 5c8e2f1a9d46
+Create Date: 2026-10-18 14:22:09.115873
+
+The table starts empty, fill it with the history running
+repository/jobs/backfill_daily_stats.py after the upgrade.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "7d4b9e3c2a18"
+down_revision: Union[str, None] = "5c8e2f1a9d46"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_daily_stats",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("posts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("reposts_made", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("reposts_received", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("likes_received", sa.Integer(), nullable=False, server_default="0"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "day"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("user_daily_stats")
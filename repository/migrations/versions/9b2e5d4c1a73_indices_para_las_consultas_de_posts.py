@@ -0,0 +1,65 @@
+# pylint: skip-file
+"""indices para las consultas de posts, hashtags y seguidores
+
+Revision ID: 9b2e5d4c1a73
+Revises: 3f9a1c2d7b64
+Create Date: 2026-10-18 11:40:12.527311
+
+The indexes are built with CREATE INDEX CONCURRENTLY, so the tables are not
+locked for writes while they are built (it can't run inside a transaction,
+hence the autocommit block). If a build fails the index is left INVALID:
+drop it and run the migration again.
+
+likes(user_id), favorites(user_id), mentions(user_mention_id),
+device_tokens(user_id) and users(email) are not here, their unique
+constraints already have an index that starts with that column.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "9b2e5d4c1a73"
+down_revision: Union[str, None] = "3f9a1c2d7b64"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    # profile, feed (posts of the followed users) and the viewer reposts
+    (
+        "ix_posts_user_poster_id_created_at",
+        "posts",
+        ["user_poster_id", sa.text("created_at DESC")],
+    ),
+    # statistics (reposts of my content) and the recommendations
+    ("ix_posts_user_creator_id_created_at", "posts", ["user_creator_id", "created_at"]),
+    # hydration, repost counts and the deletes of a content
+    ("ix_posts_content_id", "posts", ["content_id"]),
+    # posts of interest and the admin listing, ordered by date
+    ("ix_posts_created_at", "posts", [sa.text("created_at DESC")]),
+    # search by hashtag, trending topics and the interests of the feed
+    ("ix_hashtags_hashtag_created_at", "hashtags", ["hashtag", "created_at"]),
+    # followers of a user
+    ("ix_following_following_id", "following", ["following_id"]),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table, postgresql_concurrently=True, if_exists=True
+            )
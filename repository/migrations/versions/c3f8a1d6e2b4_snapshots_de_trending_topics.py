@@ -0,0 +1,36 @@
+# pylint: skip-file
+"""snapshots de los trending topics
+
+Revision ID: c3f8a1d6e2b4
+Revises: 6a1d3f5e7b92
+Create Date: 2026-10-18 19:04:51.208317
+
+Filled by repository/jobs/trending_snapshots.py (run by one of the workers
+of the app, or by hand), until then the trending topics are computed live.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "c3f8a1d6e2b4"
+down_revision: Union[str, None] = "6a1d3f5e7b92"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "trending_snapshots",
+        sa.Column("days", sa.Integer(), nullable=False),
+        sa.Column("score", sa.String(length=16), nullable=False),
+        sa.Column("topics", sa.JSON(), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.Column("duration_seconds", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("days", "score"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("trending_snapshots")
@@ -0,0 +1,48 @@
+# pylint: skip-file
+"""usuarios recomendados precalculados
+
+Revision ID: d8e2b6f4a1c9
+Revises: c3f8a1d6e2b4
+Create Date: 2026-10-18 21:12:37.540118
+
+Filled by repository/jobs/recommend_users.py, until it runs for a user their
+recommended users are computed live.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "d8e2b6f4a1c9"
+down_revision: Union[str, None] = "c3f8a1d6e2b4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "recommended_users",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("recommended_id", sa.Integer(), nullable=False),
+        sa.Column("mutual_friends", sa.Integer(), nullable=False),
+        sa.Column("location_shared", sa.Integer(), nullable=False),
+        sa.Column("interest_posts", sa.Integer(), nullable=False),
+        sa.Column("interest_likes", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["recommended_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id", "recommended_id"),
+    )
+    op.create_table(
+        "recommendation_fingerprints",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("fingerprint", sa.String(length=32), nullable=False),
+        sa.Column("computed_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("recommendation_fingerprints")
+    op.drop_table("recommended_users")
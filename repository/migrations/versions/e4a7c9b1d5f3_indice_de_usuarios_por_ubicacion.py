@@ -0,0 +1,42 @@
+# pylint: skip-file
+"""indice de usuarios por ubicacion
+
+Revision ID: e4a7c9b1d5f3
+Revises: d8e2b6f4a1c9
+Create Date: 2026-10-18 22:31:09.663142
+
+The candidates of the same location of the recommended users are the
+newest users of the location, read from this index (built with CREATE
+INDEX CONCURRENTLY, outside of the transaction).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "e4a7c9b1d5f3"
+down_revision: Union[str, None] = "d8e2b6f4a1c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_users_location_id",
+            "users",
+            ["location", sa.text("id DESC")],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            "ix_users_location_id",
+            table_name="users",
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,139 @@
+# pool.py
+"""
+Connection pool used by the database engines.
+
+The pool is instrumented so that the checkout wait time and the saturation
+of every engine are exported as metrics, that way the amount of workers and
+connections can be sized from data.
+"""
+import threading
+import time
+
+from opentelemetry.metrics import Observation
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from control.utils.metrics import meter
+
+_engines = {}
+
+checkout_wait_histogram = meter.create_histogram(
+    "db.pool.checkout_wait",
+    unit="ms",
+    description="Time spent waiting for a connection from the pool",
+)
+
+checkout_timeouts_counter = meter.create_counter(
+    "db.pool.checkout_timeouts",
+    description="Checkouts that gave up after waiting pool_timeout seconds",
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that measures how long each checkout waits for a connection.
+    """
+
+    def __init__(self, creator, **kw):
+        super().__init__(creator, **kw)
+        self._stats_lock = threading.Lock()
+        self.checkout_count = 0
+        self.checkout_timeouts = 0
+        self.checkout_wait_total_ms = 0.0
+        self.checkout_wait_max_ms = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.checkout_timeouts += 1
+            checkout_timeouts_counter.add(1)
+            raise
+        finally:
+            self._record_wait((time.perf_counter() - start) * 1000)
+
+    def _record_wait(self, wait_ms):
+        with self._stats_lock:
+            self.checkout_count += 1
+            self.checkout_wait_total_ms += wait_ms
+            self.checkout_wait_max_ms = max(self.checkout_wait_max_ms, wait_ms)
+        checkout_wait_histogram.record(wait_ms)
+
+    def capacity(self):
+        """
+        Max amount of connections this pool can hand out at the same time
+        """
+        return self.size() + max(self._max_overflow, 0)
+
+    def saturation(self):
+        """
+        Fraction (0 to 1) of the capacity that is currently checked out
+        """
+        capacity = self.capacity()
+        if capacity == 0:
+            return 0.0
+        return self.checkedout() / capacity
+
+
+class InstrumentedAsyncQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """
+    Same as InstrumentedQueuePool, for the engines of the async (asyncpg) path.
+    """
+
+
+def register_engine(name, engine):
+    """
+    Registers the engine so its pool gets exported in the metrics
+    and in the pool status.
+    """
+    _engines[name] = engine
+
+
+def get_pool_status():
+    """
+    Returns the current status of the pool of every registered engine
+    """
+    status = {}
+    for name, engine in _engines.items():
+        pool = engine.pool
+        if not isinstance(pool, InstrumentedQueuePool):
+            continue
+        count = pool.checkout_count
+        status[name] = {
+            "size": pool.size(),
+            "max_overflow": pool._max_overflow,  # pylint: disable=W0212
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "saturation": round(pool.saturation(), 3),
+            "checkouts": count,
+            "checkout_timeouts": pool.checkout_timeouts,
+            "checkout_wait_avg_ms": (
+                round(pool.checkout_wait_total_ms / count, 3) if count else 0.0
+            ),
+            "checkout_wait_max_ms": round(pool.checkout_wait_max_ms, 3),
+        }
+    return status
+
+
+def _observe(field):
+    def callback(_options):
+        return [
+            Observation(values[field], {"pool": name})
+            for name, values in get_pool_status().items()
+        ]
+
+    return callback
+
+
+meter.create_observable_gauge(
+    "db.pool.checked_out",
+    callbacks=[_observe("checked_out")],
+    description="Connections currently checked out of the pool",
+)
+meter.create_observable_gauge(
+    "db.pool.saturation",
+    callbacks=[_observe("saturation")],
+    description="Checked out connections over pool_size + max_overflow",
+)
@@ -3,19 +3,185 @@
 Archivo con configuracion de la base de datos
 """
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker, scoped_session, Session as SessionBase
 
 # pylint: disable=C0114, W0401, W0614, E0401
 from repository.tables.users import Base
+from repository.pool import InstrumentedQueuePool, register_engine
+
+# Pool settings, they can be tuned per deploy from the env vars
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Read replicas (comma separated uris), if there are none everything goes
+# to the primary. After a write, the reads of that user keep going to the
+# primary for READ_YOUR_WRITES_SECONDS so they always see what they just did.
+REPLICA_URIS = [
+    uri.strip() for uri in os.environ.get("DB_REPLICA_URIS", "").split(",") if uri
+]
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("DB_READ_YOUR_WRITES_SECONDS", "5"))
+READ_REPLICA_OPTION = "read_replica"
+
+
+def create_pooled_engine(uri):
+    """
+    Creates an engine backed by an explicitly sized (and instrumented) QueuePool
+    """
+    return create_engine(
+        uri,
+        poolclass=InstrumentedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+    )
+
 
 # Creating engines
-engine_posts = create_engine(os.environ.get("DB_URI"))
+engine_posts = create_pooled_engine(os.environ.get("DB_URI"))
+register_engine("primary", engine_posts)
+
+engine_replicas = [create_pooled_engine(uri) for uri in REPLICA_URIS]
+for _number, _engine_replica in enumerate(engine_replicas):
+    register_engine(f"replica_{_number}", _engine_replica)
 
 # Creating the tables in the database
 Base.metadata.create_all(engine_posts)
 
+_replica_turn = itertools.count()
+_last_write_by_user = {}
+_last_write_lock = threading.Lock()
+
+
+def mark_write(user_id):
+    """
+    Registers that this user just wrote, so their reads go to the primary
+    during the read-your-writes window.
+    """
+    now = time.monotonic()
+    with _last_write_lock:
+        _last_write_by_user[user_id] = now
+        if len(_last_write_by_user) > 10000:
+            for user, written_at in list(_last_write_by_user.items()):
+                if now - written_at > READ_YOUR_WRITES_SECONDS:
+                    del _last_write_by_user[user]
+
+
+def wrote_recently(user_id):
+    """
+    Returns True if the user is inside their read-your-writes window
+    """
+    written_at = _last_write_by_user.get(user_id)
+    return (
+        written_at is not None
+        and time.monotonic() - written_at <= READ_YOUR_WRITES_SECONDS
+    )
+
+
+def read_from_replica(query, user_id=None):
+    """
+    Marks the query as read only, so it can be run on a replica.
+    user_id is the user that reads, if they wrote recently it goes to the primary.
+    The query is not run, so it can be marked when built and executed later.
+    """
+    return query.execution_options(**{READ_REPLICA_OPTION: user_id or True})
+
+
+# pylint: disable=R0903
+class RoutingSession(SessionBase):
+    """
+    Session that sends the queries marked with read_from_replica to one
+    of the replicas (round robin) and everything else (writes, flushes and
+    the reads that were not marked) to the primary.
+    """
+
+    # pylint: disable=W0613
+    def get_bind(self, mapper=None, clause=None, **kw):
+        """
+        Returns the engine where the clause has to be run
+        """
+        if engine_replicas and clause is not None and not self._flushing:
+            reader = clause.get_execution_options().get(READ_REPLICA_OPTION)
+            if reader is True or (reader is not None and not wrote_recently(reader)):
+                return engine_replicas[next(_replica_turn) % len(engine_replicas)]
+        return engine_posts
+
+
+# Every request gets its own session (see request_session_scope). Outside of a
+# request (tests, scripts, jobs) the session is per thread.
+_request_scope = ContextVar("db_request_scope", default=None)
+_request_ids = itertools.count()
+
+
+def _current_scope():
+    scope = _request_scope.get()
+    if scope is None:
+        return threading.get_ident()
+    return scope
+
+
 # Session is the handle of the database
-Session = sessionmaker(bind=engine_posts)
-session = Session()
+Session = sessionmaker(bind=engine_posts, class_=RoutingSession)
+session = scoped_session(Session, scopefunc=_current_scope)
 TIMEOUT = 60
+
+
+@contextmanager
+def request_session_scope():
+    """
+    Makes every use of `session` inside this context use a brand new session,
+    that is closed (and its connection returned to the pool) when it ends.
+    A failure inside one request can't poison the session of the others.
+    """
+    token = _request_scope.set(next(_request_ids))
+    try:
+        yield session
+    finally:
+        session.remove()
+        _request_scope.reset(token)
+
+
+@contextmanager
+def snapshot_session_scope():
+    """
+    request_session_scope in a REPEATABLE READ transaction, so that every
+    query inside it sees the same snapshot of the database. It yields the
+    snapshot, to tell which transactions it sees (see snapshot_sees).
+    """
+    with request_session_scope():
+        session.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        xmin, xmax, in_progress = (
+            session.execute(select(func.txid_current_snapshot())).scalar().split(":")
+        )
+        yield int(xmin), int(xmax), {
+            int(txid) for txid in in_progress.split(",") if txid
+        }
+
+
+def current_transaction_id():
+    """
+    Returns the id of the transaction of the session (it gets one if it
+    didn't have it yet), call it before the commit
+    """
+    return session.execute(select(func.txid_current())).scalar()
+
+
+def snapshot_sees(snapshot, transaction_id):
+    """
+    Returns True if what the transaction wrote is in the snapshot (of
+    snapshot_session_scope): it was committed before the snapshot was taken
+    """
+    xmin, xmax, in_progress = snapshot
+    return transaction_id < xmin or (
+        transaction_id < xmax and transaction_id not in in_progress
+    )
@@ -0,0 +1,49 @@
+# pylint: disable=R0801
+"""
+Archivo con configuracion de la base de datos para el camino asincronico
+(SQLAlchemy asyncio + asyncpg). Por ahora solo lo usan las lecturas,
+las escrituras siguen usando el engine sincronico de common_setup.
+"""
+import os
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.queries.common_setup import (
+    POOL_SIZE,
+    POOL_MAX_OVERFLOW,
+    POOL_TIMEOUT,
+    POOL_RECYCLE,
+    POOL_PRE_PING,
+)
+from repository.pool import InstrumentedAsyncQueuePool, register_engine
+
+
+def to_async_uri(uri):
+    """
+    Returns the same database uri but using the asyncpg driver
+    """
+    return make_url(uri).set(drivername="postgresql+asyncpg")
+
+
+def create_pooled_async_engine(uri):
+    """
+    Creates an async engine with the same pool settings as the sync one
+    """
+    return create_async_engine(
+        to_async_uri(uri),
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+    )
+
+
+async_engine_posts = create_pooled_async_engine(os.environ.get("DB_URI"))
+register_engine("primary_async", async_engine_posts)
+
+# SessionAsync is the handle of the database for the async path
+# pylint: disable=C0103
+SessionAsync = async_sessionmaker(async_engine_posts, expire_on_commit=False)
@@ -0,0 +1,151 @@
+"""
+Autocomplete of hashtags (#) and usernames (@) from the indexes in the
+memory of the process (see repository/autocomplete.py).
+
+The indexes are built from the database the first time they are read (and
+when the app starts): the hashtags weighted by their uses in the last
+AUTOCOMPLETE_DAYS days and the usernames by their mentions in them. The
+hashtags and mentions that are written are added right away, but every
+worker process has its own indexes, so the ones written through another
+worker show up when the indexes are built again (in the background, once
+they are older than AUTOCOMPLETE_REBUILD_SECONDS).
+"""
+import datetime
+import os
+import time
+from sqlalchemy import func
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.common_setup import *
+from repository.queries.subqueries_get import normalize_hashtag
+from repository.autocomplete import CompletionIndex
+from repository.cache import RebuiltValue
+from repository.errors import InvalidAutocompleteQuery
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.tables.posts import Hashtag, Mention
+from repository.tables.users import User
+
+from control.utils.logger import logger
+
+# memory budget of each index (hashtags and usernames), in bytes
+AUTOCOMPLETE_MAX_BYTES = int(
+    os.environ.get("AUTOCOMPLETE_MAX_BYTES", str(64 * 1024 * 1024))
+)
+AUTOCOMPLETE_DAYS = int(os.environ.get("AUTOCOMPLETE_DAYS", "30"))
+AUTOCOMPLETE_REBUILD_SECONDS = float(
+    os.environ.get("AUTOCOMPLETE_REBUILD_SECONDS", "3600")
+)
+
+
+def query_hashtag_weights(since):
+    """
+    Returns the (key, value, weight) of every hashtag: the normalized
+    hashtag, with its # and its uses since the date
+    """
+    uses = func.count().filter(Hashtag.created_at >= since)
+    return [
+        (hashtag, "#" + hashtag, weight)
+        for hashtag, weight in session.query(Hashtag.hashtag_normalized, uses)
+        .group_by(Hashtag.hashtag_normalized)
+        .yield_per(10000)
+    ]
+
+
+def query_username_weights(since):
+    """
+    Returns the (key, value, weight) of every username: the lowercase
+    username, the username and the times they were mentioned since the date
+    """
+    mentions = func.count(Mention.content_id).filter(Mention.created_at >= since)
+    return [
+        (username.lower(), username, weight)
+        for username, weight in session.query(User.username, mentions)
+        .outerjoin(Mention, Mention.user_mention_id == User.id)
+        .group_by(User.id, User.username)
+        .yield_per(10000)
+    ]
+
+
+def build_autocomplete_indexes():
+    """
+    Returns the indexes ("#" and "@" -> CompletionIndex) built from the
+    database (in a session of their own, it may run in the background) and
+    the snapshot they were built from
+    """
+    start = time.monotonic()
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=AUTOCOMPLETE_DAYS)
+    with snapshot_session_scope() as snapshot:
+        indexes = {
+            "#": CompletionIndex(query_hashtag_weights(since), AUTOCOMPLETE_MAX_BYTES),
+            "@": CompletionIndex(query_username_weights(since), AUTOCOMPLETE_MAX_BYTES),
+        }
+    logger.info(
+        "Built the autocomplete indexes (%s hashtags, %s usernames) in %.2f s",
+        len(indexes["#"]),
+        len(indexes["@"]),
+        time.monotonic() - start,
+    )
+    return indexes, snapshot
+
+
+autocomplete_indexes = RebuiltValue(
+    build_autocomplete_indexes, AUTOCOMPLETE_REBUILD_SECONDS, snapshot_sees
+)
+
+
+def autocomplete_uses_of(content_id):
+    """
+    Returns the (hashtags, usernames) of the hashtags and mentions of the
+    content that the indexes count (the ones of the last AUTOCOMPLETE_DAYS),
+    empty (without running the queries) if the indexes are not built.
+    Call it before they are deleted.
+    """
+    if autocomplete_indexes.current() is None:
+        return [], []
+    since = datetime.datetime.utcnow() - datetime.timedelta(days=AUTOCOMPLETE_DAYS)
+    hashtags = [
+        hashtag
+        for (hashtag,) in session.query(Hashtag.hashtag_normalized).filter(
+            Hashtag.content_id == content_id, Hashtag.created_at >= since
+        )
+    ]
+    usernames = [
+        username
+        for (username,) in session.query(User.username)
+        .join(Mention, Mention.user_mention_id == User.id)
+        .filter(Mention.content_id == content_id, Mention.created_at >= since)
+    ]
+    return hashtags, usernames
+
+
+def add_to_autocomplete(transaction_id, hashtags=(), usernames=(), sign=1):
+    """
+    Adds a use to each hashtag and a mention to each username, if the indexes
+    are built, or takes them back with sign -1. Call it after the commit,
+    with the id of the transaction that wrote them (current_transaction_id).
+    """
+    hashtags = [normalize_hashtag(hashtag) for hashtag in hashtags]
+    usernames = list(usernames)
+
+    def add_to_indexes(indexes):
+        for key in hashtags:
+            indexes["#"].add(key, "#" + key, sign)
+        for username in usernames:
+            indexes["@"].add(username.lower(), username, sign)
+
+    autocomplete_indexes.update(add_to_indexes, transaction_id)
+
+
+def get_completions(text, amount):
+    """
+    Returns the (up to) amount completions of the text, that starts with #
+    (hashtags) or @ (usernames), as (completion, weight), the most used first
+    """
+    if len(text) < 2 or text[0] not in ("#", "@"):
+        raise InvalidAutocompleteQuery()
+    if text[0] == "#":
+        prefix = normalize_hashtag(text)
+    else:
+        prefix = text[1:].strip().lower()
+    return autocomplete_indexes.get()[text[0]].complete(prefix, amount)
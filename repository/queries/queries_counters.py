@@ -0,0 +1,209 @@
+"""
+Queries for the like and repost counters stored on the contents table, the
+profile counters of every user (user_counters) and their daily rollup of
+statistics (user_daily_stats).
+
+They are updated with a single UPDATE or upsert (so concurrent writes never
+lose an increment) that is not committed: the caller commits it together
+with the post / like / repost that changes them, so a failure leaves both
+untouched. The reconciliation job fixes them if they ever drift.
+"""
+from sqlalchemy import DateTime, cast, func, literal, select, union_all, update
+from sqlalchemy.dialects.postgresql import insert
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.common_setup import *
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.tables.posts import Content, Like, Post, UserCounters, UserDailyStats
+
+STATISTICS = ["posts", "reposts_made", "reposts_received", "likes_received"]
+
+
+def add_to_like_count(content_id, amount):
+    """
+    Adds amount (1 or -1) to the likes counter of the content.
+    It doesnt commit, it's part of the transaction of the like.
+    """
+    session.execute(
+        update(Content)
+        .where(Content.content_id == content_id)
+        .values(like_count=Content.like_count + amount)
+    )
+
+
+def add_to_repost_count(content_id, amount):
+    """
+    Adds amount (1 or -1) to the reposts counter of the content.
+    It doesnt commit, it's part of the transaction of the repost.
+    """
+    session.execute(
+        update(Content)
+        .where(Content.content_id == content_id)
+        .values(repost_count=Content.repost_count + amount)
+    )
+
+
+def add_to_user_counters(user_id, posts=0, reposts=0, likes_received=0):
+    """
+    Adds the amounts to the profile counters of the user (the row is
+    created the first time). It doesnt commit, it's part of the
+    transaction of the write that changes them.
+    """
+    statement = insert(UserCounters).values(
+        user_id=user_id,
+        posts_count=posts,
+        reposts_count=reposts,
+        likes_received=likes_received,
+    )
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[UserCounters.user_id],
+            set_={
+                "posts_count": UserCounters.posts_count + posts,
+                "reposts_count": UserCounters.reposts_count + reposts,
+                "likes_received": UserCounters.likes_received + likes_received,
+            },
+        )
+    )
+
+
+# pylint: disable=too-many-arguments
+def add_to_daily_stats(
+    user_id, day, posts=0, reposts_made=0, reposts_received=0, likes_received=0
+):
+    """
+    Adds the amounts to the statistics of the user on that day (a date, the
+    one the post / repost / like was made, in UTC). It doesnt commit, it's
+    part of the transaction of the write that changes them.
+    """
+    statement = insert(UserDailyStats).values(
+        user_id=user_id,
+        day=day,
+        posts=posts,
+        reposts_made=reposts_made,
+        reposts_received=reposts_received,
+        likes_received=likes_received,
+    )
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=[UserDailyStats.user_id, UserDailyStats.day],
+            set_={
+                "posts": UserDailyStats.posts + posts,
+                "reposts_made": UserDailyStats.reposts_made + reposts_made,
+                "reposts_received": UserDailyStats.reposts_received + reposts_received,
+                "likes_received": UserDailyStats.likes_received + likes_received,
+            },
+        )
+    )
+
+
+def get_daily_stats(user_id, from_day, to_day, reader_id=None):
+    """
+    Returns the rows (day, posts, reposts_made, reposts_received,
+    likes_received) of the user from from_day to to_day (both included),
+    oldest first. The days without activity have no row.
+    """
+    query = (
+        select(
+            UserDailyStats.day,
+            UserDailyStats.posts,
+            UserDailyStats.reposts_made,
+            UserDailyStats.reposts_received,
+            UserDailyStats.likes_received,
+        )
+        .where(
+            UserDailyStats.user_id == user_id,
+            UserDailyStats.day.between(from_day, to_day),
+        )
+        .order_by(UserDailyStats.day)
+    )
+    return session.execute(read_from_replica(query, reader_id)).all()
+
+
+def query_daily_stats_by(user_id, granularity, from_day, to_day):
+    """
+    Returns the select (user_id, bucket, posts, reposts_made,
+    reposts_received, likes_received) of the daily statistics of the user
+    from from_day to to_day (both included), summed by date_trunc(granularity)
+    of the day ("day" or "week")
+    """
+    bucket = func.date_trunc(granularity, cast(UserDailyStats.day, DateTime))
+    return (
+        select(
+            UserDailyStats.user_id,
+            bucket.label("bucket"),
+            *[
+                func.sum(getattr(UserDailyStats, name)).label(name)
+                for name in STATISTICS
+            ],
+        )
+        .where(
+            UserDailyStats.user_id == user_id,
+            UserDailyStats.day.between(from_day, to_day),
+        )
+        .group_by(UserDailyStats.user_id, bucket)
+    )
+
+
+def query_statistics_history(in_users, bucket_of, created_in=None):
+    """
+    Returns the select (user_id, bucket, posts, reposts_made,
+    reposts_received, likes_received) that counts, from the posts, reposts
+    and likes tables, the statistics of the users that pass in_users(user
+    column) grouped by bucket_of(created_at). If created_in is passed, only
+    the rows with created_in(created_at) are counted.
+    """
+
+    def count(statistic, user_column, created_at, *conditions):
+        bucket = bucket_of(created_at)
+        if created_in is not None:
+            conditions += (created_in(created_at),)
+        return (
+            select(
+                user_column.label("user_id"),
+                bucket.label("bucket"),
+                *[
+                    # pylint: disable=E1102
+                    (func.count() if name == statistic else literal(0)).label(name)
+                    for name in STATISTICS
+                ],
+            )
+            .where(in_users(user_column), *conditions)
+            .group_by(user_column, bucket)
+        )
+
+    is_post = Post.user_poster_id == Post.user_creator_id
+    history = union_all(
+        count("posts", Post.user_poster_id, Post.created_at, is_post),
+        count("reposts_made", Post.user_poster_id, Post.created_at, ~is_post),
+        count("reposts_received", Post.user_creator_id, Post.created_at, ~is_post),
+        count(
+            "likes_received",
+            Post.user_creator_id,
+            Like.created_at,
+            Like.content_id == Post.content_id,
+            is_post,
+        ),
+    ).subquery()
+    return select(
+        history.c.user_id,
+        history.c.bucket,
+        *[func.sum(history.c[name]).label(name) for name in STATISTICS],
+    ).group_by(history.c.user_id, history.c.bucket)
+
+
+def get_user_counters(user_id, reader_id=None):
+    """
+    Returns the profile counters of the user
+    {posts_count, reposts_count, likes_received}, all 0 if it has none
+    """
+    query = select(
+        UserCounters.posts_count,
+        UserCounters.reposts_count,
+        UserCounters.likes_received,
+    ).where(UserCounters.user_id == user_id)
+    counters = session.execute(read_from_replica(query, reader_id)).first()
+    if counters is None:
+        return {"posts_count": 0, "reposts_count": 0, "likes_received": 0}
+    return dict(counters._mapping)  # pylint: disable=W0212
@@ -7,8 +7,9 @@ from sqlalchemy.exc import IntegrityError
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from repository.queries.common_setup import *
 from repository.queries.queries_global import execute_delete_query
-from repository.queries.queries_get import get_posts_and_reposts
+from repository.queries.queries_hydration import query_posts_page, hydrate_posts
 from repository.queries.queries_get import is_public
+from repository.queries.queries_viewer_state import update_viewer_state, FAVORITED
 
 from repository.errors import (
     DatabaseError,
@@ -36,6 +37,8 @@ def create_favorite(post_id: int, content_id: int, user_id: int):
         session.add(favorite)
         # pylint: disable=R0801
         session.commit()
+        mark_write(user_id)
+        update_viewer_state(user_id, content_id, FAVORITED, True)
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
@@ -61,6 +64,8 @@ def delete_favorite(content_id: int, user_id: int):
         session.delete(favorite)
         # pylint: disable=R0801
         session.commit()
+        mark_write(user_id)
+        update_viewer_state(user_id, content_id, FAVORITED, False)
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
@@ -78,7 +83,7 @@ def get_favorites_from_user(user_visitor_id, user_visited_id, oldest_date, amoun
     """
     Gets all favorites posts from user visited as user visitor
     """
-    query_posts = get_posts_and_reposts(user_visitor_id)
+    query_posts = query_posts_page(user_visitor_id)
     query_final = (
         query_posts.filter(Post.user_creator_id == Post.user_poster_id)
         .join(Favorite, Favorite.content_id == Post.content_id)
@@ -99,4 +104,4 @@ def get_favorites_from_user(user_visitor_id, user_visited_id, oldest_date, amoun
         .filter(Post.created_at < oldest_date)
     )
 
-    return query_final.limit(amount)
+    return hydrate_posts(query_final.limit(amount).all(), user_visitor_id)
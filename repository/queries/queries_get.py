@@ -1,7 +1,9 @@
 """
 Queries for getting posts, reposts, and all their info
 """
-from sqlalchemy import or_
+import os
+from datetime import timedelta
+from sqlalchemy import Integer, cast, exists, func, literal, or_, true, tuple_
 from sqlalchemy.orm import aliased
 
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
@@ -13,6 +15,17 @@ from repository.queries.queries_global import *
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from repository.queries.subqueries_get import *
 
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.queries_hydration import *
+from repository.queries.queries_timeline import get_timeline_page
+from repository.cache import RankingCache, ranking_page
+from repository.queries.queries_counters import (
+    get_user_counters,
+    get_daily_stats,
+    query_daily_stats_by,
+    query_statistics_history,
+)
+
 # pylint: disable=C0114, W0401, W0614, E0401
 from repository.tables.posts import *
 
@@ -20,92 +33,70 @@ from repository.tables.posts import *
 from repository.tables.users import *
 
 from repository.errors import UserIsPrivate, UserDoesntHavePosts, PostNotFound
+from repository.errors import InvalidGranularity, TooManyBuckets, InvalidHashtagSearch
 
 PERCENTAGE_FOLLOWED = 0.7
 
-
-def get_posts_and_reposts(user_id):
-    """
-    Returns query that gets all posts and reposts (with their respective info)
-    and if this user liked or reposted the post
-    """
-    subquery_likes_count = create_subquery_likes_count()
-    how_many_likes = create_how_many_likes(subquery_likes_count)
-
-    subquery_repost_count = create_subquery_resposts_count()
-    how_many_reposts = create_how_many_reposts(subquery_repost_count)
-
-    subquery_my_likes_count = create_subquery_my_like_count_by_user(user_id)
-    did_i_like_column = create_did_i_like_column(subquery_my_likes_count)
-
-    subquery_my_reposts_count = create_subquery_my_reposts_count(user_id)
-    did_i_repost_column = create_did_i_repost_column(subquery_my_reposts_count)
-
-    subquery_my_favorites_count = create_subquery_my_favorites_count(user_id)
-    did_i_put_favorite_column = create_did_i_put_favorite_column(
-        subquery_my_favorites_count
-    )
-
-    hashtags_subquery = create_subquery_hashtags()
-    mentions_subquery = create_subquery_mentions()
-
-    # pylint: disable=C0103
-    # "Variable name "User2" doesn't conform to snake_case naming style"
-    User2 = aliased(User)
-    query = (
-        session.query(
-            Post,
-            Content,
-            User,
-            User2,
-            hashtags_subquery.c.hashtags,
-            mentions_subquery.c.mentions,
-            how_many_likes,
-            how_many_reposts,
-            did_i_like_column,
-            did_i_repost_column,
-            did_i_put_favorite_column,
-        )
-        .join(Content, Post.content_id == Content.content_id)
-        .join(User, User.id == Post.user_poster_id)
-        .join(User2, User2.id == Post.user_creator_id)
-        .join(
-            subquery_likes_count,
-            Post.content_id == subquery_likes_count.c.content_id,
-            isouter=True,
-        )
-        .join(
-            subquery_repost_count,
-            Post.content_id == subquery_repost_count.c.content_id,
-            isouter=True,
-        )
-        .join(
-            subquery_my_likes_count,
-            Post.content_id == subquery_my_likes_count.c.content_id,
-            isouter=True,
-        )
-        .join(
-            subquery_my_reposts_count,
-            Post.content_id == subquery_my_reposts_count.c.content_id,
-            isouter=True,
-        )
-        .join(
-            subquery_my_favorites_count,
-            Post.content_id == subquery_my_favorites_count.c.content_id,
-            isouter=True,
-        )
-        .join(
-            hashtags_subquery,
-            Post.content_id == hashtags_subquery.c.content_id,
-            isouter=True,
-        )
-        .join(
-            mentions_subquery,
-            Post.content_id == mentions_subquery.c.content_id,
-            isouter=True,
-        )
-    )
-    return query
+# ts_rank is a real, the searches by text sort (and keep in the cursors) it
+# as an integer of this scale so that it compares exactly
+TEXT_RANK_SCALE = 1000000
+
+STATISTICS_MAX_BUCKETS = int(os.environ.get("STATISTICS_MAX_BUCKETS", "744"))
+
+# recommended users of each user that the recommended users job keeps, and
+# how old they can get before it recomputes them even if nothing changed
+RECOMMENDED_USERS_SIZE = int(os.environ.get("RECOMMENDED_USERS_SIZE", "100"))
+RECOMMENDED_USERS_MAX_AGE = float(os.environ.get("RECOMMENDED_USERS_MAX_AGE", "86400"))
+# candidates of each source (followings of my followings, my location and my
+# interests) that the live recommended users are chosen from
+RECOMMENDED_CANDIDATES_PER_SOURCE = int(
+    os.environ.get("RECOMMENDED_CANDIDATES_PER_SOURCE", "500")
+)
+# how the job computes them: "sql" (query_recommended_accounts, user by
+# user) or "sparse" (SparseRecommender, a batch of users at once)
+RECOMMENDED_USERS_SCORER = os.environ.get("RECOMMENDED_USERS_SCORER", "sql")
+# the ranking of the recommended users of each user (the ids and the counts
+# they are ranked by) is kept in every worker and the pages are sliced from
+# it: how long it's kept and the memory that the cached users can take
+RECOMMENDED_USERS_CACHE_TTL = float(
+    os.environ.get("RECOMMENDED_USERS_CACHE_TTL", "300")
+)
+RECOMMENDED_USERS_CACHE_MB = float(os.environ.get("RECOMMENDED_USERS_CACHE_MB", "64"))
+
+# the row of a recommended user in the ranking, both the live and the
+# precomputed rankings are in this order (the columns of RecommendedUserRow)
+RECOMMENDED_RANKING = (
+    "mutual_friends",
+    "location_shared",
+    "interest_posts",
+    "interest_likes",
+    "recommended_id",
+)
+
+recommended_users_cache = RankingCache(
+    len(RECOMMENDED_RANKING),
+    RECOMMENDED_USERS_SIZE,
+    RECOMMENDED_USERS_CACHE_MB * 2**20,
+    RECOMMENDED_USERS_CACHE_TTL,
+)
+
+# granularity of the statistics series -> (length of a bucket, start of the
+# bucket of a date, as date_trunc does it)
+STATISTICS_BUCKETS = {
+    "hour": (
+        timedelta(hours=1),
+        lambda date: date.replace(minute=0, second=0, microsecond=0),
+    ),
+    "day": (
+        timedelta(days=1),
+        lambda date: date.replace(hour=0, minute=0, second=0, microsecond=0),
+    ),
+    "week": (
+        timedelta(weeks=1),
+        lambda date: date.replace(hour=0, minute=0, second=0, microsecond=0)
+        - timedelta(days=date.weekday()),
+    ),
+}
 
 
 # "Too many local variables"
@@ -122,7 +113,41 @@ def get_posts_and_reposts_from_users(
 
     If only_reposts == True, then only reposts will be returned
     """
-    query_posts = get_posts_and_reposts(user_visitor_id)
+    query_final = query_posts_and_reposts_from_users(
+        user_visitor_id,
+        user_visited_id,
+        is_public(user_visited_id),
+        oldest_date,
+        amount,
+        only_reposts,
+    )
+
+    results = hydrate_posts(query_final.all(), user_visitor_id)
+    if results is None:
+        # a) the user visited is private and the user visitor doesnt follow them
+        # b) the user doesnt have any posts
+        if is_public(user_visited_id):
+            raise UserIsPrivate()
+        raise UserDoesntHavePosts()
+
+    return results
+
+
+# pylint: disable=R0913
+def query_posts_and_reposts_from_users(
+    user_visitor_id,
+    user_visited_id,
+    visited_is_public,
+    oldest_date,
+    amount,
+    only_reposts,
+):
+    """
+    Builds (without running it) the query of the page of ids (stage 1) of
+    get_posts_and_reposts_from_users, visited_is_public is passed so that
+    building it doesnt hit the database.
+    """
+    query_posts = query_posts_page(user_visitor_id)
     posts_id = (
         session.query(Post.post_id)
         .filter(Post.user_poster_id == user_visited_id)
@@ -143,7 +168,7 @@ def get_posts_and_reposts_from_users(
                     )
                 ),
                 # to check if the user im visiting is public
-                bool(is_public(user_visited_id)),
+                bool(visited_is_public),
             )
         )
         .order_by(Post.created_at.desc())
@@ -155,70 +180,37 @@ def get_posts_and_reposts_from_users(
             Post.user_poster_id != Post.user_creator_id  # to only get the reposts
         )
 
-    query_final = query_final.limit(amount)
+    return query_final.limit(amount)
 
-    results = query_final.all()
-    if results is None:
-        # a) the user visited is private and the user visitor doesnt follow them
-        # b) the user doesnt have any posts
-        if is_public(user_visited_id):
-            raise UserIsPrivate()
-        raise UserDoesntHavePosts()
 
-    return results
-
-
-# "Too many local variables"
-# pylint: disable=R0914
-def get_amount_posts_from_users(user_visitor_id, user_visited_id):
+def can_see_posts_of(user_visitor_id, user_visited_id):
     """
-    Get posts and reposts, with all their info, where the first id is the user that is
-    visiting and the second id is the user that is being visited.
+    Returns True if the visitor can see the posts of the visited user: it's
+    their own profile, the visited user is public or the visitor follows them
+    """
+    return (
+        user_visitor_id == user_visited_id
+        or is_public(user_visited_id)
+        or is_following(user_visitor_id, user_visited_id)
+    )
 
-    Made for the profile, where visitor is the actual mobile user, and visited is another
-    user that the owner of the token want to visit (could be themselves or someone else)
 
-    If only_reposts == True, then only reposts will be returned
+def get_profile_counters(user_visitor_id, user_visited_id):
     """
-    query_posts = get_posts_and_reposts(user_visitor_id)
-    posts_id = (
-        session.query(Post.post_id)
-        .filter(
-            Post.user_poster_id == user_visited_id,
-            Post.user_creator_id == user_visited_id,
-        )
-        .distinct()
-        .subquery()
-    )
-    # pylint: disable=R0801
-    query_final = (
-        query_posts.filter(Post.post_id.in_(posts_id))
-        .filter(
-            or_(
-                # so that I can check my own profile with this query
-                user_visited_id == user_visitor_id,
-                # to check if im following the user
-                Post.user_poster_id.in_(
-                    session.query(Following.following_id).filter(
-                        Following.user_id == user_visitor_id
-                    )
-                ),
-                # to check if the user im visiting is public
-                bool(User.is_public),
-            )
-        )
-        .order_by(Post.created_at.desc())
-    )
+    Returns the profile counters {posts_count, reposts_count, likes_received}
+    of the visited user, all 0 if the visitor can't see their posts
+    """
+    if not can_see_posts_of(user_visitor_id, user_visited_id):
+        return {"posts_count": 0, "reposts_count": 0, "likes_received": 0}
+    return get_user_counters(user_visited_id, user_visitor_id)
 
-    results = query_final.all()
-    if results is None:
-        # a) the user visited is private and the user visitor doesnt follow them
-        # b) the user doesnt have any posts
-        if is_public(user_visited_id):
-            raise UserIsPrivate()
-        raise UserDoesntHavePosts()
 
-    return len(results)
+def get_amount_posts_from_users(user_visitor_id, user_visited_id):
+    """
+    Get the amount of posts (not reposts) made by the visited user, for the
+    profile, read from their counters. It's 0 if the visitor can't see them.
+    """
+    return get_profile_counters(user_visitor_id, user_visited_id)["posts_count"]
 
 
 def get_posts_and_reposts_based_on_interests(user_id, oldest_date):
@@ -232,7 +224,7 @@ def get_posts_and_reposts_based_on_interests(user_id, oldest_date):
     gets posts and reposts from users this user follows might return that post as well.
 
     """
-    query_posts = get_posts_and_reposts(user_id)
+    query_posts = query_posts_page(user_id)
 
     subquery_hashtags_interests = create_subquery_hashtags_interests(user_id)
     subquery_followed_posts = create_subquery_posts_from_followd(user_id)
@@ -258,47 +250,33 @@ def get_posts_and_reposts_based_on_interests(user_id, oldest_date):
     return query_final
 
 
-def get_posts_and_reposts_based_on_followings(user_id, oldest_date):
-    """
-    Returns a query with posts and reposts from the users that this user_id follows,
-    that are older than the oldest_date.
-    """
-    query_posts = get_posts_and_reposts(user_id)
-
-    subquery_followed_posts = create_subquery_posts_from_followd(user_id)
-
-    query_final = (
-        query_posts.filter(Post.post_id.in_(subquery_followed_posts))
-        .order_by(Post.created_at.desc())
-        .filter(Post.created_at < oldest_date)
-    )
-
-    return query_final
-
-
 def get_posts_and_reposts_feed(user_id, oldest_date, amount):
     """
     Obtains the posts for a user's feed, those of the users
-    they follow and those that may interest them
+    they follow (from their timeline, see queries_timeline)
+    and those that may interest them
     """
-    query_posts_from_followed = get_posts_and_reposts_based_on_followings(
-        user_id, oldest_date
-    )
-    query_posts_of_interest = get_posts_and_reposts_based_on_interests(
-        user_id, oldest_date
-    )
-
     num_posts_from_followed = int(amount * PERCENTAGE_FOLLOWED)
     num_posts_of_interest = int(amount * (1 - PERCENTAGE_FOLLOWED))
 
-    posts = (
-        query_posts_from_followed.limit(num_posts_from_followed)
-        .union_all(query_posts_of_interest.limit(num_posts_of_interest))
-        .order_by(Post.created_at.desc())
-        .limit(amount)
+    page = feed_page(
+        get_timeline_page(user_id, oldest_date, num_posts_from_followed),
+        get_posts_and_reposts_based_on_interests(user_id, oldest_date)
+        .limit(num_posts_of_interest)
+        .all(),
+        amount,
     )
+    return hydrate_posts(page, user_id)
 
-    return list(posts)
+
+def feed_page(timeline_entries, posts_of_interest, amount):
+    """
+    Returns the page of the feed (stage 1): the amount newest of the
+    entries of the timeline and the posts that may interest the user
+    """
+    page = list(timeline_entries) + list(posts_of_interest)
+    page.sort(key=lambda row: row.created_at, reverse=True)
+    return page[:amount]
 
 
 def get_reposts_of_users_content(user_id):
@@ -330,73 +308,149 @@ def get_likes_of_users_content(user_id):
     return query
 
 
-def get_statistics(user_id, from_date, to_date):
+def get_statistics(user_id, from_date, to_date, series=False):
     """
     Get the statistics info of all the posts made by this user from the from_date
     to the to_date. If no posts are found, an exception will be launched.
+
+    They are the sum of the daily rollup (user_daily_stats) of the days from
+    from_date to to_date (UTC, both included, the hours are not taken into
+    account). With series, the statistics of every day with activity are
+    returned too, oldest first.
     """
+    days = get_daily_stats(user_id, from_date.date(), to_date.date(), user_id)
+
+    statistics = to_statistics(
+        sum(day.posts for day in days),
+        sum(day.reposts_made for day in days),
+        sum(day.reposts_received for day in days),
+        sum(day.likes_received for day in days),
+    )
+    if not statistics["my_posts_count"] and not statistics["my_reposts_count"]:
+        raise UserDoesntHavePosts()
 
-    query_posts = get_posts_and_reposts(user_id)
-    query_only_my_posts = query_posts.filter(
-        Post.user_creator_id == Post.user_poster_id, Post.user_poster_id == user_id
-    ).filter(from_date <= Post.created_at, Post.created_at <= to_date)
+    if series:
+        statistics["series"] = [
+            {"day": day.day.isoformat(), **to_statistics(*day[1:])} for day in days
+        ]
+    return statistics
 
-    query_only_my_reposts = query_posts.filter(
-        Post.user_creator_id != Post.user_poster_id, Post.user_poster_id == user_id
-    ).filter(from_date <= Post.created_at, Post.created_at <= to_date)
 
-    results_my_posts = query_only_my_posts.all()
-    results_my_reposts = query_only_my_reposts.all()
-    if not results_my_posts and not results_my_reposts:
-        raise UserDoesntHavePosts()
+def to_statistics(posts, reposts_made, reposts_received, likes_received):
+    """
+    Returns the statistics with the keys of the responses
+    """
+    return {
+        "my_posts_count": int(posts),
+        "my_reposts_count": int(reposts_made),
+        "others_reposts_count": int(reposts_received),
+        "likes_count": int(likes_received),
+    }
 
-    query_others_reposts = get_reposts_of_users_content(user_id).filter(
-        from_date <= Post.created_at, Post.created_at <= to_date
-    )
-    results_others_reposts = query_others_reposts.all()
 
-    query_likes = get_likes_of_users_content(user_id).filter(
-        from_date <= Like.created_at, Like.created_at <= to_date
-    )
-    results_likes = query_likes.all()
-
-    my_posts_count = len(results_my_posts)
-    my_reposts_count = len(results_my_reposts)
-    others_reposts_count = len(results_others_reposts)
-    likes_count = len(results_likes) if results_likes is not None else 0
-
-    statistics = {
-        "my_posts_count": my_posts_count,
-        "my_reposts_count": my_reposts_count,
-        "others_reposts_count": others_reposts_count,
-        "likes_count": likes_count,
+def get_statistics_series(user_id, from_date, to_date, granularity):
+    """
+    Get the statistics of the user from the from_date to the to_date in
+    buckets of an hour, a day or a week (granularity), oldest first. Every
+    bucket of the range is returned, the ones without activity in 0.
+
+    The days and weeks are summed from the daily rollup (both end days
+    whole, as get_statistics), the hours are counted from the posts, reposts
+    and likes made in the range.
+    """
+    if granularity not in STATISTICS_BUCKETS:
+        raise InvalidGranularity()
+    length, bucket_of = STATISTICS_BUCKETS[granularity]
+    first_bucket = bucket_of(from_date)
+    amount = max(0, (to_date - first_bucket) // length + 1)
+    if amount > STATISTICS_MAX_BUCKETS:
+        raise TooManyBuckets(STATISTICS_MAX_BUCKETS)
+
+    if granularity == "hour":
+        query = query_statistics_history(
+            lambda user_column: user_column == user_id,
+            lambda created_at: func.date_trunc("hour", created_at),
+            lambda created_at: created_at.between(from_date, to_date),
+        )
+    else:
+        query = query_daily_stats_by(
+            user_id, granularity, from_date.date(), to_date.date()
+        )
+    buckets = {
+        row.bucket: to_statistics(*row[2:])
+        for row in session.execute(read_from_replica(query, user_id))
     }
+    empty = to_statistics(0, 0, 0, 0)
+    return [
+        {
+            "start": (first_bucket + number * length).isoformat(),
+            **buckets.get(first_bucket + number * length, empty),
+        }
+        for number in range(amount)
+    ]
 
-    return statistics
+
+def get_statistics_series_end(to_date, granularity):
+    """
+    Returns when the last bucket of a series to the to_date ends (the next
+    hour, midnight or monday), once it's past the series can't change
+    """
+    length, bucket_of = STATISTICS_BUCKETS[granularity]
+    return bucket_of(to_date) + length
 
 
-def get_posts_by_hashtags(user_id, hashtags, offset, amount):
+# pylint: disable=too-many-arguments
+def get_posts_by_hashtags(
+    user_id, hashtags, offset, amount, cursor=None, mode="or", order="recency"
+):
     """
     This fuction gets all posts that have the hashtags passed as parameter
-    :param hashtags: The hashtags to search for
+    :param hashtags: The hashtags to search for (#foot* for the ones that
+    start with foot), the case and the leading # don't matter
     :param offset: The offset for pagination
     :param amount: The max amount of posts to return
+    :param cursor: sort keys of the last post of the previous page
+    ((created_at, post_id), or (engagement, post_id) if ordered by
+    engagement), if it's passed the offset is ignored
+    :param mode: "or" for the posts with any of the hashtags, "and" for the
+    ones with all of them
+    :param order: "recency" (newest first) or "engagement" (most likes and
+    reposts first)
     :param token: The authentication token.
     :return: A list of posts
     """
-    query_posts = get_posts_and_reposts(user_id)
-    subquery_hashtags = create_subquery_from_search_by_hashtags(hashtags)
+    return hydrate_posts(
+        query_posts_by_hashtags(
+            user_id, hashtags, offset, amount, cursor, mode, order
+        ).all(),
+        user_id,
+    )
+
+
+# pylint: disable=too-many-arguments
+def query_posts_by_hashtags(
+    user_id, hashtags, offset, amount, cursor=None, mode="or", order="recency"
+):
+    """
+    Builds (without running it) the query of the page of ids (stage 1)
+    of get_posts_by_hashtags
+    """
+    if mode not in ("and", "or") or order not in ("recency", "engagement"):
+        raise InvalidHashtagSearch()
+    query_posts = query_posts_page(user_id)
+    subquery_hashtags = create_subquery_from_search_by_hashtags(hashtags, mode)
 
     query_final = (
-        query_posts.filter(Content.content_id.in_(subquery_hashtags)).filter(
+        query_posts.filter(Post.content_id.in_(subquery_hashtags)).filter(
             Post.user_poster_id == Post.user_creator_id
         )
         # pylint: disable=C0121
         .filter(User.is_public == True)
     )
 
-    results = query_final.offset(offset).limit(amount)
-    return results
+    if order == "engagement":
+        return paginate_posts_by_engagement(query_final, offset, amount, cursor)
+    return paginate_posts(query_final, offset, amount, cursor)
 
 
 def get_posts_by_text_admin(text, offset, amount):
@@ -407,109 +461,302 @@ def get_posts_by_text_admin(text, offset, amount):
     :param amount: The max amount of posts to return
     :return: A list of posts
     """
-    query_posts = get_posts_and_reposts(0)
-
-    query_final = (
-        query_posts.filter(Post.user_poster_id == Post.user_creator_id)
-        # pylint: disable=C0121
-        .filter(User.is_public == True).filter(
-            Content.text.ilike(f"%{text}%"),
-        )
+    substrings = not query_text_search_matches(text).scalar()
+    return hydrate_posts(
+        query_posts_by_text(0, text, offset, amount, None, substrings).all(), 0
     )
-    results = query_final.offset(offset).limit(amount)
-    return results
 
 
-def get_posts_by_text(user_id, text, offset, amount):
+def get_posts_by_text(user_id, text, offset, amount, cursor=None):
     """
     This fuction gets all posts that have the text passed as parameter
     :param text: The text to search for
     :param offset: The offset for pagination
     :param amount: The max amount of posts to return
+    :param cursor: (rank, created_at, post_id) of the last post of the previous
+    page, if it's passed the offset is ignored
     :param token: The authentication token.
-    :return: A list of posts
+    :return: A list of posts, the most relevant first
     """
-    query_posts = get_posts_and_reposts(user_id)
+    return search_posts_by_text(user_id, text, offset, amount, cursor)[0]
 
-    query_final = (
-        query_posts.filter(Post.user_poster_id == Post.user_creator_id)
+
+def search_posts_by_text(user_id, text, offset, amount, cursor=None):
+    """
+    get_posts_by_text that also returns the sort keys (rank, created_at,
+    post_id) of the last post of the page, for the cursor of the next one
+    (empty if the page is empty)
+    """
+    substrings = not read_from_replica(
+        query_text_search_matches(text), user_id
+    ).scalar()
+    page = query_posts_by_text(user_id, text, offset, amount, cursor, substrings).all()
+    last_sort_keys = ()
+    if page:
+        last_sort_keys = (page[-1].rank, page[-1].created_at, page[-1].post_id)
+    return hydrate_posts(page, user_id), last_sort_keys
+
+
+def escape_like(text):
+    """
+    Returns the text with the wildcards of LIKE (% and _) escaped
+    """
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def query_text_search_matches(text):
+    """
+    Builds the query (of a single bool) of whether any content matches the
+    text with the full text search (an index lookup, it stops at the first)
+    """
+    search = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, text)
+    return session.query(exists().where(Content.text_search.op("@@")(search)))
+
+
+# pylint: disable=too-many-arguments
+def query_posts_by_text(user_id, text, offset, amount, cursor=None, substrings=False):
+    """
+    Builds (without running it) the query of the page of ids (stage 1)
+    of get_posts_by_text, the rows have their rank too.
+
+    The posts are the ones whose text matches the search, parsed with
+    websearch_to_tsquery (words in any of their forms, "a phrase", or,
+    -word), the most relevant first (ts_rank) and the newest first among the
+    equally relevant ones. With substrings (the fallback when nothing
+    matches, see query_text_search_matches, e.g. for a fragment of a word)
+    they are the ones whose text contains it instead, newest first (rank 0).
+    """
+    if substrings:
+        rank = cast(literal(0), Integer)
+        query_final = (
+            query_posts_page(user_id)
+            .add_columns(rank.label("rank"))
+            .join(Content, Post.content_id == Content.content_id)
+            .filter(Post.user_poster_id == Post.user_creator_id)
+            # pylint: disable=C0121
+            .filter(User.is_public == True)
+            .filter(Content.text.ilike(f"%{escape_like(text)}%"))
+        )
+        return paginate_posts_by_rank(query_final, rank, offset, amount, cursor)
+
+    search = func.websearch_to_tsquery(TEXT_SEARCH_CONFIG, text)
+    rank = cast(func.ts_rank(Content.text_search, search) * TEXT_RANK_SCALE, Integer)
+    # The original post of every matching content. As a lateral join (an index
+    # lookup per content) the planner starts from the GIN index, joined as a
+    # plain table it scans all the posts (it can't estimate poster == creator).
+    original_post = aliased(
+        Post,
+        query_posts_page(user_id)
+        .filter(Post.content_id == Content.content_id)
+        .filter(Post.user_poster_id == Post.user_creator_id)
         # pylint: disable=C0121
-        .filter(User.is_public == True).filter(
-            Content.text.ilike(f"%{text}%"),
+        .filter(User.is_public == True).limit(1).subquery().lateral(),
+    )
+    query_final = (
+        session.query(
+            original_post.post_id,
+            original_post.content_id,
+            original_post.created_at,
+            rank.label("rank"),
         )
+        .select_from(Content)
+        .join(original_post, true())
+        .filter(Content.text_search.op("@@")(search))
+    )
+    return paginate_posts_by_rank(
+        read_from_replica(query_final, user_id),
+        rank,
+        offset,
+        amount,
+        cursor,
+        original_post,
     )
-    results = query_final.offset(offset).limit(amount)
-    return results
 
 
 def get_post_by_id(user_id, post_id):
     """
     get post by id
     """
-    post = get_posts_and_reposts(user_id).filter(Post.post_id == post_id).all()
+    post = hydrate_posts(
+        query_posts_page(user_id).filter(Post.post_id == post_id).all(), user_id
+    )
     if post is None:
         raise PostNotFound()
     return post
 
 
-def get_recommended_accounts_for_a_user(user_id, offset, amount):
+def query_recommended_accounts(user_id, limit=None):
     """
-    Get the recommended accounts for a user
+    Query of the recommended accounts for a user computed live, and its
+    ranking: (friends of friends, shared location, posts and likes that match
+    my interests, id), a missing count is ranked as 0.
+
+    Only the candidates are ranked: the users followed by the most of those I
+    follow, the newest ones of my location and the ones with the most of the
+    newest posts of my interests, up to limit (RECOMMENDED_CANDIDATES_PER_SOURCE
+    by default) of each, so it reads the neighborhood of the user and not every
+    user.
     """
+    candidates = create_subquery_recommendation_candidates(
+        user_id, limit or RECOMMENDED_CANDIDATES_PER_SOURCE
+    )
     subquery_following = create_subquery_followings(user_id)
     subquery_interests = create_subquery_get_interests(user_id)
     location_shared_case = create_subquery_get_shared_location(user_id)
-    followed_subquery = create_subquery_get_followed_users(user_id)
 
-    subquery_followings_of_my_followings = create_subquery_followings_of_my_followings(
-        subquery_following
+    friends = create_subquery_common_followings_count(subquery_following, candidates)
+    posts = create_subquery_posts_that_match_my_interests_count(
+        subquery_interests, candidates
     )
-    subquery_interest_posts = create_subquery_get_posts_that_match_my_interests(
-        subquery_interests
+    likes = create_subquery_likes_that_match_my_interests_count(
+        subquery_interests, candidates
     )
-    subquery_interest_likes = create_subquery_get_likes_that_match_my_interests(
-        subquery_interests
+    counts = [
+        func.coalesce(friends.c.friend_of_friend_count, 0),
+        func.coalesce(posts.c.interest_posts_count, 0),
+        func.coalesce(likes.c.interest_likes, 0),
+    ]
+
+    # in the order of RECOMMENDED_RANKING
+    ranking = [counts[0], location_shared_case, counts[1], counts[2], User.id]
+    recommended_users = (
+        session.query(USER_ROW, location_shared_case.label("location_shared"), *counts)
+        .join(candidates, User.id == candidates.c.id)
+        .outerjoin(friends, User.id == friends.c.id)
+        .outerjoin(posts, User.id == posts.c.id)
+        .outerjoin(likes, User.id == likes.c.id)
+        .filter(candidates.c.id != user_id)
+        .filter(~candidates.c.id.in_(select(subquery_following)))
+        .order_by(*[sort_key.desc() for sort_key in ranking])
     )
+    return recommended_users, ranking
 
-    subquery_followings = create_subquery_common_followings_count(
-        user_id, subquery_followings_of_my_followings
-    )
-    subquery_interest_posts_count = (
-        create_subquery_get_posts_that_match_my_interests_count(
-            user_id, subquery_interest_posts
-        )
-    )
-    subquery_interest_likes_count = (
-        create_subquery_get_likes_that_match_my_interests_count(
-            user_id, subquery_interest_likes
-        )
-    )
 
+def query_precomputed_recommended_accounts(user_id):
+    """
+    Query of the recommended accounts for a user computed by the recommended
+    users job (without the ones they followed since), and its ranking, the
+    same as the one of query_recommended_accounts.
+    """
+    ranking = [getattr(RecommendedUserRow, column) for column in RECOMMENDED_RANKING]
     recommended_users = (
         session.query(
-            User,
-            location_shared_case.label("location_shared"),
-            subquery_followings.c.friend_of_friend_count,
-            subquery_interest_posts_count.c.interest_posts_count,
-            subquery_interest_likes_count.c.interest_likes,
+            USER_ROW,
+            RecommendedUserRow.location_shared,
+            RecommendedUserRow.mutual_friends,
+            RecommendedUserRow.interest_posts,
+            RecommendedUserRow.interest_likes,
         )
-        .outerjoin(subquery_followings, User.id == subquery_followings.c.id)
-        .outerjoin(
-            subquery_interest_posts_count, User.id == subquery_interest_posts_count.c.id
-        )
-        .outerjoin(
-            subquery_interest_likes_count, User.id == subquery_interest_likes_count.c.id
-        )
-        .order_by(
-            subquery_followings.c.friend_of_friend_count.desc(),
-            location_shared_case.desc(),
-            subquery_interest_posts_count.c.interest_posts_count.desc(),
-            subquery_interest_likes_count.c.interest_likes.desc(),
+        .join(User, User.id == RecommendedUserRow.recommended_id)
+        .filter(RecommendedUserRow.user_id == user_id)
+        .filter(
+            ~RecommendedUserRow.recommended_id.in_(
+                create_subquery_get_followed_users(user_id)
+            )
         )
-        .filter(User.id != user_id)
-        .filter(~User.id.in_(followed_subquery))
-        .limit(amount)
-        .offset(offset)
-        .all()
+        .order_by(*[sort_key.desc() for sort_key in ranking])
     )
-    return recommended_users
+    return recommended_users, ranking
+
+
+def get_recommended_ranking(user_id):
+    """
+    Returns (rows, complete) of the ranking of the recommended users of the
+    user: a row (friends of friends, shared location, posts, likes, id) for
+    each one of the first RECOMMENDED_USERS_SIZE, and if there are no more.
+
+    It's read from recommended_users_cache, if it's not there it's computed
+    (read from the recommended_users table once the recommended users job
+    computed them for the user, if not live) and cached.
+    """
+    cached = recommended_users_cache.get(user_id)
+    if cached is not None:
+        return cached
+
+    precomputed = read_from_replica(
+        session.query(RecommendationFingerprint.user_id).filter(
+            RecommendationFingerprint.user_id == user_id
+        ),
+        user_id,
+    ).first()
+    if precomputed is not None:
+        recommended_users, ranking = query_precomputed_recommended_accounts(user_id)
+    else:
+        recommended_users, ranking = query_recommended_accounts(user_id)
+    rows = [
+        tuple(row)
+        for row in read_from_replica(
+            recommended_users.with_entities(*ranking).limit(RECOMMENDED_USERS_SIZE),
+            user_id,
+        ).all()
+    ]
+    # the job keeps only the first RECOMMENDED_USERS_SIZE
+    complete = precomputed is not None or len(rows) < RECOMMENDED_USERS_SIZE
+    recommended_users_cache.set(user_id, rows, complete)
+    return rows, complete
+
+
+def invalidate_recommended_users(user_id):
+    """
+    Drops the cached ranking of the recommended users of the user, call it
+    when they follow or unfollow someone or change their interests (in the
+    other workers it lasts until it expires, RECOMMENDED_USERS_CACHE_TTL)
+    """
+    recommended_users_cache.pop(user_id)
+
+
+def get_recommended_users_cache_status():
+    """
+    Returns the amount of cached rankings of recommended users, the max
+    amount (given by RECOMMENDED_USERS_CACHE_MB), and the hits and misses
+    """
+    return recommended_users_cache.status()
+
+
+def get_recommended_accounts_for_a_user(user_id, offset, amount, cursor=None):
+    """
+    Get the recommended accounts for a user.
+
+    They are ranked by (friends of friends, shared location, posts and likes that
+    match my interests, id), a missing count is ranked as 0. If the cursor (the
+    ranking of the last user of the previous page) is passed, the offset is ignored.
+
+    The page is sliced from the cached ranking (see get_recommended_ranking),
+    without the users that they followed since, and only those users are read.
+    The pages beyond the first RECOMMENDED_USERS_SIZE users are computed live.
+    """
+    rows, complete = get_recommended_ranking(user_id)
+    followed = read_from_replica(
+        session.query(Following.following_id).filter(
+            Following.user_id == user_id,
+            Following.following_id.in_([row[-1] for row in rows]),
+        ),
+        user_id,
+    )
+    page = ranking_page(
+        rows,
+        complete,
+        (int(offset), int(amount)),
+        cursor,
+        {following_id for (following_id,) in followed},
+    )
+    if page is None:
+        recommended_users, ranking = query_recommended_accounts(user_id)
+        if cursor is not None:
+            recommended_users = recommended_users.filter(tuple_(*ranking) < cursor)
+        else:
+            recommended_users = recommended_users.offset(offset)
+        return read_from_replica(recommended_users.limit(amount), user_id).all()
+
+    users = {
+        user.id: user
+        for (user,) in read_from_replica(
+            session.query(USER_ROW).filter(User.id.in_([row[-1] for row in page])),
+            user_id,
+        )
+    }
+    return [
+        (users[recommended_id], location_shared, friends, posts, likes)
+        for friends, location_shared, posts, likes, recommended_id in page
+        if recommended_id in users
+    ]
@@ -0,0 +1,232 @@
+"""
+Async versions of the hot read queries (feed, profile, post by id, search
+and trending). They build the exact same queries as the sync ones and
+run them through the asyncpg engine.
+"""
+import asyncio
+import datetime
+from sqlalchemy import select
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.common_setup import request_session_scope
+from repository.queries.common_setup_async import SessionAsync
+from repository.queries.queries_get import (
+    PERCENTAGE_FOLLOWED,
+    feed_page,
+    get_posts_and_reposts_based_on_interests,
+    query_posts_by_hashtags,
+    query_posts_by_text,
+    query_text_search_matches,
+    query_posts_and_reposts_from_users,
+)
+from repository.queries.queries_timeline import get_timeline_page
+from repository.queries.queries_hydration import query_posts_page, hydrate_posts
+from repository.queries.queries_trending_topic import (
+    TRENDING_MAX_DAYS,
+    TRENDING_SNAPSHOT_DAYS,
+    get_trending_topics,
+    query_trending_topics_with_count,
+)
+from repository.tables.posts import Post
+from repository.tables.users import User
+from repository.errors import (
+    UserNotFound,
+    OtherUserIsBlocked,
+    UserIsPrivate,
+    UserDoesntHavePosts,
+    PostNotFound,
+)
+
+from control.utils.logger import logger
+
+
+async def run_query(query):
+    """
+    Runs the query on the async engine and returns all its rows.
+
+    The sync queries are ORM Query objects, they are run through run_sync so
+    they keep their exact results (entities, unions, etc) while the IO with
+    the database is still awaited on asyncpg.
+    """
+    async with SessionAsync() as db_session:
+        if hasattr(query, "with_session"):
+            return await db_session.run_sync(
+                lambda sync_session: query.with_session(sync_session).all()
+            )
+        result = await db_session.execute(query)
+        return result.all()
+
+
+async def run_posts_query(query_page, user_id):
+    """
+    Runs the page of ids (stage 1) and hydrates it (stage 2) on the async
+    engine, in the same session.
+    """
+    async with SessionAsync() as db_session:
+        return await db_session.run_sync(
+            lambda sync_session: hydrate_posts(
+                query_page.with_session(sync_session).all(),
+                user_id,
+                db_session=sync_session,
+            )
+        )
+
+
+async def is_public_async(user_id):
+    """
+    Returns True if the user is public.
+    """
+    rows = await run_query(
+        # pylint: disable=C0121
+        select(User.id).filter(User.id == user_id, User.is_public == True)
+    )
+    return len(rows) > 0
+
+
+async def get_user_id_from_email_async(email):
+    """
+    Return the id from the user with this email
+    """
+    rows = await run_query(
+        select(User.id, User.blocked).filter(User.email == email).limit(1)
+    )
+    if not rows:
+        logger.error("User %s was not found", email)
+        raise UserNotFound()
+
+    user_id, blocked = rows[0]
+    if blocked is True:
+        logger.error("User %s is blocked", email)
+        raise OtherUserIsBlocked()
+    return user_id
+
+
+# pylint: disable=R0913
+async def get_posts_and_reposts_from_users_async(
+    user_visitor_id, user_visited_id, oldest_date, amount, only_reposts
+):
+    """
+    Async version of get_posts_and_reposts_from_users
+    """
+    visited_is_public = await is_public_async(user_visited_id)
+    results = await run_posts_query(
+        query_posts_and_reposts_from_users(
+            user_visitor_id,
+            user_visited_id,
+            visited_is_public,
+            oldest_date,
+            amount,
+            only_reposts,
+        ),
+        user_visitor_id,
+    )
+    if results is None:
+        if visited_is_public:
+            raise UserIsPrivate()
+        raise UserDoesntHavePosts()
+
+    return results
+
+
+def get_timeline_page_in_a_session(user_id, oldest_date, amount):
+    """
+    get_timeline_page in a session of its own (it runs in a thread)
+    """
+    with request_session_scope():
+        return get_timeline_page(user_id, oldest_date, amount)
+
+
+async def get_posts_and_reposts_feed_async(user_id, oldest_date, amount):
+    """
+    Async version of get_posts_and_reposts_feed (the timeline is read, or
+    built the first time, in a thread)
+    """
+    num_posts_from_followed = int(amount * PERCENTAGE_FOLLOWED)
+    num_posts_of_interest = int(amount * (1 - PERCENTAGE_FOLLOWED))
+    timeline_entries = await asyncio.to_thread(
+        get_timeline_page_in_a_session, user_id, oldest_date, num_posts_from_followed
+    )
+    query_posts_of_interest = get_posts_and_reposts_based_on_interests(
+        user_id, oldest_date
+    ).limit(num_posts_of_interest)
+
+    def feed(sync_session):
+        page = feed_page(
+            timeline_entries,
+            query_posts_of_interest.with_session(sync_session).all(),
+            amount,
+        )
+        return hydrate_posts(page, user_id, db_session=sync_session)
+
+    async with SessionAsync() as db_session:
+        return await db_session.run_sync(feed)
+
+
+async def get_post_by_id_async(user_id, post_id):
+    """
+    Async version of get_post_by_id
+    """
+    post = await run_posts_query(
+        query_posts_page(user_id).filter(Post.post_id == post_id), user_id
+    )
+    if post is None:
+        raise PostNotFound()
+    return post
+
+
+# pylint: disable=too-many-arguments
+async def get_posts_by_hashtags_async(
+    user_id, hashtags, offset, amount, cursor=None, mode="or", order="recency"
+):
+    """
+    Async version of get_posts_by_hashtags
+    """
+    return await run_posts_query(
+        query_posts_by_hashtags(user_id, hashtags, offset, amount, cursor, mode, order),
+        user_id,
+    )
+
+
+async def get_posts_by_text_async(user_id, text, offset, amount, cursor=None):
+    """
+    Async version of get_posts_by_text
+    """
+    return (await search_posts_by_text_async(user_id, text, offset, amount, cursor))[0]
+
+
+async def search_posts_by_text_async(user_id, text, offset, amount, cursor=None):
+    """
+    Async version of search_posts_by_text (the posts and the sort keys of
+    the last one)
+    """
+    ((matches,),) = await run_query(query_text_search_matches(text))
+    query_page = query_posts_by_text(user_id, text, offset, amount, cursor, not matches)
+
+    def search(sync_session):
+        page = query_page.with_session(sync_session).all()
+        last_sort_keys = ()
+        if page:
+            last_sort_keys = (page[-1].rank, page[-1].created_at, page[-1].post_id)
+        return hydrate_posts(page, user_id, db_session=sync_session), last_sort_keys
+
+    async with SessionAsync() as db_session:
+        return await db_session.run_sync(search)
+
+
+async def get_trending_topics_async(offset, amount, days, score="count", location=None):
+    """
+    Async version of get_trending_topics (the snapshots and the counters in
+    memory are read, or built the first time, in a thread)
+    """
+    if (
+        location
+        or days in TRENDING_SNAPSHOT_DAYS
+        or days <= TRENDING_MAX_DAYS
+        or score != "count"
+    ):
+        return await asyncio.to_thread(
+            get_trending_topics, offset, amount, days, score, location
+        )
+    computed_at = datetime.datetime.utcnow()
+    rows = await run_query(query_trending_topics_with_count(offset, amount, days))
+    return [(hashtag, posts, None) for hashtag, posts in rows], computed_at
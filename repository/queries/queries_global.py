@@ -105,11 +105,10 @@ def is_public(user_id):
 
 def execute_delete_query(delete_query):
     """
-    Executes the delete query passed as argument
+    Executes the delete query passed as argument (not committed)
     """
     try:
         session.execute(delete_query)
-        session.commit()
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
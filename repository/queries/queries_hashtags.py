@@ -7,6 +7,7 @@ from sqlalchemy.exc import IntegrityError
 
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from repository.queries.common_setup import *
+from repository.queries.queries_trending_topic import trending_uses_of
 
 # pylint: disable=C0114, W0401, W0614, E0401
 from repository.errors import (
@@ -22,7 +23,8 @@ from repository.tables.posts import Hashtag
 # pylint: disable=R0801
 def create_hashtags(content_id: int, hashtags: List[str]):
     """
-    Creates a hashtag for a post
+    Creates a hashtag for a post (flushed, the caller commits it and then
+    adds them to the autocomplete and the trending counters)
     """
     try:
         for hashtag in hashtags:
@@ -31,7 +33,7 @@ def create_hashtags(content_id: int, hashtags: List[str]):
             # similar lines
             # pylint: disable=R0801
             session.add(new_hashtag)
-        session.commit()
+        session.flush()
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
@@ -43,13 +45,14 @@ def create_hashtags(content_id: int, hashtags: List[str]):
 # pylint: disable=R0801
 def delete_hashtags_for_content(content_id):
     """
-    Deletes all hashtags from that particular content_id
+    Deletes all hashtags from that particular content_id (not committed), and
+    returns their trending uses, to take them back after the commit
     """
     try:
+        trending_uses = trending_uses_of(content_id)
         delete_query = Delete(Hashtag).where(Hashtag.content_id == content_id)
-        result = session.execute(delete_query)
-        session.commit()
-        return result.rowcount
+        session.execute(delete_query)
+        return trending_uses
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
@@ -0,0 +1,203 @@
+"""
+Two stage queries for the posts and reposts.
+
+Stage 1 (query_posts_page) is a narrow query on posts that only selects
+(post_id, content_id, created_at). Every caller adds its filters, order and
+limit to it, so the database only has to find the ids of the page.
+
+Stage 2 (hydrate_posts) takes the rows of that page and loads everything
+else (content, users, hashtags, mentions, counters and the flags of the
+user that is reading, see queries_viewer_state) with one IN (...) lookup per
+table, only for those ids. The lookups project only the columns that the
+responses read (POST_COLUMNS, CONTENT_COLUMNS, USER_COLUMNS) and return
+plain rows (named tuples) instead of ORM entities, so the rest of the
+user (password, bio, birth date...) never leaves the database and
+nothing goes into the identity map.
+It returns the same tuples the old single query returned:
+
+    (post, content, user_poster, user_creator, hashtags, mentions,
+     how_many_likes, how_many_reposts, did_I_like, did_I_repost, did_I_favorite)
+
+(the admin version stops at how_many_reposts).
+"""
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import Bundle
+from sqlalchemy.dialects.postgresql import array_agg
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.common_setup import *
+from repository.queries.queries_viewer_state import (
+    get_viewer_state,
+    LIKED,
+    REPOSTED,
+    FAVORITED,
+)
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.tables.posts import Post, Content, Hashtag, Mention
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.tables.users import User
+
+POST_COLUMNS = (
+    Post.post_id,
+    Post.content_id,
+    Post.user_poster_id,
+    Post.user_creator_id,
+    Post.created_at,
+)
+CONTENT_COLUMNS = (
+    Content.content_id,
+    Content.text,
+    Content.image,
+    Content.like_count,
+    Content.repost_count,
+)
+# what generate_user_from_db reads
+USER_COLUMNS = (User.id, User.email, User.name, User.username, User.avatar)
+# to select a user as a single row (user.id, user.email, ...) next to other columns
+USER_ROW = Bundle("user", *USER_COLUMNS)
+
+
+def query_posts_page(user_id=None):
+    """
+    Stage 1: returns the narrow query of posts and reposts, joined with their
+    poster (User), so the callers can filter by the poster too.
+    """
+    query = session.query(Post.post_id, Post.content_id, Post.created_at).join(
+        User, User.id == Post.user_poster_id
+    )
+    return read_from_replica(query, user_id)
+
+
+def paginate_posts(query, offset, amount, cursor=None):
+    """
+    Orders the page query from the newest post to the oldest one and keeps
+    amount posts: the ones right after the cursor (created_at, post_id of the
+    last post of the previous page) if there is one, or skipping offset if not.
+    """
+    query = query.order_by(Post.created_at.desc(), Post.post_id.desc())
+    if cursor is not None:
+        return query.filter(tuple_(Post.created_at, Post.post_id) < cursor).limit(
+            amount
+        )
+    return query.offset(offset).limit(amount)
+
+
+def paginate_posts_by_engagement(query, offset, amount, cursor=None):
+    """
+    Orders the page query from the post with the most likes and reposts to
+    the one with the least (the newest first among the ones with the same
+    amount) and keeps amount posts: the ones right after the cursor
+    (engagement, post_id of the last post of the previous page) if there is
+    one, or skipping offset if not. The engagement changes between pages, so
+    a post can move from one page to another.
+    """
+    engagement = Content.like_count + Content.repost_count
+    query = query.join(Content, Content.content_id == Post.content_id).order_by(
+        engagement.desc(), Post.post_id.desc()
+    )
+    if cursor is not None:
+        return query.filter(tuple_(engagement, Post.post_id) < cursor).limit(amount)
+    return query.offset(offset).limit(amount)
+
+
+# pylint: disable=too-many-arguments
+def paginate_posts_by_rank(query, rank, offset, amount, cursor=None, posts=Post):
+    """
+    Orders the page query from the highest rank (an integer expression) to the
+    lowest one (the newest first among the ones with the same rank) and keeps
+    amount posts: the ones right after the cursor (rank, created_at, post_id
+    of the last post of the previous page) if there is one, or skipping
+    offset if not. posts is the Post entity of the query (or an alias of it).
+    """
+    query = query.order_by(rank.desc(), posts.created_at.desc(), posts.post_id.desc())
+    if cursor is not None:
+        return query.filter(
+            tuple_(rank, posts.created_at, posts.post_id) < cursor
+        ).limit(amount)
+    return query.offset(offset).limit(amount)
+
+
+# "Too many local variables"
+# pylint: disable=R0914
+def hydrate_posts(page, user_id, viewer_flags=True, db_session=None):
+    """
+    Stage 2: returns the info of every post in the page (rows with a post_id,
+    like the ones of stage 1), in the same order. The posts that don't exist
+    anymore are skipped. If viewer_flags is False the did_I_* values are left
+    out (the admin doesnt have them).
+    """
+    db_session = db_session or session
+    post_ids = [row.post_id for row in page]
+    if not post_ids:
+        return []
+
+    def lookup(statement):
+        return db_session.execute(read_from_replica(statement, user_id)).all()
+
+    posts = {
+        post.post_id: post
+        for post in lookup(select(*POST_COLUMNS).where(Post.post_id.in_(post_ids)))
+    }
+    content_ids = list({post.content_id for post in posts.values()})
+    contents = {
+        content.content_id: content
+        for content in lookup(
+            select(*CONTENT_COLUMNS).where(Content.content_id.in_(content_ids))
+        )
+    }
+    user_ids = {post.user_poster_id for post in posts.values()} | {
+        post.user_creator_id for post in posts.values()
+    }
+    users = {
+        user.id: user
+        for user in lookup(select(*USER_COLUMNS).where(User.id.in_(user_ids)))
+    }
+    hashtags = dict(
+        lookup(
+            select(Hashtag.content_id, array_agg(Hashtag.hashtag))
+            .where(Hashtag.content_id.in_(content_ids))
+            .group_by(Hashtag.content_id)
+        )
+    )
+    mentions = dict(
+        lookup(
+            select(Mention.content_id, array_agg(User.username))
+            .join(User, Mention.user_mention_id == User.id)
+            .where(Mention.content_id.in_(content_ids))
+            .group_by(Mention.content_id)
+        )
+    )
+
+    hydrated = []
+    for post_id in post_ids:
+        post = posts.get(post_id)
+        if post is None:
+            continue
+        content = contents[post.content_id]
+        hydrated.append(
+            (
+                post,
+                content,
+                users[post.user_poster_id],
+                users[post.user_creator_id],
+                hashtags.get(post.content_id),
+                mentions.get(post.content_id),
+                content.like_count,
+                content.repost_count,
+            )
+        )
+    if not viewer_flags:
+        return hydrated
+
+    viewer_state = get_viewer_state(user_id, content_ids, db_session)
+    return [
+        row
+        + (
+            viewer_state[row[0].content_id][LIKED],
+            viewer_state[row[0].content_id][REPOSTED],
+            viewer_state[row[0].content_id][FAVORITED],
+        )
+        for row in hydrated
+    ]
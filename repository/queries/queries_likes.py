@@ -7,6 +7,12 @@ from sqlalchemy.exc import IntegrityError
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from repository.queries.common_setup import *
 from repository.queries.queries_global import execute_delete_query
+from repository.queries.queries_counters import (
+    add_to_like_count,
+    add_to_user_counters,
+    add_to_daily_stats,
+)
+from repository.queries.queries_viewer_state import update_viewer_state, LIKED
 
 # pylint: disable=C0114, W0401, W0614, E0401
 from repository.errors import (
@@ -32,8 +38,16 @@ def create_like(post_id: int, content_id: int, user_id: int):
 
         like = Like(content_id, user_id)
         session.add(like)
+        session.flush()
+        add_to_like_count(content_id, 1)
+        add_to_user_counters(post.user_creator_id, likes_received=1)
+        add_to_daily_stats(
+            post.user_creator_id, like.created_at.date(), likes_received=1
+        )
         # pylint: disable=R0801
         session.commit()
+        mark_write(user_id)
+        update_viewer_state(user_id, content_id, LIKED, True)
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
@@ -55,9 +69,21 @@ def delete_like(content_id: int, user_id: int):
         if like is None:
             raise LikeNotFound()
 
+        creator_id = (
+            session.query(Post.user_creator_id)
+            .filter(Post.content_id == content_id)
+            .limit(1)
+            .scalar()
+        )
         session.delete(like)
+        add_to_like_count(content_id, -1)
+        if creator_id is not None:
+            add_to_user_counters(creator_id, likes_received=-1)
+            add_to_daily_stats(creator_id, like.created_at.date(), likes_received=-1)
         # pylint: disable=R0801
         session.commit()
+        mark_write(user_id)
+        update_viewer_state(user_id, content_id, LIKED, False)
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
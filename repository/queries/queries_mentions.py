@@ -23,9 +23,11 @@ from repository.tables.users import User
 # pylint: disable=R0801
 def create_mentions(content_id: int, usernames: List[str]):
     """
-    Creates a mention for a post
+    Creates a mention for a post (flushed, the caller commits it) and
+    returns the usernames that were mentioned
     """
     try:
+        mentioned = []
         for username in usernames:
             user = session.query(User).filter_by(username=username).first()
             # si no existe el usuario, no se crea la mencion, se deberia lanzar excepcion?
@@ -34,7 +36,9 @@ def create_mentions(content_id: int, usernames: List[str]):
                 # similar lines
                 # pylint: disable=R0801
                 session.add(new_mention)
-        session.commit()
+                mentioned.append(user.username)
+        session.flush()
+        return mentioned
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
@@ -46,12 +50,11 @@ def create_mentions(content_id: int, usernames: List[str]):
 # pylint: disable=R0801
 def delete_mentions_for_content(content_id):
     """
-    Deletes all mentions from that particular content_id
+    Deletes all mentions from that particular content_id (not committed)
     """
     try:
         delete_query = Delete(Mention).where(Mention.content_id == content_id)
         result = session.execute(delete_query)
-        session.commit()
         return result.rowcount
     except IntegrityError as error:
         session.rollback()
@@ -1,6 +1,7 @@
 """
 Queries for creating, updating and deleting posts
 """
+from sqlalchemy import Date, cast, func
 from sqlalchemy.exc import IntegrityError
 
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
@@ -12,6 +13,19 @@ from repository.queries.queries_mentions import *
 from repository.queries.queries_likes import *
 from repository.queries.queries_reposts import *
 from repository.queries.queries_favorites import *
+from repository.queries.queries_counters import (
+    add_to_user_counters,
+    add_to_daily_stats,
+)
+from repository.queries.queries_timeline import (
+    fan_out_post,
+    remove_posts_from_timelines,
+)
+from repository.queries.queries_autocomplete import (
+    add_to_autocomplete,
+    autocomplete_uses_of,
+)
+from repository.queries.queries_trending_topic import add_to_trending, trending_uses_of
 
 # pylint: disable=C0114, W0401, W0614, E0401
 from repository.errors import (
@@ -20,12 +34,13 @@ from repository.errors import (
 )
 
 # pylint: disable=C0114, W0401, W0614, E0401
-from repository.tables.posts import Post, Content
+from repository.tables.posts import Post, Content, Like
 
 
 def create_post(user_id, text, image, hashtags, mentions):
     """
-    Create a post made by the user_id, with that content and image
+    Create a post made by the user_id, with that content and image. The post,
+    its hashtags and mentions and the counters are committed together.
     """
     try:
         content = Content(text=text, image=image)
@@ -44,12 +59,23 @@ def create_post(user_id, text, image, hashtags, mentions):
         # similar lines
         # pylint: disable=R0801
         create_hashtags(content.content_id, hashtags)
-        create_mentions(content.content_id, mentions)
+        mentioned = create_mentions(content.content_id, mentions)
+        add_to_user_counters(user_id, posts=1)
+        add_to_daily_stats(user_id, post.created_at.date(), posts=1)
+        transaction_id = current_transaction_id()
         session.commit()
+        mark_write(user_id)
+        add_to_autocomplete(transaction_id, hashtags=hashtags, usernames=mentioned)
+        add_to_trending(trending_uses_of(content.content_id), transaction_id)
+        fan_out_post(post)
         return post.post_id
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
+    except Exception:
+        # nothing of the post is kept if any part of it fails
+        session.rollback()
+        raise
 
 
 # pylint: disable=R0913
@@ -74,14 +100,23 @@ def update_post(post_id, user_id, text, image, hashtags, mentions):
         content.text = text
         content.image = image
 
+        old_hashtags, old_usernames = autocomplete_uses_of(content.content_id)
         delete_mentions_for_content(content.content_id)
-        create_mentions(content.content_id, mentions)
+        mentioned = create_mentions(content.content_id, mentions)
 
-        delete_hashtags_for_content(content.content_id)
+        trending_uses = delete_hashtags_for_content(content.content_id)
         create_hashtags(content.content_id, hashtags)
         # similar lines
         # pylint: disable=R0801
+        transaction_id = current_transaction_id()
         session.commit()
+        mark_write(user_id)
+        add_to_autocomplete(
+            transaction_id, hashtags=old_hashtags, usernames=old_usernames, sign=-1
+        )
+        add_to_autocomplete(transaction_id, hashtags=hashtags, usernames=mentioned)
+        add_to_trending(trending_uses, transaction_id, -1)
+        add_to_trending(trending_uses_of(content.content_id), transaction_id)
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
@@ -89,7 +124,8 @@ def update_post(post_id, user_id, text, image, hashtags, mentions):
 
 def delete_post(post_id, user_id):
     """
-    Deletes the post and all the reposts made of that post, as well as the hashtags and likes
+    Deletes the post and all the reposts made of that post, as well as the hashtags and likes,
+    and updates the counters, all of it in a single commit
     """
     try:
         original_post = get_post(post_id)
@@ -102,6 +138,28 @@ def delete_post(post_id, user_id):
         if original_post.user_creator_id != user_id:
             raise UserWithouPermission()
 
+        posts_to_remove = (
+            session.query(Post.post_id, Post.user_poster_id)
+            .filter(Post.content_id == original_post.content_id)
+            .all()
+        )
+        reposts_to_remove = (
+            session.query(Post.user_poster_id, Post.created_at)
+            .filter(
+                Post.content_id == original_post.content_id,
+                Post.user_poster_id != user_id,
+            )
+            .all()
+        )
+        likes_by_day = (
+            # pylint: disable=E1102
+            session.query(cast(Like.created_at, Date), func.count())
+            .filter(Like.content_id == original_post.content_id)
+            .group_by(cast(Like.created_at, Date))
+            .all()
+        )
+        trending_uses = trending_uses_of(original_post.content_id)
+        autocomplete_uses = autocomplete_uses_of(original_post.content_id)
         delete_reposts_for_content(original_post.content_id)
         delete_hashtags_for_content(original_post.content_id)
         delete_likes_for_content(original_post.content_id)
@@ -113,10 +171,28 @@ def delete_post(post_id, user_id):
             .filter(Content.content_id == original_post.content_id)
             .first()
         )
+        add_to_user_counters(
+            user_id, posts=-1, likes_received=-content_to_delete.like_count
+        )
+        add_to_daily_stats(user_id, original_post.created_at.date(), posts=-1)
+        for reposter_id, reposted_at in reposts_to_remove:
+            add_to_user_counters(reposter_id, reposts=-1)
+            add_to_daily_stats(reposter_id, reposted_at.date(), reposts_made=-1)
+            add_to_daily_stats(user_id, reposted_at.date(), reposts_received=-1)
+        for day, likes in likes_by_day:
+            add_to_daily_stats(user_id, day, likes_received=-likes)
         session.delete(content_to_delete)
         session.delete(original_post)
 
+        transaction_id = current_transaction_id()
         session.commit()
+        mark_write(user_id)
+        remove_posts_from_timelines(posts_to_remove)
+        add_to_trending(trending_uses, transaction_id, -1)
+        add_to_autocomplete(transaction_id, *autocomplete_uses, sign=-1)
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
+    except Exception:
+        session.rollback()
+        raise
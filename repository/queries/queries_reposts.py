@@ -8,6 +8,17 @@ from sqlalchemy.exc import IntegrityError
 from repository.queries.common_setup import *
 
 from repository.queries.queries_global import is_public, get_post, execute_delete_query
+from repository.queries.queries_counters import (
+    add_to_repost_count,
+    add_to_user_counters,
+    add_to_daily_stats,
+)
+from repository.queries.queries_viewer_state import update_viewer_state, REPOSTED
+from repository.queries.queries_trending_topic import add_to_trending, trending_uses_of
+from repository.queries.queries_timeline import (
+    fan_out_post,
+    remove_posts_from_timelines,
+)
 
 # pylint: disable=C0114, W0401, W0614, E0401
 from repository.errors import (
@@ -47,21 +58,41 @@ def create_repost(post_id: int, user_reposter_id: int):
         if repost_check is not None:
             raise RepostAlreadyMade()
 
+        content_id = post.content_id
         repost = Post(
             user_poster_id=user_reposter_id,
             user_creator_id=post.user_creator_id,
-            content_id=post.content_id,
+            content_id=content_id,
         )
 
         # similar lines
         # pylint: disable=R0801
         session.add(repost)
+        session.flush()
+        add_to_repost_count(content_id, 1)
+        add_to_user_counters(user_reposter_id, reposts=1)
+        add_to_repost_stats(repost, 1)
+        transaction_id = current_transaction_id()
         session.commit()
+        mark_write(user_reposter_id)
+        update_viewer_state(user_reposter_id, content_id, REPOSTED, True)
+        fan_out_post(repost)
+        add_to_trending(trending_uses_of(content_id, user_reposter_id), transaction_id)
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
 
 
+def add_to_repost_stats(repost, amount):
+    """
+    Adds amount (1 or -1) to the reposts made by the reposter and to the
+    reposts received by the creator, on the day of the repost
+    """
+    day = repost.created_at.date()
+    add_to_daily_stats(repost.user_poster_id, day, reposts_made=amount)
+    add_to_daily_stats(repost.user_creator_id, day, reposts_received=amount)
+
+
 # ----- DELETE ------
 
 
@@ -90,9 +121,20 @@ def delete_users_repost_from_post(post_id, user_id):
         if repost_to_delete.user_creator_id == user_id:
             raise UserWithouPermission()
 
+        content_id = repost_to_delete.content_id
+        repost_id = repost_to_delete.post_id
+        trending_uses = trending_uses_of(content_id, user_id)
+        add_to_repost_stats(repost_to_delete, -1)
         session.delete(repost_to_delete)
+        add_to_repost_count(content_id, -1)
+        add_to_user_counters(user_id, reposts=-1)
         # pylint: disable=R0801
+        transaction_id = current_transaction_id()
         session.commit()
+        mark_write(user_id)
+        update_viewer_state(user_id, content_id, REPOSTED, False)
+        remove_posts_from_timelines([(repost_id, user_id)])
+        add_to_trending(trending_uses, transaction_id, -1)
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
@@ -115,9 +157,19 @@ def delete_repost(post_id, user_id):
         if repost.user_creator_id == user_id:
             raise UserWithouPermission()
 
+        content_id = repost.content_id
+        trending_uses = trending_uses_of(content_id, user_id)
+        add_to_repost_stats(repost, -1)
         session.delete(repost)
+        add_to_repost_count(content_id, -1)
+        add_to_user_counters(user_id, reposts=-1)
         # pylint: disable=R0801
+        transaction_id = current_transaction_id()
         session.commit()
+        mark_write(user_id)
+        update_viewer_state(user_id, content_id, REPOSTED, False)
+        remove_posts_from_timelines([(post_id, user_id)])
+        add_to_trending(trending_uses, transaction_id, -1)
     except IntegrityError as error:
         session.rollback()
         raise DatabaseError from error
@@ -0,0 +1,195 @@
+"""
+Fan-out on write of the posts and reposts into the home timelines of the
+followers (see repository/timeline.py), and the page of the feed that is
+read from them.
+
+The accounts with more than TIMELINE_FAN_OUT_MAX_FOLLOWERS followers are
+not pushed (it would be a write per follower on every post): their posts
+are read from the database when the feed is read (fan-out on read) and
+merged with the timeline.
+"""
+import os
+from sqlalchemy import func
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.common_setup import *
+from repository.cache import LRUCache
+from repository.errors import TimelineStoreError
+from repository.timeline import (
+    TimelineEntry,
+    InMemoryTimelineStore,
+    RedisTimelineStore,
+)
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.tables.posts import Post
+from repository.tables.users import Following
+
+TIMELINE_STORE = os.environ.get("TIMELINE_STORE", "memory")
+TIMELINE_REDIS_URL = os.environ.get("TIMELINE_REDIS_URL", "redis://localhost:6379/0")
+TIMELINE_MAX_ENTRIES = int(os.environ.get("TIMELINE_MAX_ENTRIES", "800"))
+TIMELINE_TTL = float(os.environ.get("TIMELINE_TTL", "600"))
+TIMELINE_CACHED_USERS = int(os.environ.get("TIMELINE_CACHED_USERS", "10000"))
+TIMELINE_FAN_OUT_MAX_FOLLOWERS = int(
+    os.environ.get("TIMELINE_FAN_OUT_MAX_FOLLOWERS", "5000")
+)
+
+
+def create_timeline_store():
+    """
+    Returns the store chosen with TIMELINE_STORE ("memory" or "redis")
+    """
+    if TIMELINE_STORE == "redis":
+        return RedisTimelineStore(
+            TIMELINE_REDIS_URL, TIMELINE_MAX_ENTRIES, TIMELINE_TTL
+        )
+    return InMemoryTimelineStore(
+        TIMELINE_MAX_ENTRIES, TIMELINE_TTL, TIMELINE_CACHED_USERS
+    )
+
+
+timeline_store = create_timeline_store()
+
+# user_id -> if it has more followers than TIMELINE_FAN_OUT_MAX_FOLLOWERS
+fan_out_on_read_cache = LRUCache(100000, TIMELINE_TTL)
+
+
+# ----- WRITE ------
+
+
+def get_followers_to_fan_out(user_id):
+    """
+    Returns the ids of the followers of the user, or None if they are too
+    many to push their posts (fan-out on read)
+    """
+    followers = [
+        follower_id
+        for (follower_id,) in session.query(Following.user_id)
+        .filter(Following.following_id == user_id)
+        .limit(TIMELINE_FAN_OUT_MAX_FOLLOWERS + 1)
+    ]
+    fan_out_on_read = len(followers) > TIMELINE_FAN_OUT_MAX_FOLLOWERS
+    fan_out_on_read_cache.set(user_id, fan_out_on_read)
+    return None if fan_out_on_read else followers
+
+
+def fan_out_post(post):
+    """
+    Pushes the post (or repost) into the timelines of its poster and their
+    followers. Call it after the commit.
+    """
+    user_ids = [post.user_poster_id] + (
+        get_followers_to_fan_out(post.user_poster_id) or []
+    )
+    try:
+        timeline_store.push(user_ids, TimelineEntry(post.created_at, post.post_id))
+    except (OSError, TimelineStoreError):
+        # the post is saved, the timelines get it when they are rebuilt
+        pass
+
+
+def remove_posts_from_timelines(posts):
+    """
+    Removes the posts, rows (post_id, user_poster_id), from the timelines
+    of their posters and their followers. Call it after the commit.
+    """
+    for post_id, user_poster_id in posts:
+        user_ids = [user_poster_id] + (get_followers_to_fan_out(user_poster_id) or [])
+        try:
+            timeline_store.remove(user_ids, post_id)
+        except (OSError, TimelineStoreError):
+            # hydrate_posts skips the posts that don't exist anymore
+            pass
+
+
+# ----- READ ------
+
+
+def get_followed_users(user_id):
+    """
+    Returns the ids of the users that the user follows, split in
+    (pushed to their followers, read on the feed)
+    """
+    followed = [
+        following_id
+        for (following_id,) in read_from_replica(
+            session.query(Following.following_id).filter(Following.user_id == user_id),
+            user_id,
+        )
+    ]
+    not_cached = [
+        following_id
+        for following_id in followed
+        if fan_out_on_read_cache.get(following_id) is None
+    ]
+    if not_cached:
+        with_many_followers = {
+            following_id
+            for (following_id,) in read_from_replica(
+                session.query(Following.following_id)
+                .filter(Following.following_id.in_(not_cached))
+                .group_by(Following.following_id)
+                .having(func.count() > TIMELINE_FAN_OUT_MAX_FOLLOWERS),
+                user_id,
+            )
+        }
+        for following_id in not_cached:
+            fan_out_on_read_cache.set(following_id, following_id in with_many_followers)
+
+    pushed, read_on_feed = [], []
+    for following_id in followed:
+        if fan_out_on_read_cache.get(following_id):
+            read_on_feed.append(following_id)
+        else:
+            pushed.append(following_id)
+    return pushed, read_on_feed
+
+
+def query_timeline_entries(user_id, poster_ids, oldest_date, amount):
+    """
+    Returns the amount newest (created_at, post_id) of the posts and reposts
+    of the posters, older than oldest_date (if it's not None)
+    """
+    if not poster_ids:
+        return []
+    query = session.query(Post.created_at, Post.post_id).filter(
+        Post.user_poster_id.in_(poster_ids)
+    )
+    if oldest_date is not None:
+        query = query.filter(Post.created_at < oldest_date)
+    query = query.order_by(Post.created_at.desc(), Post.post_id.desc()).limit(amount)
+    return [TimelineEntry(*row) for row in read_from_replica(query, user_id)]
+
+
+def get_timeline_page(user_id, oldest_date, amount):
+    """
+    Returns the amount newest posts and reposts (TimelineEntry, newest first)
+    of the user and the users they follow, older than oldest_date.
+
+    They are read from the timeline of the user (it's built the first time),
+    merged with the posts of the followed users that are read on the feed.
+    If the timeline has less than amount (it only keeps the newest
+    TIMELINE_MAX_ENTRIES), the rest are read from the database.
+    """
+    pushed, read_on_feed = get_followed_users(user_id)
+    posters = [user_id] + pushed
+    try:
+        entries = timeline_store.page(user_id, oldest_date, amount)
+        if entries is None:
+            timeline_store.build(
+                user_id,
+                query_timeline_entries(user_id, posters, None, TIMELINE_MAX_ENTRIES),
+            )
+            entries = timeline_store.page(user_id, oldest_date, amount)
+    except (OSError, TimelineStoreError):
+        entries = []
+
+    if len(entries) < amount:
+        oldest_in_timeline = entries[-1].created_at if entries else oldest_date
+        entries += query_timeline_entries(
+            user_id, posters, oldest_in_timeline, amount - len(entries)
+        )
+
+    entries += query_timeline_entries(user_id, read_on_feed, oldest_date, amount)
+    unique_entries = {entry.post_id: entry for entry in entries}.values()
+    return sorted(unique_entries, reverse=True)[:amount]
@@ -1,19 +1,382 @@
 """
 This file contains the queries for the trending topics
+
+The trending topics of up to TRENDING_MAX_DAYS days are read from counters
+kept in memory (see repository/trending.py), that are built from the
+database the first time they are read (and when the app starts) and
+updated when hashtags are created or deleted and when posts are reposted
+or deleted. Every worker process has its own, so the writes made through
+another worker show up when they are built again (in the background, once
+they are older than TRENDING_REBUILD_SECONDS). Longer windows are counted
+on the database.
+
+A hashtag counts once for every post of its content (the post and its
+reposts) made by a public user, at the time the hashtag was created.
+
+With TRENDING_BACKEND=approximate the counters take a fixed amount of
+memory (sketches of TRENDING_SKETCH_WIDTH x TRENDING_SKETCH_DEPTH counters
+and the TRENDING_HEAVY_HITTERS most used hashtags per hour) and the uses
+they return are estimations, see repository/trending.py for their bounds.
+
+The windows of TRENDING_SNAPSHOT_DAYS days are served from the snapshots
+that repository/jobs/trending_snapshots.py writes every
+TRENDING_SNAPSHOT_SECONDS, the same for every worker, with the time they
+were computed. The other windows, the pages past TRENDING_SNAPSHOT_SIZE and
+the snapshots older than TRENDING_SNAPSHOT_MAX_AGE are computed live.
+
+The trending topics of a location (where the users that posted are) come
+from exact counters per location: the ones of the TRENDING_HOT_LOCATIONS
+most used locations are built with the rest of the counters, the ones of
+the other locations when they are read, and the TRENDING_CACHED_LOCATIONS
+read the most recently are kept for TRENDING_REBUILD_SECONDS.
 """
+import os
+import time
 from datetime import datetime, timedelta
-from sqlalchemy import func, desc
+from sqlalchemy import func, desc, cast, Float
 
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from repository.queries.common_setup import *
-from repository.queries.queries_get import get_posts_and_reposts
-from repository.tables.posts import Hashtag, Post
+from repository.queries.queries_hydration import (
+    query_posts_page,
+    hydrate_posts,
+    paginate_posts,
+)
+from repository.cache import LRUCache, RebuiltValue
+from repository.errors import InvalidTrendingScore
+from repository.trending import (
+    TrendingCounters,
+    ApproximateTrendingCounters,
+    LocationCounters,
+)
+from repository.tables.posts import Hashtag, Post, TrendingSnapshot
 from repository.tables.users import User
 
+from control.utils.logger import logger
+
+TRENDING_MAX_DAYS = int(os.environ.get("TRENDING_MAX_DAYS", "30"))
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get("TRENDING_HALF_LIFE_HOURS", "24"))
+TRENDING_REBUILD_SECONDS = float(os.environ.get("TRENDING_REBUILD_SECONDS", "600"))
+TRENDING_SCORES = ["count", "decayed"]
+# "exact" or "approximate"
+TRENDING_BACKEND = os.environ.get("TRENDING_BACKEND", "exact")
+TRENDING_SKETCH_WIDTH = int(os.environ.get("TRENDING_SKETCH_WIDTH", "2048"))
+TRENDING_SKETCH_DEPTH = int(os.environ.get("TRENDING_SKETCH_DEPTH", "4"))
+TRENDING_HEAVY_HITTERS = int(os.environ.get("TRENDING_HEAVY_HITTERS", "256"))
+TRENDING_HOT_LOCATIONS = int(os.environ.get("TRENDING_HOT_LOCATIONS", "50"))
+TRENDING_CACHED_LOCATIONS = int(os.environ.get("TRENDING_CACHED_LOCATIONS", "200"))
+TRENDING_SNAPSHOT_DAYS = [1, 7, 30]
+# 0 doesn't run the job in the app
+TRENDING_SNAPSHOT_SECONDS = float(os.environ.get("TRENDING_SNAPSHOT_SECONDS", "60"))
+TRENDING_SNAPSHOT_SIZE = int(os.environ.get("TRENDING_SNAPSHOT_SIZE", "100"))
+TRENDING_SNAPSHOT_MAX_AGE = float(
+    os.environ.get("TRENDING_SNAPSHOT_MAX_AGE", str(3 * TRENDING_SNAPSHOT_SECONDS))
+)
+
+
+def query_trending_uses_by_hour(since):
+    """
+    Builds the query of the (hashtag, hour, uses) of the hashtags created
+    since the date
+    """
+    hour = func.date_trunc("hour", Hashtag.created_at)
+    return (
+        # pylint: disable=E1102
+        session.query(Hashtag.hashtag, hour, func.count(Post.post_id))
+        .join(Post, Hashtag.content_id == Post.content_id)
+        .join(User, Post.user_poster_id == User.id)
+        # pylint: disable=C0121
+        .filter(User.is_public == True)
+        .filter(Hashtag.created_at >= since)
+        .group_by(Hashtag.hashtag, hour)
+    )
+
+
+def build_trending_counters():
+    """
+    Returns the TrendingCounters built from the database (in a session of
+    their own, it may run in the background) and the snapshot they were
+    built from
+    """
+    start = time.monotonic()
+    now = datetime.utcnow()
+    if TRENDING_BACKEND == "approximate":
+        counters = ApproximateTrendingCounters(
+            TRENDING_MAX_DAYS,
+            TRENDING_HALF_LIFE_HOURS,
+            TRENDING_SKETCH_WIDTH,
+            TRENDING_SKETCH_DEPTH,
+            TRENDING_HEAVY_HITTERS,
+            now=now,
+        )
+    else:
+        counters = TrendingCounters(
+            TRENDING_MAX_DAYS, TRENDING_HALF_LIFE_HOURS, now=now
+        )
+    with snapshot_session_scope() as snapshot:
+        for hashtag, hour, uses in query_trending_uses_by_hour(
+            now - timedelta(days=TRENDING_MAX_DAYS)
+        ).yield_per(10000):
+            counters.add(hashtag, hour, uses, now=now)
+    logger.info(
+        "Built the %s trending counters in %.2f s",
+        TRENDING_BACKEND,
+        time.monotonic() - start,
+    )
+    return counters, snapshot
+
+
+trending_counters = RebuiltValue(
+    build_trending_counters, TRENDING_REBUILD_SECONDS, snapshot_sees
+)
+
+
+def query_hot_locations(since, amount):
+    """
+    Builds the query of the amount locations with the most uses of
+    hashtags (by public users) since the date
+    """
+    return (
+        # pylint: disable=E1102
+        session.query(User.location)
+        .join(Post, Post.user_poster_id == User.id)
+        .join(Hashtag, Hashtag.content_id == Post.content_id)
+        # pylint: disable=C0121
+        .filter(User.is_public == True, User.location != "")
+        .filter(Hashtag.created_at >= since)
+        .group_by(User.location)
+        .order_by(func.count().desc(), User.location)
+        .limit(amount)
+    )
+
+
+def query_location_uses_by_hour(since, locations):
+    """
+    Builds the query of the (location, hashtag, hour, uses) of the hashtags
+    created since the date, used in the locations
+    """
+    hour = func.date_trunc("hour", Hashtag.created_at)
+    return (
+        # pylint: disable=E1102
+        session.query(User.location, Hashtag.hashtag, hour, func.count(Post.post_id))
+        .join(Post, Hashtag.content_id == Post.content_id)
+        .join(User, Post.user_poster_id == User.id)
+        # pylint: disable=C0121
+        .filter(User.is_public == True, User.location.in_(locations))
+        .filter(Hashtag.created_at >= since)
+        .group_by(User.location, Hashtag.hashtag, hour)
+    )
+
+
+def build_counters_of_locations(locations):
+    """
+    Returns the (exact) TrendingCounters of each of the locations, built
+    from the database
+    """
+    now = datetime.utcnow()
+    counters = {
+        location: TrendingCounters(TRENDING_MAX_DAYS, TRENDING_HALF_LIFE_HOURS, now=now)
+        for location in locations
+    }
+    if locations:
+        for location, hashtag, hour, uses in query_location_uses_by_hour(
+            now - timedelta(days=TRENDING_MAX_DAYS), locations
+        ).yield_per(10000):
+            counters[location].add(hashtag, hour, uses, now=now)
+    return counters
+
+
+def build_counters_of_location(location):
+    """
+    Returns the (exact) TrendingCounters of the location built from the
+    database (in a session of its own) and the snapshot they were built from
+    """
+    with snapshot_session_scope() as snapshot:
+        return build_counters_of_locations([location])[location], snapshot
+
+
+def build_location_counters():
+    """
+    Returns the LocationCounters with the counters of the hot locations
+    built from the database (in a session of their own, it may run in the
+    background) and the snapshot they were built from
+    """
+    start = time.monotonic()
+    since = datetime.utcnow() - timedelta(days=TRENDING_MAX_DAYS)
+    with snapshot_session_scope() as snapshot:
+        hot = [
+            location
+            for (location,) in query_hot_locations(since, TRENDING_HOT_LOCATIONS)
+        ]
+        counters = build_counters_of_locations(hot)
+    logger.info(
+        "Built the trending counters of %s locations in %.2f s",
+        len(hot),
+        time.monotonic() - start,
+    )
+    return (
+        LocationCounters(
+            counters,
+            build_counters_of_location,
+            LRUCache(TRENDING_CACHED_LOCATIONS, TRENDING_REBUILD_SECONDS),
+            snapshot_sees,
+        ),
+        snapshot,
+    )
+
+
+location_counters = RebuiltValue(
+    build_location_counters, TRENDING_REBUILD_SECONDS, snapshot_sees
+)
+
+
+def trending_uses_of(content_id, user_poster_id=None):
+    """
+    Returns the (hashtag, created_at, location, uses) of the hashtags of
+    the content, where uses is how many of its posts (the post and its
+    reposts, or only the one of user_poster_id) were made by public users
+    of the location. Returns None (without running the query) if no
+    counters were built.
+    Call it before the hashtags or the posts are deleted.
+    """
+    if trending_counters.current() is None and location_counters.current() is None:
+        return None
+    uses = (
+        # pylint: disable=E1102
+        session.query(Hashtag.hashtag, Hashtag.created_at, User.location, func.count())
+        .join(Post, Hashtag.content_id == Post.content_id)
+        .join(User, Post.user_poster_id == User.id)
+        # pylint: disable=C0121
+        .filter(Hashtag.content_id == content_id, User.is_public == True)
+        .group_by(Hashtag.hashtag, Hashtag.created_at, User.location)
+    )
+    if user_poster_id is not None:
+        uses = uses.filter(Post.user_poster_id == user_poster_id)
+    return uses.all()
+
 
-def get_trending_topics_with_count(offset, amount, days):
+def add_to_trending(uses, transaction_id, sign=1):
+    """
+    Adds the uses (of trending_uses_of) to the counters (the global ones and
+    the ones of their locations, if they are built), or takes them back
+    with sign -1. Call it after the commit, with the id of the transaction
+    that wrote them (current_transaction_id).
     """
-    Returns the trending topics of the last x days
+    if uses is None:
+        return
+
+    def add_to_counters(counters):
+        for hashtag, created_at, _, amount in uses:
+            counters.add(hashtag, created_at, sign * amount)
+
+    def add_to_locations(locations):
+        for hashtag, created_at, location, amount in uses:
+            locations.add(location, hashtag, created_at, sign * amount, transaction_id)
+
+    trending_counters.update(add_to_counters, transaction_id)
+    location_counters.update(add_to_locations, transaction_id)
+
+
+def get_trending_topics_with_count(offset, amount, days, score="count", location=None):
+    """
+    Returns the (hashtag, posts, score) of the trending topics of the last
+    x days (of the posts made by users of the location, if there is one),
+    the most used first, or the highest score first if score is "decayed"
+    (every use weighs half every TRENDING_HALF_LIFE_HOURS), the score is
+    None if it's "count"
+    """
+    if score not in TRENDING_SCORES or (
+        score == "decayed" and days > TRENDING_MAX_DAYS
+    ):
+        raise InvalidTrendingScore(TRENDING_MAX_DAYS)
+    if days <= TRENDING_MAX_DAYS:
+        if location:
+            counters = location_counters.get().get(location)
+        else:
+            counters = trending_counters.get()
+        return counters.top(days, offset, amount, decayed=score == "decayed")
+    return [
+        (hashtag, posts, None)
+        for hashtag, posts in query_trending_topics_with_count(
+            offset, amount, days, location
+        )
+    ]
+
+
+def get_trending_topics(offset, amount, days, score="count", location=None):
+    """
+    Returns the (hashtag, posts, score) of the trending topics of the last
+    x days (see get_trending_topics_with_count) and when they were computed:
+    from the snapshot of the window if there is a recent one, or now
+    """
+    if (
+        not location
+        and days in TRENDING_SNAPSHOT_DAYS
+        and offset + amount <= TRENDING_SNAPSHOT_SIZE
+    ):
+        snapshot = get_trending_snapshot(days, score)
+        if snapshot is not None:
+            topics = snapshot.topics[offset : offset + amount]
+            return [tuple(topic) for topic in topics], snapshot.computed_at
+    computed_at = datetime.utcnow()
+    return (
+        get_trending_topics_with_count(offset, amount, days, score, location),
+        computed_at,
+    )
+
+
+def get_trending_snapshot(days, score):
+    """
+    Returns the snapshot of the trending topics of the window by the score,
+    or None if there is none newer than TRENDING_SNAPSHOT_MAX_AGE
+    """
+    oldest = datetime.utcnow() - timedelta(seconds=TRENDING_SNAPSHOT_MAX_AGE)
+    return read_from_replica(
+        session.query(TrendingSnapshot).filter(
+            TrendingSnapshot.days == days,
+            TrendingSnapshot.score == score,
+            TrendingSnapshot.computed_at >= oldest,
+        )
+    ).one_or_none()
+
+
+def query_trending_topics_decayed(offset, amount, days):
+    """
+    Builds the query of the (hashtag, posts, score) of the trending topics
+    of the last x days by decayed score counted on the database (every use
+    weighs half every TRENDING_HALF_LIFE_HOURS since it was made)
+    """
+    end_date = datetime.utcnow()
+    start_date = end_date - timedelta(days=days)
+    # in double precision, extract returns numeric (much slower to power)
+    age_hours = cast(func.extract("epoch", end_date - Hashtag.created_at), Float) / 3600
+    # pylint: disable=E1111
+    decayed = func.sum(func.power(0.5, age_hours / TRENDING_HALF_LIFE_HOURS))
+
+    trending_topics = (
+        session.query(
+            Hashtag.hashtag,
+            # pylint: disable=E1102
+            func.count(Post.post_id),
+            decayed.label("decayed_score"),
+        )
+        .join(Post, Hashtag.content_id == Post.content_id)
+        .join(User, Post.user_poster_id == User.id)
+        # pylint: disable=C0121
+        .filter(User.is_public == True)
+        .filter(Hashtag.created_at >= start_date, Hashtag.created_at <= end_date)
+        .group_by(Hashtag.hashtag)
+        .order_by(desc("decayed_score"), Hashtag.hashtag)
+    )
+
+    return read_from_replica(trending_topics.offset(offset).limit(amount))
+
+
+def query_trending_topics_with_count(offset, amount, days, location=None):
+    """
+    Builds the query of the (hashtag, posts) of the trending topics of the
+    last x days (of the users of the location, if there is one) counted on
+    the database
     """
     end_date = datetime.utcnow()
     start_date = end_date - timedelta(days=days)
@@ -29,22 +392,35 @@ def get_trending_topics_with_count(offset, amount, days):
         .group_by(Hashtag.hashtag)
         .order_by(desc("post_count"))
     )
+    if location:
+        trending_topics = trending_topics.filter(User.location == location)
 
-    return trending_topics.offset(offset).limit(amount)
+    return read_from_replica(trending_topics.offset(offset).limit(amount))
 
 
-def get_posts_on_a_trending_topic(user_id, hashtag, offset, amount):
+def get_posts_on_a_trending_topic(user_id, hashtag, offset, amount, cursor=None):
     """
     Returns the posts of a trending topic
     """
-    query_posts = get_posts_and_reposts(user_id)
+    return hydrate_posts(
+        query_posts_on_a_trending_topic(user_id, hashtag, offset, amount, cursor).all(),
+        user_id,
+    )
+
+
+def query_posts_on_a_trending_topic(user_id, hashtag, offset, amount, cursor=None):
+    """
+    Builds (without running it) the query of the page of ids (stage 1)
+    of get_posts_on_a_trending_topic
+    """
+    query_posts = query_posts_page(user_id)
 
     query_final = (
-        query_posts.join(Hashtag, Post.content_id == Hashtag.content_id)
-        .filter(Hashtag.hashtag == hashtag)
+        query_posts.join(Hashtag, Post.content_id == Hashtag.content_id).filter(
+            Hashtag.hashtag == hashtag
+        )
         # pylint: disable=C0121
         .filter(User.is_public == True)
-        .order_by(desc(Post.created_at))
     )
 
-    return query_final.offset(offset).limit(amount)
+    return paginate_posts(query_final, offset, amount, cursor)
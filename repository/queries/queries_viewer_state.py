@@ -0,0 +1,84 @@
+"""
+Viewer state: which of the contents of a page the user that is reading
+liked, reposted or put as favorite.
+
+It's answered with a single query per page (only for the contents that
+are not cached) and kept in a per (user, content) cache, that the likes,
+reposts and favorites queries update in place when the user changes it.
+"""
+import os
+from sqlalchemy import literal, select, union_all
+
+# pylint: disable=C0114, W0401, W0614, E0602, E0401
+from repository.queries.common_setup import *
+from repository.cache import LRUCache
+
+# pylint: disable=C0114, W0401, W0614, E0401
+from repository.tables.posts import Post, Like, Favorite
+
+VIEWER_STATE_CACHE_SIZE = int(os.environ.get("VIEWER_STATE_CACHE_SIZE", "100000"))
+VIEWER_STATE_CACHE_TTL = float(os.environ.get("VIEWER_STATE_CACHE_TTL", "60"))
+
+LIKED = "liked"
+REPOSTED = "reposted"
+FAVORITED = "favorited"
+NOTHING_DONE = {LIKED: False, REPOSTED: False, FAVORITED: False}
+
+viewer_state_cache = LRUCache(VIEWER_STATE_CACHE_SIZE, VIEWER_STATE_CACHE_TTL)
+
+
+def query_viewer_state(user_id, content_ids):
+    """
+    Returns the query with a row (content_id, what) for each content of
+    content_ids that the user liked, reposted or favorited.
+    """
+    return union_all(
+        select(Like.content_id, literal(LIKED).label("what")).where(
+            Like.user_id == user_id, Like.content_id.in_(content_ids)
+        ),
+        select(Post.content_id, literal(REPOSTED).label("what")).where(
+            Post.user_poster_id == user_id,
+            Post.user_creator_id != user_id,
+            Post.content_id.in_(content_ids),
+        ),
+        select(Favorite.content_id, literal(FAVORITED).label("what")).where(
+            Favorite.user_id == user_id, Favorite.content_id.in_(content_ids)
+        ),
+    )
+
+
+def get_viewer_state(user_id, content_ids, db_session=None):
+    """
+    Returns a dict content_id -> {liked, reposted, favorited} for
+    every one of the content_ids.
+    """
+    viewer_state = {}
+    missing = []
+    for content_id in set(content_ids):
+        cached = viewer_state_cache.get((user_id, content_id))
+        if cached is None:
+            missing.append(content_id)
+        else:
+            viewer_state[content_id] = cached
+
+    if missing:
+        db_session = db_session or session
+        fetched = {content_id: dict(NOTHING_DONE) for content_id in missing}
+        query = query_viewer_state(user_id, missing)
+        for content_id, what in db_session.execute(read_from_replica(query, user_id)):
+            fetched[content_id][what] = True
+        for content_id, state in fetched.items():
+            viewer_state_cache.set((user_id, content_id), state)
+        viewer_state.update(fetched)
+
+    return viewer_state
+
+
+def update_viewer_state(user_id, content_id, what, value):
+    """
+    Updates in place the cached state of the user for that content
+    (what is LIKED, REPOSTED or FAVORITED). Call it after the commit.
+    """
+    viewer_state_cache.update(
+        (user_id, content_id), lambda state: {**state, what: value}
+    )
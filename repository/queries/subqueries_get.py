@@ -2,8 +2,8 @@
 Queries for getting posts, reposts, and all their info
 """
 
-from sqlalchemy import case, func, or_
-from sqlalchemy.dialects.postgresql import array_agg
+from sqlalchemy import case, false, func, intersect, or_, select, true, union
+from sqlalchemy.orm import aliased
 
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from repository.queries.common_setup import *
@@ -15,155 +15,6 @@ from repository.tables.posts import *
 from repository.tables.users import *
 
 
-def create_subquery_likes_count():
-    """
-    Create subquery that counts the amount of likes each content has
-    """
-    return (
-        # func.count is not callable, when it actually is
-        # pylint: disable=E1102
-        session.query(Like.content_id, func.count(1).label("like_count"))
-        .group_by(Like.content_id)
-        .subquery()
-    )
-
-
-def create_subquery_resposts_count():
-    """
-    Create subquery that counts the amount of reposts each content has
-    """
-    return (
-        # func.count is not callable, when it actually is
-        # pylint: disable=E1102
-        session.query(Post.content_id, func.count(1).label("repost_count"))
-        .group_by(Post.content_id)
-        .subquery()
-    )
-
-
-def create_subquery_my_like_count_by_user(user_id):
-    """
-    To check if the user liked the content or not
-    The column will have a 1 if the user did like, or a 0 if they didnt
-    """
-    return (
-        # func.count is not callable, when it actually is
-        # pylint: disable=E1102
-        session.query(Like.content_id, func.count(1).label("user_like_count"))
-        .filter(Like.user_id == user_id)
-        .group_by(Like.content_id)
-        .subquery()
-    )
-
-
-def create_subquery_my_favorites_count(user_id):
-    """
-    To check if the user favorited the content or not
-    The column will have a 1 if the user did favorite, or a 0 if they didnt
-    """
-    return (
-        # func.count is not callable, when it actually is
-        # pylint: disable=E1102
-        session.query(Favorite.content_id, func.count(1).label("user_favorite_count"))
-        .filter(Favorite.user_id == user_id)
-        .group_by(Favorite.content_id)
-        .subquery()
-    )
-
-
-def create_subquery_my_reposts_count(user_visitor_id):
-    """
-    To check if the user reposted the content or not
-    The column will have a 1 if the user did repost, or a 0 if they didnt
-    """
-    return (
-        # func.count is not callable, when it actually is
-        # pylint: disable=E1102
-        session.query(Post.content_id, func.count(1).label("user_repost_count"))
-        .filter(
-            Post.user_poster_id == user_visitor_id,
-            Post.user_creator_id != user_visitor_id,
-        )
-        .group_by(Post.content_id)
-        .subquery()
-    )
-
-
-def create_subquery_hashtags():
-    """
-    Create a subquery that retrieves hashtags per 'content_id'.
-    """
-    return (
-        session.query(Hashtag.content_id, array_agg(Hashtag.hashtag).label("hashtags"))
-        .group_by(Hashtag.content_id)
-        .subquery()
-    )
-
-
-def create_subquery_mentions():
-    """
-    Create a subquery that retrieves mentions per 'content_id'.
-    """
-    subquery = (
-        session.query(Mention.content_id, array_agg(User.username).label("mentions"))
-        .join(User, Mention.user_mention_id == User.id)
-        .group_by(Mention.content_id)
-        .subquery()
-    )
-    return subquery
-
-
-def create_did_i_like_column(subquery_user_like_count):
-    """
-    Create a subquery that checks if the value in the user_like_count
-    column is 0 (--> the user didnt like the content) or 1
-    (--> the user did like the content), and replaces each value with
-    a False or True respetively
-    """
-    return case(
-        (subquery_user_like_count.c.user_like_count != 0, True), else_=False
-    ).label("did_I_like")
-
-
-def create_did_i_put_favorite_column(subquery_user_favorite_count):
-    """
-    Create a subquery that checks if the value in the user_favorite_count
-    column is 0 (--> the user didnt favorite the content) or 1
-    (--> the user did favorite the content), and replaces each value with
-    a False or True respetively
-    """
-    return case(
-        (subquery_user_favorite_count.c.user_favorite_count != 0, True), else_=False
-    ).label("did_I_favorite")
-
-
-def create_did_i_repost_column(subquery_user_repost_count):
-    """
-    Create a subquery that checks if the value in the user_repost_count
-    column is 0 (--> the user didnt repost the content) or 1
-    (--> the user did repost the content), and replaces each value with
-    a False or True respetively
-    """
-    return case(
-        (subquery_user_repost_count.c.user_repost_count != 0, True), else_=False
-    ).label("did_I_repost")
-
-
-def create_how_many_reposts(subquery_repost_count):
-    """
-    Creates a subquery that counts the amount of reposts each content has.
-    The -1 is to not count the original post as a repost
-    """
-    return (subquery_repost_count.c.repost_count - 1).label("how_many_reposts")
-
-
-def create_how_many_likes(subquery_likes_count):
-    """
-    Creates a subquery that counts the amount of likes each content has.
-    """
-    return subquery_likes_count.c.like_count.label("how_many_likes")
-
-
 def create_subquery_hashtags_interests(user_id):
     """
     Create subquery that returns all the content_id that have at least one
@@ -178,36 +29,60 @@ def create_subquery_hashtags_interests(user_id):
     )
 
 
-### chequear, la acabo de cambiar
 def create_subquery_posts_from_followd(user_id):
     """
     Create subquery that returns all the posts from users that the user_id follows
+    (and the posts of the user_id)
     """
+    followed = session.query(Following.following_id).filter(
+        Following.user_id == user_id
+    )
     return (
         session.query(Post.post_id)
-        .outerjoin(
-            Following,
-            or_(
-                Following.following_id == Post.user_poster_id,
-                Post.user_poster_id == user_id,
-            ),
-        )
-        .filter(or_(Following.user_id == user_id, Post.user_poster_id == user_id))
-        .distinct()
+        .filter(or_(Post.user_poster_id == user_id, Post.user_poster_id.in_(followed)))
         .subquery()
     )
 
 
-def create_subquery_from_search_by_hashtags(hashtags):
+def normalize_hashtag(hashtag):
     """
-    Create subquery that returns all the contents ids
+    Returns the hashtag as it is on hashtag_normalized (lowercase, without
+    the leading #). A trailing * (prefix search) is kept.
     """
-    return (
-        session.query(Hashtag.content_id)
-        .filter(Hashtag.hashtag.in_(hashtags))
-        .distinct()
-        .subquery()
-    )
+    return hashtag.strip().lstrip("#").lower()
+
+
+def create_hashtag_condition(hashtag):
+    """
+    Returns the condition of the hashtags that match the normalized hashtag:
+    the ones that start with it if it ends with * (#foot*), or the equal ones
+    """
+    if hashtag.endswith("*"):
+        return Hashtag.hashtag_normalized.startswith(
+            hashtag.rstrip("*"), autoescape=True
+        )
+    return Hashtag.hashtag_normalized == hashtag
+
+
+def create_subquery_from_search_by_hashtags(hashtags, mode="or"):
+    """
+    Create subquery that returns all the contents ids that have any of the
+    hashtags (mode "or") or all of them (mode "and"). Every hashtag can be a
+    prefix (#foot*), the case and the leading # don't matter.
+    """
+    hashtags = {normalize_hashtag(hashtag) for hashtag in hashtags}
+    searches = [
+        select(Hashtag.content_id).where(create_hashtag_condition(hashtag))
+        for hashtag in sorted(hashtags)
+        if hashtag.rstrip("*")
+    ]
+    if not searches:
+        return select(Hashtag.content_id).where(false())
+    if len(searches) == 1:
+        return searches[0]
+    if mode == "and":
+        return intersect(*searches)
+    return union(*searches)
 
 
 def create_subquery_get_shared_location(user_id):
@@ -240,124 +115,154 @@ def create_subquery_followings(user_id):
     )
 
 
-def create_subquery_followings_of_my_followings(subquery_following):
+def create_subquery_get_interests(user_id):
     """
-    Create subquery that returns the followings of those I follow
+    Create subquery that returns all the interests that the user_id has
     """
     return (
-        session.query(Following.following_id.label("friend_of_friend"))
-        .filter(Following.user_id.in_(subquery_following))
+        session.query(Interests.interest)
+        .filter(Interests.user_id == user_id)
         .subquery()
     )
 
 
-def create_subquery_common_followings_count(
-    user_id, subquery_followings_of_my_followings
-):
+def create_subquery_candidates_of_my_followings(user_id, limit):
     """
-    Create subquery that returns the amount of common followings
+    Create subquery that returns the (up to limit) users followed by the most
+    of those I follow, that I don't follow (the ones of my location first
+    among the ones followed by as many)
     """
+    following = aliased(Following)
     return (
-        session.query(
-            User.id.label("id"),
-            # func.count is not callable, when it actually is
-            # pylint: disable=E1102
-            func.count(subquery_followings_of_my_followings.c.friend_of_friend).label(
-                "friend_of_friend_count"
-            ),
+        select(Following.following_id.label("id"))
+        .join(following, Following.user_id == following.following_id)
+        .join(User, User.id == Following.following_id)
+        .where(following.user_id == user_id)
+        .where(Following.following_id != user_id)
+        .where(
+            ~Following.following_id.in_(
+                select(create_subquery_get_followed_users(user_id))
+            )
         )
-        .outerjoin(
-            subquery_followings_of_my_followings,
-            User.id == subquery_followings_of_my_followings.c.friend_of_friend,
+        .group_by(Following.following_id, User.location)
+        .order_by(
+            # pylint: disable=E1102
+            func.count().desc(),
+            create_subquery_get_shared_location(user_id).desc(),
+            Following.following_id.desc(),
         )
-        .filter(User.id != user_id)
-        .group_by(User.id)
-        .subquery()
+        .limit(limit)
     )
 
 
-def create_subquery_get_interests(user_id):
+def create_subquery_candidates_of_my_location(user_id, limit):
     """
-    Create subquery that returns all the interests that the user_id has
+    Create subquery that returns the (up to limit) newest users of my location
     """
+    my_location = select(User.location).where(User.id == user_id).scalar_subquery()
     return (
-        session.query(Interests.interest)
-        .filter(Interests.user_id == user_id)
-        .subquery()
+        select(User.id.label("id"))
+        .where(User.location == my_location)
+        .where(User.id != user_id)
+        .order_by(User.id.desc())
+        .limit(limit)
     )
 
 
-def create_subquery_get_posts_that_match_my_interests(subquery_interests):
+def create_subquery_candidates_of_my_interests(user_id, limit):
     """
-    Create subquery that returns all posts that have at least one hashtag
+    Create subquery that returns the (up to limit) users with the most posts
+    among the newest limit posts of each hashtag that I'm interested in
     """
+    interests = create_subquery_get_interests(user_id)
+    newest = (
+        select(Hashtag.content_id)
+        .where(Hashtag.hashtag == interests.c.interest)
+        .order_by(Hashtag.created_at.desc())
+        .limit(limit)
+        .lateral()
+    )
     return (
-        session.query(Post.user_creator_id, Post.post_id.label("interest_posts"))
-        .join(Hashtag, Post.content_id == Hashtag.content_id)
-        .filter(Hashtag.hashtag.in_(subquery_interests))
-        .subquery()
+        select(Post.user_creator_id.label("id"))
+        .select_from(interests)
+        .join(newest, true())
+        .join(Post, Post.content_id == newest.c.content_id)
+        .where(Post.user_creator_id != user_id)
+        .group_by(Post.user_creator_id)
+        # pylint: disable=E1102
+        .order_by(func.count().desc(), Post.user_creator_id.desc())
+        .limit(limit)
     )
 
 
-def create_subquery_get_posts_that_match_my_interests_count(
-    user_id, subquery_interest_posts
-):
+def create_subquery_recommendation_candidates(user_id, limit):
+    """
+    Create subquery that returns the candidates to recommend to the user_id:
+    the ones of my followings, of my location and of my interests (up to
+    limit of each)
+    """
+    return union(
+        create_subquery_candidates_of_my_followings(user_id, limit),
+        create_subquery_candidates_of_my_location(user_id, limit),
+        create_subquery_candidates_of_my_interests(user_id, limit),
+    ).cte("candidates")
+
+
+def create_subquery_common_followings_count(subquery_following, candidates):
     """
-    Create subquery that returns the amount of posts that
-    have at least one hashtag
+    Create subquery that returns, for each one of the candidates that
+    someone I follow follows, how many of those I follow follow them
     """
     return (
-        session.query(
-            User.id,
+        select(
+            Following.following_id.label("id"),
             # func.count is not callable, when it actually is
             # pylint: disable=E1102
-            func.count(subquery_interest_posts.c.interest_posts).label(
-                "interest_posts_count"
-            ),
-        )
-        .outerjoin(
-            subquery_interest_posts,
-            User.id == subquery_interest_posts.c.user_creator_id,
+            func.count().label("friend_of_friend_count"),
         )
-        .filter(User.id != user_id)
-        .group_by(User.id)
+        .where(Following.user_id.in_(select(subquery_following)))
+        .where(Following.following_id.in_(select(candidates.c.id)))
+        .group_by(Following.following_id)
         .subquery()
     )
 
 
-def create_subquery_get_likes_that_match_my_interests(subquery_interests):
+def create_subquery_posts_that_match_my_interests_count(subquery_interests, candidates):
     """
-    Create subquery that returns all likes that have at least one hashtag
+    Create subquery that returns, for each one of the candidates with posts
+    with a hashtag that I'm interested in, the amount of them (one per hashtag)
     """
     return (
-        session.query(Like.user_id, Like.content_id.label("interest_likes"))
-        .join(Post, Post.content_id == Like.content_id)
+        select(
+            Post.user_creator_id.label("id"),
+            # pylint: disable=E1102
+            func.count().label("interest_posts_count"),
+        )
         .join(Hashtag, Post.content_id == Hashtag.content_id)
-        .filter(Post.user_creator_id == Post.user_poster_id)
-        .filter(Hashtag.hashtag.in_(subquery_interests))
+        .where(Post.user_creator_id.in_(select(candidates.c.id)))
+        .where(Hashtag.hashtag.in_(select(subquery_interests)))
+        .group_by(Post.user_creator_id)
         .subquery()
     )
 
 
-def create_subquery_get_likes_that_match_my_interests_count(
-    user_id, subquery_interest_likes
-):
+def create_subquery_likes_that_match_my_interests_count(subquery_interests, candidates):
     """
-    Create subquery that returns the amount of likes that
+    Create subquery that returns, for each one of the candidates with likes
+    to posts with a hashtag that I'm interested in, the amount of them (one
+    per hashtag)
     """
     return (
-        session.query(
-            User.id,
-            # func.count is not callable, when it actually is
+        select(
+            Like.user_id.label("id"),
             # pylint: disable=E1102
-            func.count(subquery_interest_likes.c.interest_likes).label(
-                "interest_likes"
-            ),
+            func.count().label("interest_likes"),
         )
-        .outerjoin(
-            subquery_interest_likes, User.id == subquery_interest_likes.c.user_id
-        )
-        .filter(User.id != user_id)
-        .group_by(User.id)
+        .join(Post, Post.content_id == Like.content_id)
+        .join(Hashtag, Post.content_id == Hashtag.content_id)
+        .where(Like.user_id.in_(select(candidates.c.id)))
+        .where(Post.user_creator_id == Post.user_poster_id)
+        .where(Hashtag.hashtag.in_(select(subquery_interests)))
+        .group_by(Like.user_id)
         .subquery()
     )
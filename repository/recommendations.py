@@ -0,0 +1,256 @@
+"""
+Recommended users of a batch of users at once, with sparse matrices (see
+the recommended users job, repository/jobs/recommend_users.py).
+
+The users are the rows and columns of the matrices by the order of their
+ids. With F the following graph (F[a, b] = 1 if a follows b), I the
+interests (I[a, h] = 1 if a is interested in the hashtag h), P the posts
+(P[b, h] = posts of b with the hashtag h) and L the likes (L[b, h] = likes
+of b to posts with the hashtag h), the features of a candidate b of a user
+a are:
+
+- mutual friends: (F . F)[a, b] (the paths a -> friend -> b)
+- posts that match my interests: (I . P^T)[a, b]
+- likes that match my interests: (I . L^T)[a, b]
+
+and the shared location, 1 if the location of b is the one of a. They are
+the same counts as the ones of get_recommended_accounts_for_a_user, and the
+candidates are ranked by them in the same order (mutual friends, shared
+location, posts, likes, id; all of them from the highest). Every user is a
+candidate here (the query only ranks the ones of its bounded sources), so
+both recommend the same users when the first ones are among those.
+
+So when a user has at least size friends of friends (that they don't
+follow), their first size are among them, and among the ones with at least
+as many mutual friends as the size-th one: F . F is computed for the whole
+batch at once, the posts and likes only for those pairs (the rows of P and
+L of the candidates times the ones of I of the users) and all of the pairs
+are sorted together. The users with less than that are ranked one by one
+among every user with some count and the ones with the highest ids (of
+their location, and of everyone), since a user with no counts is ranked by
+the location and the id alone.
+"""
+import numpy as np
+from scipy import sparse
+
+
+def _csr(rows, columns, values, shape):
+    """
+    Returns the CSR matrix of int32 with those values (the repeated
+    positions are added), with its indices sorted
+    """
+    matrix = sparse.csr_matrix(
+        (np.asarray(values, dtype=np.int32), (rows, columns)), shape=shape
+    )
+    matrix.sum_duplicates()
+    matrix.sort_indices()
+    return matrix
+
+
+def _indices(matrix, row):
+    """
+    Returns the columns of the values of the row of the matrix
+    """
+    return matrix.indices[matrix.indptr[row] : matrix.indptr[row + 1]]
+
+
+def _values(matrix, row, columns):
+    """
+    Returns the values of the row of the matrix (with sorted indices) at
+    the columns
+    """
+    start, end = matrix.indptr[row], matrix.indptr[row + 1]
+    indices = matrix.indices[start:end]
+    if not indices.size:
+        return np.zeros(len(columns), dtype=np.int32)
+    positions = np.minimum(np.searchsorted(indices, columns), len(indices) - 1)
+    return np.where(indices[positions] == columns, matrix.data[start:end][positions], 0)
+
+
+def _row_products(matrix, rows, other, other_rows):
+    """
+    Returns the dot product of each row of the matrix with the same one of
+    other (both given as the rows to take)
+    """
+    products = matrix[rows].multiply(other[other_rows])
+    return np.asarray(products.sum(axis=1), dtype=np.int32).ravel()
+
+
+class SparseRecommender:
+    """
+    The following graph, interests, posts and likes of every user as sparse
+    matrices, to rank the recommended users of batches of them.
+
+    user_ids and locations are columns of the users, follows is (follower
+    ids, followed ids), interests is (user ids, hashtags), and posts and
+    likes are (hashtags, user ids, amounts) of the posts with the hashtag
+    made by the user and of the likes of the user to posts with it.
+    """
+
+    # pylint: disable=R0913, R0914
+    def __init__(self, user_ids, locations, follows, interests, posts, likes):
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        order = np.argsort(user_ids)
+        self.user_ids = user_ids[order]
+        _, codes = np.unique(np.asarray(locations, dtype=object), return_inverse=True)
+        self.locations = codes[order]
+        size = len(self.user_ids)
+
+        followers, known_followers = self._index(follows[0])
+        followed, known_followed = self._index(follows[1])
+        known = known_followers & known_followed
+        self.follows = _csr(
+            followers[known], followed[known], np.ones(known.sum()), (size, size)
+        )
+
+        hashtags = {}
+        post_hashtags, post_users, post_amounts = posts
+        like_hashtags, like_users, like_amounts = likes
+        posts_by = [
+            hashtags.setdefault(hashtag, len(hashtags)) for hashtag in post_hashtags
+        ]
+        likes_by = [
+            hashtags.setdefault(hashtag, len(hashtags)) for hashtag in like_hashtags
+        ]
+        shape = (size, len(hashtags))
+        self.posts = self._hashtag_matrix(post_users, posts_by, post_amounts, shape)
+        self.likes = self._hashtag_matrix(like_users, likes_by, like_amounts, shape)
+
+        interested, interest_hashtags = [], []
+        for user_id, hashtag in zip(*interests):
+            if hashtag in hashtags:
+                interested.append(user_id)
+                interest_hashtags.append(hashtags[hashtag])
+        self.interests = self._hashtag_matrix(
+            interested, interest_hashtags, np.ones(len(interested)), shape
+        )
+
+        # the users of each location, by id
+        self._by_location = np.split(
+            np.argsort(self.locations, kind="stable"),
+            np.cumsum(np.bincount(self.locations))[:-1],
+        )
+
+    def _index(self, user_ids):
+        """
+        Returns the rows of the users and whether each one is known
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        rows = np.minimum(
+            np.searchsorted(self.user_ids, user_ids), len(self.user_ids) - 1
+        )
+        return rows, self.user_ids[rows] == user_ids
+
+    def _hashtag_matrix(self, user_ids, hashtags, amounts, shape):
+        rows, known = self._index(user_ids)
+        return _csr(
+            rows[known],
+            np.asarray(hashtags, dtype=np.int64)[known],
+            np.asarray(amounts)[known],
+            shape,
+        )
+
+    def __contains__(self, user_id):
+        return bool(self._index([user_id])[1][0])
+
+    def recommend(self, user_ids, size):
+        """
+        Returns {user_id: [(recommended_id, mutual_friends, location_shared,
+        interest_posts, interest_likes), ...]} with the first size
+        recommended users of each one of the (known) users, the first one
+        first
+        """
+        rows, known = self._index(user_ids)
+        rows = rows[known]
+        users = len(self.user_ids)
+        followed = self.follows[rows].tocoo()
+        mutual_friends = (self.follows[rows] @ self.follows).tocoo()
+        batch, candidates = mutual_friends.row, mutual_friends.col
+        keep = (candidates != rows[batch]) & ~np.isin(
+            batch.astype(np.int64) * users + candidates,
+            followed.row.astype(np.int64) * users + followed.col,
+        )
+        enough = np.bincount(batch[keep], minlength=len(rows)) >= size
+        keep &= enough[batch]
+        batch, candidates = batch[keep], candidates[keep]
+        friends = mutual_friends.data[keep]
+        # only the ones with at least as many as the size-th one can make it
+        by_friends = np.lexsort((-friends, batch))
+        least = np.zeros(len(rows), dtype=friends.dtype)
+        least[enough] = friends[
+            by_friends[np.searchsorted(batch, np.flatnonzero(enough)) + size - 1]
+        ]
+        keep = friends >= least[batch]
+        batch, candidates, friends = batch[keep], candidates[keep], friends[keep]
+        owners = rows[batch]
+        features = (
+            friends,
+            (self.locations[candidates] == self.locations[owners]).astype(np.int32),
+            _row_products(self.posts, candidates, self.interests, owners),
+            _row_products(self.likes, candidates, self.interests, owners),
+        )
+        # lexsort sorts by the last key first, from the lowest
+        order = np.lexsort(
+            (-candidates,) + tuple(-feature for feature in features[::-1]) + (batch,)
+        )
+        # the first size pairs of each user, still by user
+        starts = np.searchsorted(batch[order], np.arange(len(rows)))
+        first = order[np.arange(len(order)) - starts[batch[order]] < size]
+        bounds = np.searchsorted(batch[first], np.arange(len(rows) + 1))
+        ranked = np.column_stack(
+            [self.user_ids[candidates[first]]]
+            + [feature[first] for feature in features]
+        ).tolist()
+
+        recommended = {}
+        for number, row in enumerate(rows):
+            if enough[number]:
+                recommended[int(self.user_ids[row])] = [
+                    tuple(pair) for pair in ranked[bounds[number] : bounds[number + 1]]
+                ]
+            else:
+                recommended[int(self.user_ids[row])] = self._recommend_one(row, size)
+        return recommended
+
+    def _recommend_one(self, row, size):
+        """
+        Returns the first size recommended users of the user of the row,
+        among every user with some count and the ones with the highest ids
+        """
+        followed = self.follows[[row]]
+        mutual_friends = followed @ self.follows
+        interests = self.interests[[row]]
+        interest_posts = interests @ self.posts.T
+        interest_likes = interests @ self.likes.T
+        for matrix in (mutual_friends, interest_posts, interest_likes):
+            matrix.sort_indices()
+
+        excluded = followed.indices
+        fillers = size + len(excluded) + 1
+        candidates = np.unique(
+            np.concatenate(
+                [
+                    mutual_friends.indices,
+                    interest_posts.indices,
+                    interest_likes.indices,
+                    self._by_location[self.locations[row]][-fillers:],
+                    np.arange(max(len(self.user_ids) - fillers, 0), len(self.user_ids)),
+                ]
+            )
+        )
+        candidates = candidates[
+            (candidates != row) & ~np.isin(candidates, excluded, assume_unique=True)
+        ]
+        features = (
+            _values(mutual_friends, 0, candidates),
+            (self.locations[candidates] == self.locations[row]).astype(np.int32),
+            _values(interest_posts, 0, candidates),
+            _values(interest_likes, 0, candidates),
+        )
+        first = np.lexsort((candidates,) + features[::-1])[::-1][:size]
+        return list(
+            zip(
+                self.user_ids[candidates[first]].tolist(),
+                *[feature[first].tolist() for feature in features],
+            )
+        )
@@ -0,0 +1,175 @@
+"""
+Summaries of fixed size of a stream of uses of keys (see the approximate
+trending counters in repository/trending.py).
+
+CountMinSketch: depth rows of width counters, a key adds its amount to one
+counter of every row and its estimated count is the lowest of them. It
+never underestimates, and it overestimates by at most e / width * N (N the
+total of the stream) with probability 1 - e ** -depth. Two sketches of the
+same size are merged by adding their counters.
+
+SpaceSaving: the capacity keys with the highest counts (Metwally et al.).
+When it's full, a new key takes the place of the one with the lowest
+count, and inherits it (as its error). Every key with more than
+N / capacity uses is kept, and the count of a kept key is over its real
+count by at most its error. Two of them are merged as in the mergeable
+summaries of Agarwal et al.
+
+The positions of a key are computed with blake2b (not hash(), that changes
+between processes) so that the sketches of several workers can be merged.
+"""
+import hashlib
+import heapq
+from array import array
+
+
+def sketch_positions(key, width, depth):
+    """
+    Returns the position of the counter of the key in each row of a sketch
+    """
+    digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "little")
+    second = int.from_bytes(digest[8:], "little") | 1
+    return tuple(row * width + (first + row * second) % width for row in range(depth))
+
+
+class CountMinSketch:
+    """
+    Count-min sketch of width x depth counters (integers, or floats with
+    typecode "d")
+    """
+
+    def __init__(self, width, depth, typecode="q"):
+        self.width = width
+        self.depth = depth
+        self.typecode = typecode
+        self.table = array(typecode, [0]) * (width * depth)
+
+    def add(self, positions, amount=1):
+        """
+        Adds amount to the counters of the key at the positions (of
+        sketch_positions)
+        """
+        for position in positions:
+            self.table[position] += amount
+
+    def estimate(self, positions):
+        """
+        Returns the estimated count of the key at the positions
+        """
+        return min(self.table[position] for position in positions)
+
+    def merge(self, other, factor=1):
+        """
+        Adds the counters of other (a sketch of the same size) times factor
+        """
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Only sketches of the same size can be merged")
+        self.table = array(
+            self.typecode,
+            [mine + factor * theirs for mine, theirs in zip(self.table, other.table)],
+        )
+
+    @property
+    def bytes_used(self):
+        """
+        Bytes of the counters
+        """
+        return self.table.itemsize * len(self.table)
+
+
+class SpaceSaving:
+    """
+    The (up to) capacity keys with the highest counts, with the error of
+    each count
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        self.errors = {}
+        # (count, key) with stale entries, see _lowest
+        self._heap = []
+
+    def _lowest(self):
+        """
+        Returns the kept key with the lowest count. The heap has an entry of
+        every key with its count when it was pushed: it's pushed again when
+        it's popped with a higher count, and when the count goes down.
+        """
+        while True:
+            count, key = self._heap[0]
+            current = self.counts.get(key)
+            if current == count:
+                return key
+            if current is not None and current > count:
+                heapq.heapreplace(self._heap, (current, key))
+            else:
+                heapq.heappop(self._heap)
+
+    def add(self, key, amount=1):
+        """
+        Adds amount (negative to take them back) to the count of the key.
+        Returns (whether the key was added, the key that was removed or None).
+        """
+        if key in self.counts:
+            self.counts[key] += amount
+            if self.counts[key] <= 0:
+                del self.counts[key]
+                del self.errors[key]
+                return False, key
+            if amount < 0:
+                self._push(key)
+            return False, None
+        if amount <= 0:
+            return False, None
+        removed = None
+        error = 0
+        if len(self.counts) >= self.capacity:
+            removed = self._lowest()
+            error = self.counts.pop(removed)
+            del self.errors[removed]
+        self.counts[key] = error + amount
+        self.errors[key] = error
+        self._push(key)
+        return True, removed
+
+    def _push(self, key):
+        heapq.heappush(self._heap, (self.counts[key], key))
+        if len(self._heap) > 2 * self.capacity:
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def merge(self, other):
+        """
+        Returns the SpaceSaving (of this capacity) of the uses of both
+        """
+        # pylint: disable=W0212
+        own_lowest = self._floor()
+        other_lowest = other._floor()
+        merged = SpaceSaving(self.capacity)
+        counts = {}
+        for key in self.counts.keys() | other.counts.keys():
+            counts[key] = (
+                self.counts.get(key, own_lowest) + other.counts.get(key, other_lowest),
+                self.errors.get(key, own_lowest) + other.errors.get(key, other_lowest),
+            )
+        for key, (count, error) in heapq.nlargest(
+            self.capacity, counts.items(), key=lambda item: item[1][0]
+        ):
+            merged.counts[key] = count
+            merged.errors[key] = error
+        merged._heap = [(count, key) for key, count in merged.counts.items()]
+        heapq.heapify(merged._heap)
+        return merged
+
+    def _floor(self):
+        """
+        Returns the most that a key that is not kept could have been used
+        """
+        if len(self.counts) < self.capacity:
+            return 0
+        return self.counts[self._lowest()]
+
+    def __len__(self):
+        return len(self.counts)
@@ -6,8 +6,16 @@ This module represents the tables on the database of the users' microservice
 
 import datetime
 from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, UniqueConstraint
+from sqlalchemy import Date, Computed, Float, JSON
+from sqlalchemy import Index
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred
 from repository.tables.users import Base, create_users_foreign_key
 
+# text search configuration of contents.text_search, the searches by text
+# have to parse the query with the same one
+TEXT_SEARCH_CONFIG = "spanish"
+
 
 def create_content_foreign_key(is_primary_key):
     """
@@ -54,6 +62,20 @@ class Content(Base):
     content_id = Column(Integer, primary_key=True)
     text = Column(String(1000), unique=False, nullable=True)  # 1K
     image = Column(String(1000), unique=False, nullable=True)  # 1K
+    # denormalized counters, kept up to date by the likes and reposts queries
+    like_count = Column(Integer, nullable=False, default=0, server_default="0")
+    repost_count = Column(Integer, nullable=False, default=0, server_default="0")
+    # words of the text for the full text search, postgres keeps it up to date
+    # (deferred, it's only used by the search queries)
+    text_search = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                f"to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(text, ''))",
+                persisted=True,
+            ),
+        )
+    )
 
     # pylint: disable=too-many-arguments
     def __init__(self, text, image):
@@ -97,6 +119,10 @@ class Hashtag(Base):
     content_id = create_content_foreign_key(True)
     hashtag = Column(String(75), nullable=False, primary_key=True)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    # what the searches match: lowercase and without the leading #
+    hashtag_normalized = Column(
+        String(75), Computed("lower(ltrim(hashtag, '#'))", persisted=True)
+    )
 
     _table_args__ = (UniqueConstraint("content_id", "hashtag"),)
 
@@ -157,3 +183,166 @@ class Favorite(Base):
     def __init__(self, content_id, user_id):
         self.content_id = content_id
         self.user_id = user_id
+
+
+class UserCounters(Base):
+    """
+    Class that represents the profile counters of a user on the db
+    (denormalized, kept up to date by the posts, reposts and likes queries)
+    """
+
+    __tablename__ = "user_counters"
+
+    user_id = create_users_foreign_key(True)
+    posts_count = Column(Integer, nullable=False, default=0, server_default="0")
+    reposts_count = Column(Integer, nullable=False, default=0, server_default="0")
+    likes_received = Column(Integer, nullable=False, default=0, server_default="0")
+
+    def __init__(self, user_id, posts_count=0, reposts_count=0, likes_received=0):
+        self.user_id = user_id
+        self.posts_count = posts_count
+        self.reposts_count = reposts_count
+        self.likes_received = likes_received
+
+
+class UserDailyStats(Base):
+    """
+    Class that represents the daily rollup of the statistics of a user on
+    the db (what they did and got each day, kept up to date by the posts,
+    reposts and likes queries)
+    """
+
+    __tablename__ = "user_daily_stats"
+
+    user_id = create_users_foreign_key(True)
+    day = Column(Date, nullable=False, primary_key=True)
+    posts = Column(Integer, nullable=False, default=0, server_default="0")
+    reposts_made = Column(Integer, nullable=False, default=0, server_default="0")
+    reposts_received = Column(Integer, nullable=False, default=0, server_default="0")
+    likes_received = Column(Integer, nullable=False, default=0, server_default="0")
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        user_id,
+        day,
+        posts=0,
+        reposts_made=0,
+        reposts_received=0,
+        likes_received=0,
+    ):
+        self.user_id = user_id
+        self.day = day
+        self.posts = posts
+        self.reposts_made = reposts_made
+        self.reposts_received = reposts_received
+        self.likes_received = likes_received
+
+
+class TrendingSnapshot(Base):
+    """
+    Class that represents the trending topics of a window of days (by a
+    score) on the db, as computed by the trending snapshots job
+    """
+
+    __tablename__ = "trending_snapshots"
+
+    days = Column(Integer, nullable=False, primary_key=True)
+    score = Column(String(16), nullable=False, primary_key=True)
+    # [[hashtag, posts, score], ...], the first one first
+    topics = Column(JSON, nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+    # how long the run of the job that computed it took
+    duration_seconds = Column(Float, nullable=False)
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, days, score, topics, computed_at, duration_seconds):
+        self.days = days
+        self.score = score
+        self.topics = topics
+        self.computed_at = computed_at
+        self.duration_seconds = duration_seconds
+
+
+class RecommendedUserRow(Base):
+    """
+    Class that represents a recommended user of a user on the db, with the
+    features it's ranked by, as computed by the recommended users job
+    """
+
+    __tablename__ = "recommended_users"
+
+    user_id = create_users_foreign_key(True)
+    recommended_id = Column(
+        Integer,
+        ForeignKey("users.id", ondelete="CASCADE"),
+        nullable=False,
+        primary_key=True,
+    )
+    mutual_friends = Column(Integer, nullable=False)
+    location_shared = Column(Integer, nullable=False)
+    interest_posts = Column(Integer, nullable=False)
+    interest_likes = Column(Integer, nullable=False)
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        user_id,
+        recommended_id,
+        mutual_friends,
+        location_shared,
+        interest_posts,
+        interest_likes,
+    ):
+        self.user_id = user_id
+        self.recommended_id = recommended_id
+        self.mutual_friends = mutual_friends
+        self.location_shared = location_shared
+        self.interest_posts = interest_posts
+        self.interest_likes = interest_likes
+
+
+class RecommendationFingerprint(Base):
+    """
+    Class that represents when the recommended users of a user were computed
+    on the db, and the fingerprint of their location, followings and
+    interests at that moment (the job recomputes them when it changes)
+    """
+
+    __tablename__ = "recommendation_fingerprints"
+
+    user_id = create_users_foreign_key(True)
+    fingerprint = Column(String(32), nullable=False)
+    computed_at = Column(DateTime, nullable=False)
+
+    def __init__(self, user_id, fingerprint, computed_at):
+        self.user_id = user_id
+        self.fingerprint = fingerprint
+        self.computed_at = computed_at
+
+
+# Secondary indexes of the hot queries (created concurrently by the migration
+# 9b2e5d4c1a73). likes(user_id), favorites(user_id), mentions(user_mention_id)
+# and device_tokens(user_id) are already covered by their unique constraints.
+Index(
+    "ix_posts_user_poster_id_created_at",
+    Post.user_poster_id,
+    Post.created_at.desc(),
+)
+Index("ix_posts_user_creator_id_created_at", Post.user_creator_id, Post.created_at)
+Index("ix_posts_content_id", Post.content_id)
+Index("ix_posts_created_at", Post.created_at.desc())
+Index("ix_hashtags_hashtag_created_at", Hashtag.hashtag, Hashtag.created_at)
+
+# Search by text, created concurrently by the migration 6a1d3f5e7b92 (that
+# also creates the trigram index of contents.text when pg_trgm is available)
+Index("ix_contents_text_search", Content.text_search, postgresql_using="gin")
+
+# Search by hashtag (equal and prefix, hence text_pattern_ops), created
+# concurrently by the migration 2e6f8a0b4c57
+Index(
+    "ix_hashtags_hashtag_normalized",
+    Hashtag.hashtag_normalized,
+    Hashtag.content_id,
+    postgresql_ops={"hashtag_normalized": "text_pattern_ops"},
+)
@@ -8,7 +8,7 @@ import datetime
 from sqlalchemy import Column, Integer
 from sqlalchemy import String, DateTime
 from sqlalchemy import Boolean, ForeignKey
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, Index
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
@@ -78,6 +78,12 @@ class User(Base):
         self.is_public = is_public
 
 
+# the users of a location from the newest one (the candidates of the same
+# location of the recommended users), created concurrently by the
+# migration e4a7c9b1d5f3
+Index("ix_users_location_id", User.location, User.id.desc())
+
+
 class Following(Base):
     """
     Class that represents the following relation on the data base.
@@ -103,6 +109,10 @@ class Following(Base):
         self.following_id = following_id
 
 
+# followers of a user (the primary key only covers the followings)
+Index("ix_following_following_id", Following.following_id)
+
+
 class Interests(Base):
     """
     Class that represents the interests table of users
@@ -0,0 +1,271 @@
+"""
+Home timelines of the feed (fan-out on write).
+
+A timeline keeps, for one user, the (created_at, post_id) of the newest
+posts and reposts of the users they follow (and their own ones). The
+posts are pushed into the timelines of the followers when they are made
+(see queries_timeline), so a page of the feed is just a slice of it.
+
+Only the timelines that were built (from the database, the first time the
+feed is read) get the pushes, and they expire after ttl_seconds: the
+follows are written by the users service, so that's the most a timeline
+can be out of date with them.
+
+There are two stores with the same methods:
+
+- InMemoryTimelineStore: in the process (every worker has its own, so a
+  post made through another worker shows up when the timeline expires).
+- RedisTimelineStore: a sorted set per user in anything that speaks the
+  Redis protocol (score = created_at in microseconds, member = post_id).
+"""
+import bisect
+import datetime
+import socket
+import threading
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from repository.cache import LRUCache
+from repository.errors import TimelineStoreError
+
+TimelineEntry = namedtuple("TimelineEntry", ["created_at", "post_id"])
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class InMemoryTimelineStore:
+    """
+    Timelines kept in the process, in an LRU cache of max_users timelines
+    of at most max_entries entries each (oldest first)
+    """
+
+    def __init__(self, max_entries, ttl_seconds, max_users):
+        self.max_entries = max_entries
+        self._timelines = LRUCache(max_users, ttl_seconds)
+
+    def build(self, user_id, entries):
+        """
+        Replaces the timeline of the user with these entries
+        """
+        self._timelines.set(user_id, sorted(entries)[-self.max_entries :])
+
+    def push(self, user_ids, entry):
+        """
+        Adds the entry to the timelines of the users that have one built
+        """
+
+        def add(timeline):
+            if entry in timeline:
+                return timeline
+            timeline = list(timeline)
+            bisect.insort(timeline, entry)
+            return timeline[-self.max_entries :]
+
+        for user_id in user_ids:
+            self._timelines.update(user_id, add)
+
+    def remove(self, user_ids, post_id):
+        """
+        Removes the post from the timelines of the users
+        """
+
+        def without_post(timeline):
+            return [entry for entry in timeline if entry.post_id != post_id]
+
+        for user_id in user_ids:
+            self._timelines.update(user_id, without_post)
+
+    def page(self, user_id, oldest_date, amount):
+        """
+        Returns the (up to) amount newest entries older than oldest_date,
+        newest first, or None if the timeline of the user is not built
+        """
+        timeline = self._timelines.get(user_id)
+        if timeline is None:
+            return None
+        end = bisect.bisect_left(timeline, (oldest_date,))
+        return timeline[max(0, end - amount) : end][::-1]
+
+    def clear(self):
+        """
+        Removes every timeline
+        """
+        self._timelines.clear()
+
+
+class RedisTimelineStore:
+    """
+    Timelines kept as sorted sets (one per user) in a Redis server, or
+    anything that speaks its protocol. Each one has a BUILT member (score 0)
+    so that a push into an expired timeline is not taken as a built one.
+    """
+
+    BUILT = "built"
+
+    def __init__(self, url, max_entries, ttl_seconds, prefix="timeline:"):
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or "localhost", parsed.port or 6379)
+        self.database = int(parsed.path.strip("/") or 0)
+        self.max_entries = max_entries
+        self.ttl_seconds = int(ttl_seconds)
+        self.prefix = prefix
+        self._local = threading.local()
+
+    def build(self, user_id, entries):
+        """
+        Replaces the timeline of the user with these entries
+        """
+        key = self._key(user_id)
+        members = [0, self.BUILT]
+        for entry in entries:
+            members += [_score(entry.created_at), entry.post_id]
+        self._execute(
+            ["MULTI"],
+            ["DEL", key],
+            ["ZADD", key, *members],
+            self._trim(key),
+            ["EXPIRE", key, self.ttl_seconds],
+            ["EXEC"],
+        )
+
+    def push(self, user_ids, entry):
+        """
+        Adds the entry to the timelines of the users (the ones that are not
+        built expire without being read as built)
+        """
+        keys = [self._key(user_id) for user_id in user_ids]
+        commands = []
+        for key in keys:
+            commands += [
+                ["ZADD", key, _score(entry.created_at), entry.post_id],
+                self._trim(key),
+                ["TTL", key],
+            ]
+        if not commands:
+            return
+        replies = self._execute(*commands)
+        # the ones without an expiry were created by the push (EXPIRE NX,
+        # without a round trip, needs Redis 7)
+        expires = [
+            ["EXPIRE", key, self.ttl_seconds]
+            for key, ttl in zip(keys, replies[2::3])
+            if ttl == -1
+        ]
+        if expires:
+            self._execute(*expires)
+
+    def remove(self, user_ids, post_id):
+        """
+        Removes the post from the timelines of the users
+        """
+        commands = [["ZREM", self._key(user_id), post_id] for user_id in user_ids]
+        if commands:
+            self._execute(*commands)
+
+    def page(self, user_id, oldest_date, amount):
+        """
+        Returns the (up to) amount newest entries older than oldest_date,
+        newest first, or None if the timeline of the user is not built
+        """
+        key = self._key(user_id)
+        built, members = self._execute(
+            ["ZSCORE", key, self.BUILT],
+            [
+                "ZREVRANGEBYSCORE",
+                key,
+                f"({_score(oldest_date)}",
+                "(0",
+                "WITHSCORES",
+                "LIMIT",
+                0,
+                amount,
+            ],
+        )
+        if built is None:
+            return None
+        return [
+            TimelineEntry(
+                EPOCH + datetime.timedelta(microseconds=int(float(score))), int(post_id)
+            )
+            for post_id, score in zip(members[::2], members[1::2])
+        ]
+
+    def clear(self):
+        """
+        Removes every timeline (every key with the prefix)
+        """
+        cursor = "0"
+        while True:
+            cursor, keys = self._execute(
+                ["SCAN", cursor, "MATCH", self.prefix + "*", "COUNT", 1000]
+            )[0]
+            if keys:
+                self._execute(["DEL", *keys])
+            if cursor == "0":
+                return
+
+    def _key(self, user_id):
+        return f"{self.prefix}{user_id}"
+
+    def _trim(self, key):
+        # keeps BUILT (rank 0) and the newest max_entries entries
+        return ["ZREMRANGEBYRANK", key, 1, -(self.max_entries + 1)]
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = socket.create_connection(self.address, timeout=5)
+            self._local.connection = connection
+            self._local.reader = connection.makefile("rb")
+            if self.database:
+                self._execute(["SELECT", self.database])
+        return connection
+
+    def _execute(self, *commands):
+        """
+        Sends the commands in a single write (pipeline) and returns their replies
+        """
+        connection = self._connection()
+        try:
+            connection.sendall(b"".join(_encode(command) for command in commands))
+            return [_read_reply(self._local.reader) for _ in commands]
+        except (OSError, TimelineStoreError):
+            # the replies that were not read would be taken by the next command
+            self._local.reader.close()
+            connection.close()
+            self._local.connection = None
+            raise
+
+
+def _score(created_at):
+    return (created_at - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def _encode(command):
+    encoded = [b"*%d\r\n" % len(command)]
+    for argument in command:
+        data = str(argument).encode()
+        encoded.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(encoded)
+
+
+def _read_reply(reader):
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise TimelineStoreError("The timeline store closed the connection.")
+    kind, value = line[:1], line[1:-2]
+    if kind == b"+":
+        return value.decode()
+    if kind == b"-":
+        raise TimelineStoreError(value.decode())
+    if kind == b":":
+        return int(value)
+    if kind == b"$":
+        if int(value) < 0:
+            return None
+        return reader.read(int(value) + 2)[:-2].decode()
+    if kind == b"*":
+        if int(value) < 0:
+            return None
+        return [_read_reply(reader) for _ in range(int(value))]
+    raise TimelineStoreError(f"Unexpected reply from the timeline store: {line!r}")
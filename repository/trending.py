@@ -0,0 +1,441 @@
+"""
+Counters of the trending topics kept in the memory of the process.
+
+The uses of every hashtag are counted in time buckets (of an hour) that
+cover the last max_days days, and for every window (of days) that was
+asked for there is a Ranking of the totals of its buckets, kept up to date
+as the hashtags are used and as the buckets leave the window. A page of
+the trending topics is a slice of the ranking (O(k)).
+
+Besides the count, a window ranks by a time-decayed score: every use
+weighs half every half_life_hours. It uses forward decay: a use in bucket b
+adds 2 ** ((b - origin) / half_life) to the score, so the scores never have
+to be updated as time passes (they all decay at the same rate, and the
+order doesn't change), and it's divided by the weight of the current bucket
+when it's read. The origin is moved forward before the weights get too big.
+
+The window is made of whole buckets: "the last days days" are the current
+hour and the days * 24 - 1 before it, so the uses of the oldest (less than
+an) hour of the last days days are left out.
+
+ApproximateTrendingCounters keep the same windows in a fixed amount of
+memory, whatever the number of hashtags (the long tail of hashtags used a
+few times): every bucket has a count-min sketch of its uses and the
+heavy_hitters hashtags most used in it (see repository/sketches.py), and
+every window the sum of the sketches of its buckets. The candidates of a
+window are the hashtags kept by any of its buckets, in Rankings by the
+counts estimated by its sketch (estimated again when a candidate is used,
+and all of them when a bucket leaves the window). With N uses in the window:
+
+- every hashtag with more than N / heavy_hitters uses is a candidate (it
+  has more than the share of some bucket)
+- the estimated uses are never lower than the real ones, and are higher by
+  at most e / width * N with probability 1 - e ** -depth (the same holds
+  for the decayed score, with N the decayed total)
+
+Those bounds are for uses that are added; when they are taken back (a post
+deleted) the sketches stay exact but a hashtag can lose its place among
+the heavy hitters. The counters of several workers or nodes, built with the
+same width, depth and heavy_hitters, can be merged.
+"""
+import bisect
+import datetime
+import functools
+import math
+import threading
+from collections import Counter
+
+from repository.cache import RebuiltValue
+from repository.sketches import CountMinSketch, SpaceSaving, sketch_positions
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+class Ranking:
+    """
+    Scores of keys, sorted from the highest score to the lowest one (then by
+    key) so that a page of the top is a slice. Keys without score are dropped.
+    """
+
+    def __init__(self, scores=None):
+        self.scores = {key: score for key, score in (scores or {}).items() if score > 0}
+        self._sorted = sorted((-score, key) for key, score in self.scores.items())
+
+    def add(self, key, amount):
+        """
+        Adds amount (that can be negative) to the score of the key
+        """
+        self.set(key, self.scores.get(key, 0) + amount)
+
+    def set(self, key, score):
+        """
+        Replaces the score of the key, drops it if the score is not positive
+        """
+        old = self.scores.pop(key, None)
+        if old is not None:
+            del self._sorted[bisect.bisect_left(self._sorted, (-old, key))]
+        if score > 0:
+            self.scores[key] = score
+            bisect.insort(self._sorted, (-score, key))
+
+    def page(self, offset, amount):
+        """
+        Returns the (key, score) of the amount keys with the highest score
+        after skipping offset
+        """
+        return [(key, -score) for score, key in self._sorted[offset : offset + amount]]
+
+    def __len__(self):
+        return len(self.scores)
+
+
+# pylint: disable=R0902
+class TrendingCounters:
+    """
+    Thread safe counts of uses of hashtags in hourly buckets, with a ranking
+    by count and one by decayed score for every window that was read
+    """
+
+    def __init__(self, max_days, half_life_hours, bucket_seconds=3600, now=None):
+        self.max_days = max_days
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_days * 86400 // bucket_seconds
+        self.half_life_buckets = half_life_hours * 3600 / bucket_seconds
+        # bucket number -> Counter (hashtag -> uses)
+        self._buckets = {}
+        # days -> (Ranking by count, Ranking by decayed score)
+        self._windows = {}
+        self._current = self._bucket_of(now or datetime.datetime.utcnow())
+        self._origin = self._current - self.max_buckets
+        self._lock = threading.Lock()
+
+    def _bucket_of(self, moment):
+        return int((moment - EPOCH).total_seconds() // self.bucket_seconds)
+
+    def _weight(self, bucket):
+        return 2 ** ((bucket - self._origin) / self.half_life_buckets)
+
+    def _window_buckets(self, days):
+        return days * 86400 // self.bucket_seconds
+
+    def add(self, hashtag, moment, amount=1, now=None):
+        """
+        Adds amount (negative to take them back) uses of the hashtag made at
+        the moment (a naive UTC datetime). Uses older than max_days are ignored.
+        """
+        with self._lock:
+            self._advance(now)
+            bucket = min(self._bucket_of(moment), self._current)
+            if bucket <= self._current - self.max_buckets:
+                return
+            self._add(hashtag, bucket, amount)
+
+    def _add(self, hashtag, bucket, amount):
+        counter = self._buckets.setdefault(bucket, Counter())
+        counter[hashtag] += amount
+        if counter[hashtag] <= 0:
+            del counter[hashtag]
+        for days, (counts, decayed) in self._windows.items():
+            if bucket > self._current - self._window_buckets(days):
+                self._add_to_window(counts, decayed, hashtag, amount, bucket)
+
+    def _add_to_window(self, counts, decayed, hashtag, amount, bucket):
+        counts.add(hashtag, amount)
+        if hashtag in counts.scores:
+            decayed.add(hashtag, amount * self._weight(bucket))
+        else:
+            # the count is exact, the decayed score could keep a rounding error
+            decayed.set(hashtag, 0)
+
+    def _advance(self, now):
+        """
+        Moves the current bucket to now: the buckets that leave a window are
+        taken out of it, and the ones older than max_days dropped
+        """
+        bucket = self._bucket_of(now or datetime.datetime.utcnow())
+        if bucket <= self._current:
+            return
+        for days, window in self._windows.items():
+            size = self._window_buckets(days)
+            # (current - size, current] -> (bucket - size, bucket]
+            for leaving in range(
+                self._current - size + 1, min(bucket - size, self._current) + 1
+            ):
+                if leaving in self._buckets:
+                    self._take_out(window, leaving)
+        self._current = bucket
+        for old in [old for old in self._buckets if old <= bucket - self.max_buckets]:
+            self._drop(old)
+        if self._current - self._origin > 2 * self.max_buckets:
+            self._origin = self._current - self.max_buckets
+            for days in self._windows:
+                self._windows[days] = self._build_window(days)
+
+    def _take_out(self, window, bucket):
+        counts, decayed = window
+        for hashtag, uses in self._buckets[bucket].items():
+            self._add_to_window(counts, decayed, hashtag, -uses, bucket)
+
+    def _drop(self, bucket):
+        del self._buckets[bucket]
+
+    def _build_window(self, days):
+        counts, decayed = Counter(), Counter()
+        for bucket in range(
+            self._current - self._window_buckets(days) + 1, self._current + 1
+        ):
+            weight = self._weight(bucket)
+            for hashtag, uses in self._buckets.get(bucket, {}).items():
+                counts[hashtag] += uses
+                decayed[hashtag] += uses * weight
+        return Ranking(counts), Ranking(decayed)
+
+    def top(self, days, offset, amount, decayed=False, now=None):
+        """
+        Returns the (hashtag, uses, score) of the hashtags most used in the
+        last days days (at most max_days), by uses or by decayed score (score
+        is None when it's by uses)
+        """
+        with self._lock:
+            self._advance(now)
+            if days not in self._windows:
+                self._windows[days] = self._build_window(days)
+            return self._top(self._windows[days], offset, amount, decayed)
+
+    def _top(self, window, offset, amount, decayed):
+        counts, scores = window
+        if not decayed:
+            return [
+                (hashtag, uses, None) for hashtag, uses in counts.page(offset, amount)
+            ]
+        now_weight = self._weight(self._current)
+        return [
+            (hashtag, counts.scores[hashtag], score / now_weight)
+            for hashtag, score in scores.page(offset, amount)
+        ]
+
+
+class SketchWindow:
+    """
+    The state of a window of ApproximateTrendingCounters: the sum of the
+    sketches of its buckets (of uses, and weighted for the decayed score),
+    its candidates (hashtag -> how many of its buckets keep it) and their
+    Rankings by estimated uses and decayed score
+    """
+
+    def __init__(self, width, depth):
+        self.uses = CountMinSketch(width, depth)
+        self.scores = CountMinSketch(width, depth, "d")
+        self.candidates = Counter()
+        self.counts = Ranking()
+        self.decayed = Ranking()
+        self.stale = False
+
+    def estimate(self, hashtag, positions):
+        """
+        Ranks the hashtag (a candidate, or not anymore) by its estimations
+        """
+        if hashtag in self.candidates:
+            self.counts.set(hashtag, self.uses.estimate(positions))
+            self.decayed.set(hashtag, self.scores.estimate(positions))
+        else:
+            self.counts.set(hashtag, 0)
+            self.decayed.set(hashtag, 0)
+
+    def discount(self, hashtag):
+        """
+        Takes out one of the buckets that keep the hashtag
+        """
+        self.candidates[hashtag] -= 1
+        if not self.candidates[hashtag]:
+            del self.candidates[hashtag]
+
+
+class ApproximateTrendingCounters(TrendingCounters):
+    """
+    TrendingCounters that take a fixed amount of memory: a sketch of
+    width x depth counters and the heavy_hitters most used hashtags per
+    bucket (and a sketch per window), the uses they return are estimations
+    """
+
+    # pylint: disable=R0913
+    def __init__(
+        self,
+        max_days,
+        half_life_hours,
+        width,
+        depth,
+        heavy_hitters,
+        bucket_seconds=3600,
+        now=None,
+    ):
+        super().__init__(max_days, half_life_hours, bucket_seconds, now)
+        self.width = width
+        self.depth = depth
+        self.heavy_hitters = heavy_hitters
+        # hashtag kept by some bucket -> [how many keep it, its positions]
+        self._kept = {}
+
+    def _positions(self, hashtag):
+        if hashtag in self._kept:
+            return self._kept[hashtag][1]
+        return sketch_positions(hashtag, self.width, self.depth)
+
+    def _keep(self, hashtag, positions):
+        self._kept.setdefault(hashtag, [0, positions])[0] += 1
+
+    def _release(self, hashtag):
+        self._kept[hashtag][0] -= 1
+        if not self._kept[hashtag][0]:
+            del self._kept[hashtag]
+
+    def _new_bucket(self):
+        return CountMinSketch(self.width, self.depth, "i"), SpaceSaving(
+            self.heavy_hitters
+        )
+
+    def _add(self, hashtag, bucket, amount):
+        positions = self._positions(hashtag)
+        sketch, heavy = self._buckets.setdefault(bucket, self._new_bucket())
+        sketch.add(positions, amount)
+        added, removed = heavy.add(hashtag, amount)
+        for days, window in self._windows.items():
+            if bucket > self._current - self._window_buckets(days):
+                window.uses.add(positions, amount)
+                window.scores.add(positions, amount * self._weight(bucket))
+                if added:
+                    window.candidates[hashtag] += 1
+                if removed is not None:
+                    window.discount(removed)
+                    window.estimate(removed, self._kept[removed][1])
+                if removed != hashtag:
+                    window.estimate(hashtag, positions)
+        if added:
+            self._keep(hashtag, positions)
+        if removed is not None:
+            self._release(removed)
+
+    def _take_out(self, window, bucket):
+        sketch, heavy = self._buckets[bucket]
+        window.uses.merge(sketch, -1)
+        window.scores.merge(sketch, -self._weight(bucket))
+        for hashtag in heavy.counts:
+            window.discount(hashtag)
+        window.stale = True
+
+    def _drop(self, bucket):
+        for hashtag in self._buckets.pop(bucket)[1].counts:
+            self._release(hashtag)
+
+    def _build_window(self, days):
+        window = SketchWindow(self.width, self.depth)
+        for bucket in range(
+            self._current - self._window_buckets(days) + 1, self._current + 1
+        ):
+            if bucket in self._buckets:
+                sketch, heavy = self._buckets[bucket]
+                window.uses.merge(sketch)
+                window.scores.merge(sketch, self._weight(bucket))
+                window.candidates.update(heavy.counts.keys())
+        window.stale = True
+        return window
+
+    def _top(self, window, offset, amount, decayed):
+        if window.stale:
+            uses, scores = {}, {}
+            for hashtag in window.candidates:
+                positions = self._kept[hashtag][1]
+                uses[hashtag] = window.uses.estimate(positions)
+                scores[hashtag] = window.scores.estimate(positions)
+            window.counts, window.decayed = Ranking(uses), Ranking(scores)
+            window.stale = False
+        return super()._top((window.counts, window.decayed), offset, amount, decayed)
+
+    def merge(self, other):
+        """
+        Adds the uses counted by other (ApproximateTrendingCounters of the
+        same width, depth, heavy_hitters and buckets, e.g. of another worker)
+        """
+        # pylint: disable=W0212
+        if (other.width, other.depth, other.heavy_hitters, other.bucket_seconds) != (
+            self.width,
+            self.depth,
+            self.heavy_hitters,
+            self.bucket_seconds,
+        ):
+            raise ValueError("Only counters of the same size can be merged")
+        with self._lock, other._lock:
+            latest = max(self._current, other._current)
+            self._advance(
+                EPOCH + datetime.timedelta(seconds=latest * self.bucket_seconds)
+            )
+            for bucket, (sketch, heavy) in other._buckets.items():
+                if bucket <= self._current - self.max_buckets:
+                    continue
+                own_sketch, own_heavy = self._buckets.get(bucket, self._new_bucket())
+                own_sketch.merge(sketch)
+                self._buckets[bucket] = own_sketch, own_heavy.merge(heavy)
+            self._kept = {}
+            for _, heavy in self._buckets.values():
+                for hashtag in heavy.counts:
+                    self._keep(hashtag, self._positions(hashtag))
+            for days in self._windows:
+                self._windows[days] = self._build_window(days)
+
+
+class LocationCounters:
+    """
+    TrendingCounters of every location: the ones of the hot locations (the
+    most used) are built with it and kept, the ones of the rest are built
+    the first time they are read and kept in cache (an LRUCache, so only the
+    ones read the most recently, for a while).
+
+    The ones of the rest are kept as RebuiltValue (build(location) returns
+    them and what they were built from, seen as in RebuiltValue), so the
+    uses added while they are built are not lost.
+    """
+
+    def __init__(self, hot, build, cache, seen):
+        self.hot = hot
+        self.build = build
+        self.cache = cache
+        self.seen = seen
+        self._lock = threading.Lock()
+
+    def get(self, location):
+        """
+        Returns the counters of the location, building them if needed
+        """
+        if location in self.hot:
+            return self.hot[location]
+        with self._lock:
+            counters = self.cache.get(location)
+            if counters is None:
+                counters = RebuiltValue(
+                    functools.partial(self.build, location), math.inf, self.seen
+                )
+                self.cache.set(location, counters)
+        return counters.get()
+
+    def current(self, location):
+        """
+        Returns the counters of the location, or None if they are not built
+        """
+        if location in self.hot:
+            return self.hot[location]
+        counters = self.cache.get(location)
+        return None if counters is None else counters.current()
+
+    # pylint: disable=R0913
+    def add(self, location, hashtag, moment, amount, key):
+        """
+        Adds amount uses of the hashtag (as TrendingCounters.add) to the
+        counters of the location, if they are built or being built. key is
+        where they come from (see RebuiltValue.update).
+        """
+        if location in self.hot:
+            self.hot[location].add(hashtag, moment, amount)
+            return
+        counters = self.cache.get(location)
+        if counters is not None:
+            counters.update(lambda built: built.add(hashtag, moment, amount), key)
@@ -0,0 +1,119 @@
+"""
+A small stand-in of the Expo push API (POST /--/api/v2/push/send), that
+answers a ticket per message (a request has a list of them or a single
+one), so that the push sender can be tested (or benchmarked) without
+sending notifications. The tokens that contain "unregistered" get a
+DeviceNotRegistered error ticket, and it can wait latency seconds before
+answering each request.
+
+    python tests/expo_stand_in.py --port 8787 --latency 0.05
+"""
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# pylint: disable=C0116, R0902
+
+
+class ExpoStandIn(ThreadingHTTPServer):
+    """
+    Server that keeps what it was sent: the batches of messages, the
+    connections that were opened, and the most requests at the same time
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("localhost", 0), latency=0.0, max_batch_size=100):
+        super().__init__(address, _Handler)
+        self.latency = latency
+        self.max_batch_size = max_batch_size
+        self.batches = []
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self._ticket_ids = itertools.count(1)
+
+    def start(self):
+        """
+        Serves in a background thread, returns the url to send the pushes to
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        host, port = self.server_address
+        return f"http://{host}:{port}/--/api/v2/push/send"
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def tickets(self, messages):
+        """
+        Returns the ticket of each message (or the body of a 400 if there
+        are more than max_batch_size)
+        """
+        with self.lock:
+            self.batches.append(messages)
+            if len(messages) > self.max_batch_size:
+                return None
+            return [self._ticket(message) for message in messages]
+
+    def _ticket(self, message):
+        if "unregistered" in message["to"]:
+            return {
+                "status": "error",
+                "message": f"{message['to']} is not a registered push token",
+                "details": {"error": "DeviceNotRegistered"},
+            }
+        return {"status": "ok", "id": f"ticket-{next(self._ticket_ids)}"}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):  # pylint: disable=C0103
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(
+                self.server.max_in_flight, self.server.in_flight
+            )
+        try:
+            messages = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(self.server.latency)
+            # a single message gets a single ticket
+            single = isinstance(messages, dict)
+            tickets = self.server.tickets([messages] if single else messages)
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+        if tickets is None:
+            self._reply(400, {"errors": [{"code": "PUSH_TOO_MANY_NOTIFICATIONS"}]})
+        else:
+            self._reply(200, {"data": tickets[0] if single else tickets})
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *_):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    ExpoStandIn(("localhost", args.port), args.latency).serve_forever()
@@ -8,6 +8,29 @@ No checks of verifications are made.
 
 # pylint: disable=C0114, W0401, W0614, E0602, E0401
 from repository.queries.common_setup import *
+from repository.queries.queries_counters import (
+    add_to_like_count,
+    add_to_repost_count,
+    add_to_user_counters,
+    add_to_daily_stats,
+)
+from repository.queries.queries_viewer_state import *
+from repository.queries.queries_trending_topic import (
+    add_to_trending,
+    trending_uses_of,
+    trending_counters,
+    location_counters,
+)
+from repository.queries.queries_autocomplete import (
+    add_to_autocomplete,
+    autocomplete_indexes,
+)
+from repository.queries.queries_timeline import (
+    fan_out_post,
+    timeline_store,
+    fan_out_on_read_cache,
+)
+from repository.queries.queries_get import recommended_users_cache
 from repository.tables.users import User, Following, Interests
 from repository.tables.posts import (
     Post,
@@ -17,6 +40,9 @@ from repository.tables.posts import (
     Favorite,
     Like,
     DeviceToken,
+    TrendingSnapshot,
+    RecommendedUserRow,
+    RecommendationFingerprint,
 )
 import datetime
 
@@ -142,8 +168,24 @@ def create_post(
         content_id=new_content.content_id,
     )
     session.add(new_post)
+    session.flush()
+    add_to_user_counters(user_id, posts=1)
+    add_to_daily_stats(user_id, new_post.created_at.date(), posts=1)
+    transaction_id = current_transaction_id()
 
     session.commit()
+    fan_out_post(new_post)
+    add_to_trending(trending_uses_of(new_content.content_id), transaction_id)
+    add_to_autocomplete(
+        transaction_id,
+        hashtags=hashtags,
+        usernames=[
+            username
+            for (username,) in session.query(User.username).filter(
+                User.id.in_(mentions)
+            )
+        ],
+    )
 
     return [new_post, new_content.content_id]
 
@@ -163,8 +205,17 @@ def create_repost(user_poster_id, user_creator_id, content_id):
         content_id=content_id,
     )
     session.add(new_post)
+    session.flush()
+    add_to_repost_count(content_id, 1)
+    add_to_user_counters(user_poster_id, reposts=1)
+    add_to_daily_stats(user_poster_id, new_post.created_at.date(), reposts_made=1)
+    add_to_daily_stats(user_creator_id, new_post.created_at.date(), reposts_received=1)
+    transaction_id = current_transaction_id()
 
     session.commit()
+    update_viewer_state(user_poster_id, content_id, REPOSTED, True)
+    fan_out_post(new_post)
+    add_to_trending(trending_uses_of(content_id, user_poster_id), transaction_id)
 
     return new_post
 
@@ -201,6 +252,7 @@ def create_favorite(user_id, content_id):
 
     session.add(new_favorite)
     session.commit()
+    update_viewer_state(user_id, content_id, FAVORITED, True)
 
     return new_favorite
 
@@ -212,7 +264,19 @@ def create_like(user_id, content_id):
     )
 
     session.add(new_like)
+    session.flush()
+    add_to_like_count(content_id, 1)
+    creator_id = (
+        session.query(Post.user_creator_id)
+        .filter(Post.content_id == content_id)
+        .limit(1)
+        .scalar()
+    )
+    if creator_id is not None:
+        add_to_user_counters(creator_id, likes_received=1)
+        add_to_daily_stats(creator_id, new_like.created_at.date(), likes_received=1)
     session.commit()
+    update_viewer_state(user_id, content_id, LIKED, True)
 
     return new_like
 
@@ -312,6 +376,17 @@ def delete_all_mentions():
         session.commit()
 
 
+def delete_all_trending_snapshots():
+    session.query(TrendingSnapshot).delete()
+    session.commit()
+
+
+def delete_all_recommended_users():
+    session.query(RecommendedUserRow).delete()
+    session.query(RecommendationFingerprint).delete()
+    session.commit()
+
+
 def delete_all():
     delete_all_favorites()
     delete_all_likes()
@@ -322,4 +397,13 @@ def delete_all():
     delete_all_follows()
     delete_all_device_tokens()
     delete_all_interests()
+    delete_all_recommended_users()
     delete_all_users()
+    delete_all_trending_snapshots()
+    viewer_state_cache.clear()
+    timeline_store.clear()
+    fan_out_on_read_cache.clear()
+    recommended_users_cache.clear()
+    autocomplete_indexes.clear()
+    trending_counters.clear()
+    location_counters.clear()
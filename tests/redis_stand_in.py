@@ -0,0 +1,207 @@
+"""
+A small stand-in of a Redis server, that speaks its protocol and knows only
+the commands the RedisTimelineStore sends (as Redis 2.8 does, e.g. EXPIRE
+without options), so that it can be tested (or run locally) without a Redis.
+
+    python tests/redis_stand_in.py --port 6379
+"""
+import argparse
+import fnmatch
+import socketserver
+import threading
+import time
+
+# pylint: disable=C0116
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    """
+    Server with the sorted sets in memory (only the database 0)
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=("localhost", 0)):
+        super().__init__(address, _Handler)
+        self.sorted_sets = {}
+        self.expires_at = {}
+        self.lock = threading.Lock()
+
+    def start(self):
+        """
+        Serves in a background thread, returns the url to connect to it
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        host, port = self.server_address
+        return f"redis://{host}:{port}/0"
+
+    def run(self, command):
+        """
+        Runs a command (list of str) and returns its reply
+        """
+        name, arguments = command[0].upper(), command[1:]
+        with self.lock:
+            self._drop_expired()
+            return getattr(self, "command_" + name.lower())(*arguments)
+
+    def _drop_expired(self):
+        now = time.monotonic()
+        for key, expires_at in list(self.expires_at.items()):
+            if expires_at <= now:
+                self.sorted_sets.pop(key, None)
+                del self.expires_at[key]
+
+    def _sorted(self, key):
+        members = self.sorted_sets.get(key, {})
+        return sorted(members.items(), key=lambda member: (member[1], member[0]))
+
+    def command_ping(self):
+        return "PONG"
+
+    def command_select(self, _):
+        return "OK"
+
+    def command_del(self, *keys):
+        deleted = 0
+        for key in keys:
+            deleted += self.sorted_sets.pop(key, None) is not None
+            self.expires_at.pop(key, None)
+        return deleted
+
+    def command_expire(self, key, seconds):
+        if key not in self.sorted_sets:
+            return 0
+        self.expires_at[key] = time.monotonic() + int(seconds)
+        return 1
+
+    def command_ttl(self, key):
+        if key not in self.sorted_sets:
+            return -2
+        if key not in self.expires_at:
+            return -1
+        return round(self.expires_at[key] - time.monotonic())
+
+    def command_zadd(self, key, *scores_and_members):
+        members = self.sorted_sets.setdefault(key, {})
+        added = 0
+        for score, member in zip(scores_and_members[::2], scores_and_members[1::2]):
+            added += member not in members
+            members[member] = float(score)
+        return added
+
+    def command_zrem(self, key, *members):
+        stored = self.sorted_sets.get(key, {})
+        removed = sum(stored.pop(member, None) is not None for member in members)
+        if key in self.sorted_sets and not stored:
+            self.command_del(key)
+        return removed
+
+    def command_zscore(self, key, member):
+        score = self.sorted_sets.get(key, {}).get(member)
+        return None if score is None else format(score, ".17g")
+
+    def command_zremrangebyrank(self, key, start, stop):
+        ranked = self._sorted(key)
+        start, stop = int(start), int(stop)
+        start = start + len(ranked) if start < 0 else start
+        stop = stop + len(ranked) if stop < 0 else stop
+        to_remove = [member for member, _ in ranked[max(start, 0) : stop + 1]]
+        return self.command_zrem(key, *to_remove) if to_remove else 0
+
+    def command_zrevrangebyscore(self, key, maximum, minimum, *options):
+        def accepts(score, bound, is_maximum):
+            exclusive = bound.startswith("(")
+            value = float(bound.lstrip("("))
+            if is_maximum:
+                return score < value if exclusive else score <= value
+            return score > value if exclusive else score >= value
+
+        members = [
+            (member, score)
+            for member, score in reversed(self._sorted(key))
+            if accepts(score, maximum, True) and accepts(score, minimum, False)
+        ]
+        options = [option.upper() for option in options]
+        if "LIMIT" in options:
+            offset = int(options[options.index("LIMIT") + 1])
+            count = int(options[options.index("LIMIT") + 2])
+            members = members[offset : offset + count]
+        reply = []
+        for member, score in members:
+            reply += (
+                [member, format(score, ".17g")] if "WITHSCORES" in options else [member]
+            )
+        return reply
+
+    def command_scan(self, _, *options):
+        pattern = "*"
+        if "MATCH" in [option.upper() for option in options]:
+            pattern = options[[option.upper() for option in options].index("MATCH") + 1]
+        return ["0", [key for key in self.sorted_sets if fnmatch.fnmatch(key, pattern)]]
+
+    def command_flushdb(self):
+        self.sorted_sets.clear()
+        self.expires_at.clear()
+        return "OK"
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        queued = None
+        while True:
+            command = _read_command(self.rfile)
+            if command is None:
+                return
+            name = command[0].upper()
+            if name == "MULTI":
+                queued = []
+                self.wfile.write(_encode("OK"))
+            elif name == "EXEC":
+                replies = [self._run(queued_command) for queued_command in queued or []]
+                queued = None
+                self.wfile.write(_encode(replies))
+            elif queued is not None:
+                queued.append(command)
+                self.wfile.write(_encode("QUEUED"))
+            else:
+                self.wfile.write(_encode(self._run(command)))
+
+    def _run(self, command):
+        try:
+            return self.server.run(command)
+        except (AttributeError, TypeError, ValueError) as error:
+            return RuntimeError(f"ERR {command[0]}: {error}")
+
+
+def _read_command(reader):
+    line = reader.readline()
+    if not line:
+        return None
+    command = []
+    for _ in range(int(line[1:-2])):
+        length = int(reader.readline()[1:-2])
+        command.append(reader.read(length + 2)[:-2].decode())
+    return command
+
+
+def _encode(reply):
+    if isinstance(reply, RuntimeError):
+        return b"-%s\r\n" % str(reply).encode()
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b"".join(_encode(item) for item in reply)
+    if reply in ("OK", "QUEUED", "PONG"):
+        return b"+%s\r\n" % reply.encode()
+    data = reply.encode()
+    return b"$%d\r\n%s\r\n" % (len(data), data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    RedisStandIn(("localhost", args.port)).serve_forever()
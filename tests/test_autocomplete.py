@@ -0,0 +1,102 @@
+"""
+This module tests the function api_autocomplete from the
+controller_autocomplete.py file
+"""
+import json
+import pytest
+from fastapi import HTTPException
+
+# pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
+from control.controller_autocomplete import *
+from control.common_setup import *
+from tests.mock_functions import *
+from repository.tables.posts import *
+from repository.errors import *
+from repository.queries import queries_posts
+
+
+def autocomplete(user, text, amount=AMOUNT_DEFAULT):
+    completions = api_autocomplete(
+        text=text, amount=amount, user=json.loads(generate_user_from_db(user).json())
+    )
+    return [(completion.completion, completion.uses) for completion in completions]
+
+
+def test_autocomplete_hashtags_the_most_used_first():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    create_post(user_1.id, hashtags=["#Futbol", "#futsal"])
+    create_post(user_1.id, hashtags=["#futbol"])
+    create_post(user_1.id, hashtags=["futbol", "#musica"])
+
+    try:
+        assert autocomplete(user_1, "#FU") == [("#futbol", 3), ("#futsal", 1)]
+        assert autocomplete(user_1, "#fu", amount=1) == [("#futbol", 3)]
+        assert autocomplete(user_1, "#rock") == []
+    finally:
+        delete_all()
+
+
+def test_autocomplete_usernames_the_most_mentioned_first():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_post(user_1.id, mentions=[user_2.id])
+
+    try:
+        assert autocomplete(user_1, "@User") == [(USERNAME_2, 1), (USERNAME_1, 0)]
+    finally:
+        delete_all()
+
+
+def test_autocomplete_adds_the_new_hashtags_and_mentions():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_post(user_1.id, hashtags=["#futbol"])
+
+    try:
+        assert autocomplete(user_1, "#fu") == [("#futbol", 1)]
+        assert autocomplete(user_1, "@user") == [(USERNAME_1, 0), (USERNAME_2, 0)]
+
+        create_post(user_1.id, hashtags=["#futsal"], mentions=[user_2.id])
+        create_post(user_1.id, hashtags=["#futsal"])
+
+        assert autocomplete(user_1, "#fu") == [("#futsal", 2), ("#futbol", 1)]
+        assert autocomplete(user_1, "@user") == [(USERNAME_2, 1), (USERNAME_1, 0)]
+    finally:
+        delete_all()
+
+
+def test_autocomplete_counts_the_hashtags_and_mentions_of_an_edited_post_once():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    post, _ = create_post(user_1.id, hashtags=["#futbol"], mentions=[user_2.id])
+
+    try:
+        assert autocomplete(user_1, "#fu") == [("#futbol", 1)]
+
+        for _ in range(2):
+            queries_posts.update_post(
+                post.post_id, user_1.id, TEXT, IMAGE, ["#futbol"], [USERNAME_2]
+            )
+        assert autocomplete(user_1, "#fu") == [("#futbol", 1)]
+        assert autocomplete(user_1, "@user") == [(USERNAME_2, 1), (USERNAME_1, 0)]
+
+        queries_posts.update_post(post.post_id, user_1.id, TEXT, IMAGE, ["#futsal"], [])
+        assert autocomplete(user_1, "#fu") == [("#futsal", 1), ("#futbol", 0)]
+        assert autocomplete(user_1, "@user") == [(USERNAME_1, 0), (USERNAME_2, 0)]
+
+        queries_posts.delete_post(post.post_id, user_1.id)
+        assert autocomplete(user_1, "#fu") == [("#futbol", 0), ("#futsal", 0)]
+    finally:
+        delete_all()
+
+
+def test_autocomplete_needs_a_hashtag_or_a_username():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+
+    try:
+        for text in ["futbol", "#", "@"]:
+            with pytest.raises(HTTPException) as error:
+                autocomplete(user_1, text)
+            assert error.value.status_code == 400
+    finally:
+        delete_all()
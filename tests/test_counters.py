@@ -0,0 +1,251 @@
+# pylint: disable=R0801
+"""
+This module tests the like and repost counters of the contents, the
+profile counters of the users and the job that reconciles them
+"""
+import json
+import pytest
+from sqlalchemy import update
+
+# pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
+from control.controller_like import api_create_like, api_delete_like
+from control.controller_repost import api_create_repost, api_delete_respost_from_post
+from control.controller_post import (
+    api_create_post,
+    api_delete_post,
+    api_get_amount_posts_from_user_visited,
+    api_get_profile_counters_from_user_visited,
+)
+from control.common_setup import *
+from tests.mock_functions import *
+from repository.tables.posts import *
+from repository.queries import queries_posts
+from repository.jobs.reconcile_counters import (
+    reconcile_counters,
+    reconcile_user_counters,
+)
+
+
+def get_counters(content_id):
+    session.expire_all()
+    content = session.query(Content).filter(Content.content_id == content_id).one()
+    return content.like_count, content.repost_count
+
+
+def test_likes_update_the_like_count():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    post_1, content_id = create_post(user_1.id)
+    user_2_json = json.loads(generate_user_from_db(user_2).json())
+
+    try:
+        api_create_like(post_id=post_1.post_id, user=user_2_json)
+        assert get_counters(content_id) == (1, 0)
+
+        api_delete_like(post_id=post_1.post_id, user=user_2_json)
+        assert get_counters(content_id) == (0, 0)
+    finally:
+        delete_all()
+
+
+def test_reposts_update_the_repost_count():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    post_1, content_id = create_post(user_1.id)
+    user_2_json = json.loads(generate_user_from_db(user_2).json())
+
+    try:
+        api_create_repost(post_id=post_1.post_id, user=user_2_json)
+        assert get_counters(content_id) == (0, 1)
+
+        api_delete_respost_from_post(post_id=post_1.post_id, user=user_2_json)
+        assert get_counters(content_id) == (0, 0)
+    finally:
+        delete_all()
+
+
+def test_reconcile_counters_fixes_the_drifted_ones():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    _, content_id_1 = create_post(user_1.id)
+    _, content_id_2 = create_post(user_1.id)
+    create_like(user_2.id, content_id_1)
+    create_repost(user_2.id, user_1.id, content_id_1)
+
+    try:
+        session.execute(
+            update(Content)
+            .where(Content.content_id == content_id_1)
+            .values(like_count=42, repost_count=7)
+        )
+        session.commit()
+
+        assert reconcile_counters(batch_size=1) == 1
+        assert get_counters(content_id_1) == (1, 1)
+        assert get_counters(content_id_2) == (0, 0)
+        assert reconcile_counters() == 0
+    finally:
+        delete_all()
+
+
+def get_profile_counters(user, visitor):
+    session.expire_all()
+    return api_get_profile_counters_from_user_visited(
+        user_visited_email=user.email,
+        user=json.loads(generate_user_from_db(visitor).json()),
+    )
+
+
+def test_posts_reposts_and_likes_update_the_profile_counters():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    user_1_json = json.loads(generate_user_from_db(user_1).json())
+    user_2_json = json.loads(generate_user_from_db(user_2).json())
+
+    try:
+        post_id = api_create_post(
+            PostCreateRequest(content=TEXT, image=IMAGE, hashtags=[], mentions=[]),
+            user=user_1_json,
+        )["post_id"]
+        api_create_like(post_id=post_id, user=user_2_json)
+        api_create_repost(post_id=post_id, user=user_2_json)
+
+        assert get_profile_counters(user_1, user_2) == {
+            "posts_count": 1,
+            "reposts_count": 0,
+            "likes_received": 1,
+        }
+        assert get_profile_counters(user_2, user_1)["reposts_count"] == 1
+        assert (
+            api_get_amount_posts_from_user_visited(
+                user_visited_email=user_1.email, user=user_2_json
+            )
+            == 1
+        )
+
+        api_delete_post(post_id=post_id, user=user_1_json)
+
+        assert get_profile_counters(user_1, user_2) == {
+            "posts_count": 0,
+            "reposts_count": 0,
+            "likes_received": 0,
+        }
+        assert get_profile_counters(user_2, user_1)["reposts_count"] == 0
+    finally:
+        delete_all()
+
+
+def test_profile_counters_of_a_private_user_that_i_dont_follow_are_0():
+    user_1 = create_user(USERNAME_1, EMAIL_1, False)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_post(user_1.id)
+
+    try:
+        assert get_profile_counters(user_1, user_2)["posts_count"] == 0
+        assert get_profile_counters(user_1, user_1)["posts_count"] == 1
+
+        create_follow(user_2.id, user_1.id)
+        assert get_profile_counters(user_1, user_2)["posts_count"] == 1
+    finally:
+        delete_all()
+
+
+def test_reconcile_user_counters_fixes_the_drifted_ones():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    _, content_id = create_post(user_1.id)
+    create_like(user_2.id, content_id)
+    create_repost(user_2.id, user_1.id, content_id)
+
+    try:
+        session.execute(update(UserCounters).values(posts_count=9, likes_received=0))
+        session.commit()
+
+        assert reconcile_user_counters(batch_size=1) == 2
+        assert get_profile_counters(user_1, user_1) == {
+            "posts_count": 1,
+            "reposts_count": 0,
+            "likes_received": 1,
+        }
+        assert get_profile_counters(user_2, user_2)["posts_count"] == 0
+        assert reconcile_user_counters() == 0
+    finally:
+        delete_all()
+
+
+def fail_on_the_daily_stats(*_, **__):
+    raise RuntimeError("the daily stats could not be updated")
+
+
+def get_user_counters_and_daily_stats():
+    session.expire_all()
+    return (
+        session.query(
+            UserCounters.user_id,
+            UserCounters.posts_count,
+            UserCounters.reposts_count,
+            UserCounters.likes_received,
+        ).all(),
+        session.query(
+            UserDailyStats.user_id,
+            UserDailyStats.day,
+            UserDailyStats.posts,
+            UserDailyStats.reposts_made,
+            UserDailyStats.reposts_received,
+            UserDailyStats.likes_received,
+        ).all(),
+    )
+
+
+def test_a_post_that_fails_partway_is_not_kept(monkeypatch):
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    create_user(USERNAME_2, EMAIL_2, True)
+
+    try:
+        before = get_user_counters_and_daily_stats()
+        monkeypatch.setattr(
+            queries_posts, "add_to_daily_stats", fail_on_the_daily_stats
+        )
+        with pytest.raises(RuntimeError):
+            queries_posts.create_post(user_1.id, TEXT, IMAGE, [HASHTAG_1], [USERNAME_2])
+
+        session.expire_all()
+        assert session.query(Post).count() == 0
+        assert session.query(Content).count() == 0
+        assert session.query(Hashtag).count() == 0
+        assert session.query(Mention).count() == 0
+        assert get_user_counters_and_daily_stats() == before
+    finally:
+        delete_all()
+
+
+def test_a_post_deletion_that_fails_partway_is_not_kept(monkeypatch):
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    user_1_json = json.loads(generate_user_from_db(user_1).json())
+    user_2_json = json.loads(generate_user_from_db(user_2).json())
+
+    try:
+        post_id = api_create_post(
+            PostCreateRequest(
+                content=TEXT, image=IMAGE, hashtags=[HASHTAG_1], mentions=[]
+            ),
+            user=user_1_json,
+        )["post_id"]
+        api_create_like(post_id=post_id, user=user_2_json)
+        api_create_repost(post_id=post_id, user=user_2_json)
+        before = get_user_counters_and_daily_stats()
+
+        monkeypatch.setattr(
+            queries_posts, "add_to_daily_stats", fail_on_the_daily_stats
+        )
+        with pytest.raises(RuntimeError):
+            queries_posts.delete_post(post_id, user_1.id)
+
+        session.expire_all()
+        assert session.query(Post).count() == 2
+        assert session.query(Hashtag).count() == 1
+        assert session.query(Like).count() == 1
+        assert get_user_counters_and_daily_stats() == before
+    finally:
+        delete_all()
@@ -0,0 +1,59 @@
+"""
+This module tests the per request sessions and the pool status
+"""
+# pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
+from control.controller_admin import *
+from repository.queries.common_setup import *
+from tests.mock_functions import *
+
+
+def test_each_request_scope_gets_its_own_session():
+    """
+    Two requests must never share the same session.
+    """
+    outside_session = session()
+
+    with request_session_scope():
+        first_request_session = session()
+        assert first_request_session is session()
+
+    with request_session_scope():
+        second_request_session = session()
+
+    assert first_request_session is not second_request_session
+    assert outside_session is not first_request_session
+    assert outside_session is session()
+
+
+def test_a_failed_request_does_not_poison_the_next_one():
+    """
+    A failure inside a request leaves the session of that request in
+    a pending rollback state, the next request must not notice it.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    try:
+        with request_session_scope():
+            session.add(
+                User(USERNAME_1, SURNAME, NAME, PASSWORD, EMAIL_1, location=LOCATION)
+            )
+            try:
+                session.flush()
+            except Exception:  # pylint: disable=W0718
+                pass
+
+        with request_session_scope():
+            assert session.query(User).filter(User.id == user_1.id).count() == 1
+    finally:
+        delete_all()
+
+
+def test_get_database_pool_status():
+    """
+    The pool status has the saturation and wait time of the primary engine.
+    """
+    session.query(User).count()
+    response = get_database_pool_status()
+
+    assert response["primary"]["size"] == POOL_SIZE
+    assert response["primary"]["checkouts"] >= 1
+    assert 0 <= response["primary"]["saturation"] <= 1
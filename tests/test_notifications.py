@@ -2,16 +2,30 @@
 This module tests the functions from the controller_notifications.py file
 """
 import json
+import pytest
 from fastapi import Header
 
 # pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
 from control.controller_notifications import *
 from control.common_setup import *
+from control import common_setup
+from control.utils.push import ExpoPushSender
 from tests.mock_functions import *
+from tests.expo_stand_in import ExpoStandIn
 from repository.tables.posts import *
 from repository.errors import *
 
 
+@pytest.fixture(name="expo")
+def fixture_expo(monkeypatch):
+    server = ExpoStandIn(latency=0.05)
+    sender = ExpoPushSender(server.start(), concurrency=2)
+    monkeypatch.setattr(common_setup, "push_sender", sender)
+    yield server
+    sender.close()
+    server.stop()
+
+
 def test_save_device_token():
     """
     Tests the function api_save_device_token.
@@ -56,7 +70,7 @@ def test_delete_device_token():
         delete_all()
 
 
-def test_send_notification():
+def test_send_notification(expo):
     """
     Tests the function api_send_notification.
     """
@@ -83,5 +97,69 @@ def test_send_notification():
             _=get_user_from_token_mock(),
         )
         assert response.get("mensaje") == "Notification sent successfully"
+        assert response["tickets"][DEVICE_TOKEN]["status"] == "ok"
+        assert expo.batches[0][0]["to"] == DEVICE_TOKEN
+    finally:
+        delete_all()
+
+
+def test_send_notification_sends_once_to_a_device_token_of_several_users(expo):
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    unregistered = "ExponentPushToken[unregistered]"
+    save_device_token(user_1.id, DEVICE_TOKEN)
+    save_device_token(user_2.id, DEVICE_TOKEN)
+    save_device_token(user_2.id, unregistered)
+    try:
+        response = api_send_notificacion(
+            notificacion_request=NotificationRequest(
+                user_emails_that_receive=[user_1.email, user_2.email],
+                title=TITLE,
+                body=BODY,
+                data=DATA,
+            ),
+            _=json.loads(generate_user_from_db(user_1).json()),
+        )
+        sent = [message["to"] for batch in expo.batches for message in batch]
+        assert sorted(sent) == sorted([DEVICE_TOKEN, unregistered])
+        assert response["tickets"][DEVICE_TOKEN]["status"] == "ok"
+        assert response["tickets"][unregistered]["status"] == "error"
     finally:
         delete_all()
+
+
+def test_push_sender_sends_batches_concurrently_over_kept_alive_connections():
+    server = ExpoStandIn(latency=0.05)
+    sender = ExpoPushSender(server.start(), batch_size=100, concurrency=2)
+    tokens = [f"ExponentPushToken[{number}]" for number in range(450)]
+    tokens[120] = "ExponentPushToken[unregistered]"
+    try:
+        tickets = sender.send([{"to": token, "title": TITLE} for token in tokens])
+        sender.send([{"to": token, "title": TITLE} for token in tokens[:200]])
+
+        assert len(tickets) == 450
+        assert tickets[120]["details"]["error"] == "DeviceNotRegistered"
+        assert all(ticket["status"] == "ok" for ticket in tickets[121:])
+        # the batches arrive in any order, two at a time
+        batches = sorted(
+            server.batches[:5], key=lambda batch: tokens.index(batch[-1]["to"])
+        )
+        assert [len(batch) for batch in batches] == [100] * 4 + [50]
+        assert [message["to"] for message in batches[1]] == tokens[100:200]
+        assert server.max_in_flight == 2
+        assert server.connections <= 2
+    finally:
+        sender.close()
+        server.stop()
+
+
+def test_push_sender_gives_error_tickets_when_a_batch_fails():
+    server = ExpoStandIn(max_batch_size=2)
+    sender = ExpoPushSender(server.start(), batch_size=3)
+    try:
+        tickets = sender.send([{"to": f"token_{number}"} for number in range(4)])
+        assert [ticket["status"] for ticket in tickets] == ["error"] * 3 + ["ok"]
+        assert "400" in tickets[0]["message"]
+    finally:
+        sender.close()
+        server.stop()
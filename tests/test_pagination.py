@@ -0,0 +1,165 @@
+# pylint: disable=R0801
+"""
+This module tests the keyset (cursor) pagination of the searches,
+the trending posts, the admin listing and the recommended users
+"""
+import datetime
+import json
+from fastapi import Header
+from fastapi.exceptions import HTTPException
+
+# pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
+from control.controller_post import *
+from control.controller_admin import api_get_posts_for_admin
+from control.controller_recommended_user import api_get_recommended_users
+from control.utils.pagination import encode_cursor, decode_post_cursor
+from control.common_setup import *
+from tests.mock_functions import *
+from repository.tables.posts import *
+from repository.errors import *
+
+
+def test_cursor_pages_of_posts_by_hashtags_match_the_offset_pages():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    for _ in range(7):
+        create_post(user_1.id, hashtags=[HASHTAG_1])
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        by_offset = api_get_posts_by_hashtags(
+            hashtags=HASHTAG_1, offset=0, amount=10, user=get_user_from_token_mock()
+        )
+
+        by_cursor = []
+        cursor = ""
+        while cursor is not None:
+            page = api_get_posts_by_hashtags(
+                hashtags=HASHTAG_1,
+                offset=0,
+                amount=3,
+                cursor=cursor,
+                user=get_user_from_token_mock(),
+            )
+            assert len(page["data"]) <= 3
+            by_cursor += page["data"]
+            cursor = page["next_cursor"]
+
+        assert len(by_offset) == 7
+        assert [post.post_id for post in by_cursor] == [
+            post.post_id for post in by_offset
+        ]
+    finally:
+        delete_all()
+
+
+def test_posts_by_text_without_cursor_still_returns_a_list():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    create_post(user_1.id, content="hola mundo")
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        result = api_get_posts_by_text(
+            text="hola", offset=0, amount=10, user=get_user_from_token_mock()
+        )
+        assert isinstance(result, list) and len(result) == 1
+
+        page = api_get_posts_by_text(
+            text="hola", offset=0, amount=10, cursor="", user=get_user_from_token_mock()
+        )
+        assert len(page["data"]) == 1 and page["next_cursor"] is None
+    finally:
+        delete_all()
+
+
+def test_invalid_cursor_is_a_bad_request():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        for cursor in ["not a cursor", encode_cursor(1, 2, 3)]:
+            try:
+                api_get_posts_by_hashtags(
+                    hashtags=HASHTAG_1,
+                    offset=0,
+                    amount=10,
+                    cursor=cursor,
+                    user=get_user_from_token_mock(),
+                )
+                assert False
+            except HTTPException as error:
+                assert error.status_code == 400
+    finally:
+        delete_all()
+
+
+def test_admin_posts_paginated_with_cursor():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    for _ in range(5):
+        create_post(user_1.id)
+
+    try:
+
+        def token_is_admin_mock(_: str = Header(None)):
+            return True
+
+        first = api_get_posts_for_admin(
+            start=0, ammount=2, cursor="", is_admin=token_is_admin_mock()
+        )
+        second = api_get_posts_for_admin(
+            start=0,
+            ammount=2,
+            cursor=first["next_cursor"],
+            is_admin=token_is_admin_mock(),
+        )
+        everything = api_get_posts_for_admin(
+            start=0, ammount=10, is_admin=token_is_admin_mock()
+        )
+
+        created_at, post_id = decode_post_cursor(first["next_cursor"])
+        assert post_id == first["data"][-1].post_id
+        assert created_at == datetime.datetime.fromisoformat(
+            first["data"][-1].created_at
+        )
+        assert [post.post_id for post in first["data"] + second["data"]] == [
+            post.post_id for post in everything[:4]
+        ]
+    finally:
+        delete_all()
+
+
+def test_recommended_users_paginated_with_cursor():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    others = [
+        create_user(f"other_{number}", f"other_{number}@gmail.com", True)
+        for number in range(4)
+    ]
+    create_follow(user_1.id, others[0].id)
+    create_follow(others[0].id, others[1].id)
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            page = api_get_recommended_users(
+                offset=0, amount=1, cursor=cursor, user=get_user_from_token_mock()
+            )
+            seen += [recommended.user.id for recommended in page["data"]]
+            cursor = page["next_cursor"]
+
+        assert seen[0] == others[1].id
+        assert sorted(seen) == sorted(other.id for other in others[1:])
+    finally:
+        delete_all()
@@ -3,14 +3,22 @@
 This module tests the function api_get_statistics from the controller_post.py file
 """
 import json
-from fastapi import Header
+from fastapi import Header, HTTPException, Response
+import pytest
+from sqlalchemy import update
 
 # pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
 from control.controller_post import *
+from control.controller_like import api_create_like
+from control.controller_repost import api_create_repost
 from control.common_setup import *
 from tests.mock_functions import *
 from repository.tables.posts import *
 from repository.errors import *
+from repository.jobs.backfill_daily_stats import backfill_daily_stats
+from repository.queries import queries_posts
+
+DATE_FORMAT = "%Y-%m-%d_%H:%M:%S"
 
 
 def test_get_stadistics():
@@ -57,3 +65,307 @@ def test_get_stadistics():
         assert response.get("others_reposts_count") == 1
     finally:
         delete_all()
+
+
+def get_statistics_of(user, days_ago, series=False):
+    now = datetime.datetime.utcnow()
+    session.expire_all()
+    return api_get_statistics(
+        from_date_str=(now - datetime.timedelta(days=days_ago)).strftime(DATE_FORMAT),
+        to_date_str=now.strftime(DATE_FORMAT),
+        series=series,
+        user=json.loads(generate_user_from_db(user).json()),
+    )
+
+
+def move_statistics_of_today(days_ago):
+    today = datetime.datetime.utcnow().date()
+    session.execute(
+        update(UserDailyStats)
+        .where(UserDailyStats.day == today)
+        .values(day=today - datetime.timedelta(days=days_ago))
+    )
+    session.commit()
+
+
+def test_statistics_are_the_sum_of_the_days_in_the_range():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+
+    try:
+        # the post was made 3 days ago, the like 2 days ago
+        post_1, content_id_1 = create_post(user_1.id)
+        move_statistics_of_today(3)
+        create_like(user_2.id, content_id_1)
+        move_statistics_of_today(2)
+        three_days_ago = post_1.created_at.date() - datetime.timedelta(days=3)
+        create_post(user_1.id)
+
+        response = get_statistics_of(user_1, 7, series=True)
+        assert response == {
+            "my_posts_count": 2,
+            "my_reposts_count": 0,
+            "others_reposts_count": 0,
+            "likes_count": 1,
+            "series": [
+                {
+                    "day": three_days_ago.isoformat(),
+                    "my_posts_count": 1,
+                    "my_reposts_count": 0,
+                    "others_reposts_count": 0,
+                    "likes_count": 0,
+                },
+                {
+                    "day": (three_days_ago + datetime.timedelta(days=1)).isoformat(),
+                    "my_posts_count": 0,
+                    "my_reposts_count": 0,
+                    "others_reposts_count": 0,
+                    "likes_count": 1,
+                },
+                {
+                    "day": post_1.created_at.date().isoformat(),
+                    "my_posts_count": 1,
+                    "my_reposts_count": 0,
+                    "others_reposts_count": 0,
+                    "likes_count": 0,
+                },
+            ],
+        }
+        assert get_statistics_of(user_1, 1) == {
+            "my_posts_count": 1,
+            "my_reposts_count": 0,
+            "others_reposts_count": 0,
+            "likes_count": 0,
+        }
+    finally:
+        delete_all()
+
+
+def test_deleting_a_post_takes_it_out_of_the_statistics():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    user_1_json = json.loads(generate_user_from_db(user_1).json())
+    user_2_json = json.loads(generate_user_from_db(user_2).json())
+    create_post(user_1.id)
+    post_2, _ = create_post(user_1.id)
+    create_post(user_2.id)
+
+    try:
+        api_create_like(post_id=post_2.post_id, user=user_2_json)
+        api_create_repost(post_id=post_2.post_id, user=user_2_json)
+        assert get_statistics_of(user_1, 1)["likes_count"] == 1
+        assert get_statistics_of(user_2, 1)["my_reposts_count"] == 1
+
+        api_delete_post(post_id=post_2.post_id, user=user_1_json)
+
+        assert get_statistics_of(user_1, 1) == {
+            "my_posts_count": 1,
+            "my_reposts_count": 0,
+            "others_reposts_count": 0,
+            "likes_count": 0,
+        }
+        assert get_statistics_of(user_2, 1)["my_reposts_count"] == 0
+    finally:
+        delete_all()
+
+
+def test_a_failed_post_deletion_keeps_the_post_and_its_statistics(monkeypatch):
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    user_1_json = json.loads(generate_user_from_db(user_1).json())
+    user_2_json = json.loads(generate_user_from_db(user_2).json())
+    post, _ = create_post(user_1.id)
+
+    def fail(*_, **__):
+        raise RuntimeError("the counters could not be updated")
+
+    try:
+        api_create_like(post_id=post.post_id, user=user_2_json)
+        api_create_repost(post_id=post.post_id, user=user_2_json)
+        statistics = get_statistics_of(user_1, 1)
+
+        monkeypatch.setattr(queries_posts, "add_to_user_counters", fail)
+        with pytest.raises(HTTPException):
+            api_delete_post(post_id=post.post_id, user=user_1_json)
+
+        session.expire_all()
+        assert session.query(Post).filter_by(content_id=post.content_id).count() == 2
+        assert get_statistics_of(user_1, 1) == statistics
+        assert get_statistics_of(user_2, 1)["my_reposts_count"] == 1
+    finally:
+        delete_all()
+
+
+def test_statistics_without_posts_in_the_range_are_not_found():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+
+    try:
+        with pytest.raises(HTTPException) as error:
+            get_statistics_of(user_1, 30)
+        assert error.value.status_code == 404
+    finally:
+        delete_all()
+
+
+def test_backfill_builds_the_same_statistics_as_the_writes():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    _, content_id_1 = create_post(user_1.id)
+    _, content_id_2 = create_post(user_2.id)
+    create_like(user_2.id, content_id_1)
+    create_like(user_1.id, content_id_2)
+    create_repost(user_2.id, user_1.id, content_id_1)
+
+    try:
+        expected = [get_statistics_of(user, 1, True) for user in (user_1, user_2)]
+        session.execute(update(UserDailyStats).values(posts=5, likes_received=0))
+        session.commit()
+
+        assert backfill_daily_stats(batch_size=1) == 2
+        assert [get_statistics_of(user, 1, True) for user in (user_1, user_2)] == (
+            expected
+        )
+    finally:
+        delete_all()
+
+
+def in_a_minute():
+    return datetime.datetime.utcnow() + datetime.timedelta(minutes=1)
+
+
+def get_statistics_series_of(user, from_date, to_date, granularity):
+    response = Response()
+    session.expire_all()
+    series = api_get_statistics_series(
+        from_date_str=from_date.strftime(DATE_FORMAT),
+        to_date_str=to_date.strftime(DATE_FORMAT),
+        response=response,
+        granularity=granularity,
+        user=json.loads(generate_user_from_db(user).json()),
+    )
+    return series["buckets"], response.headers["Cache-Control"]
+
+
+def test_statistics_series_by_day_and_week_have_every_bucket_of_the_range():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+
+    try:
+        # a post 9 days ago, and a post with a like today
+        create_post(user_1.id)
+        move_statistics_of_today(9)
+        _, content_id = create_post(user_1.id)
+        create_like(user_2.id, content_id)
+        today = datetime.datetime.utcnow().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+
+        days, cache_control = get_statistics_series_of(
+            user_1,
+            today - datetime.timedelta(days=9),
+            in_a_minute(),
+            "day",
+        )
+        assert cache_control == "private, no-cache"
+        assert len(days) == 10
+        assert days[0]["start"] == (today - datetime.timedelta(days=9)).isoformat()
+        assert [day["my_posts_count"] for day in days] == [1] + [0] * 8 + [1]
+        assert [day["likes_count"] for day in days] == [0] * 9 + [1]
+
+        weeks, _ = get_statistics_series_of(
+            user_1,
+            today - datetime.timedelta(days=9),
+            in_a_minute(),
+            "week",
+        )
+        assert len(weeks) in (2, 3)
+        assert datetime.datetime.fromisoformat(weeks[0]["start"]).weekday() == 0
+        assert sum(week["my_posts_count"] for week in weeks) == 2
+        assert weeks[-1]["likes_count"] == 1
+    finally:
+        delete_all()
+
+
+def test_statistics_series_to_earlier_today_are_not_cached_until_the_bucket_ends():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+
+    try:
+        today = datetime.datetime.utcnow().replace(
+            hour=0, minute=0, second=0, microsecond=0
+        )
+        week = today - datetime.timedelta(days=today.weekday())
+
+        # today and this week are still open, even if to_date is past
+        _, cache_control = get_statistics_series_of(
+            user_1, today - datetime.timedelta(days=2), today, "day"
+        )
+        assert cache_control == "private, no-cache"
+        _, cache_control = get_statistics_series_of(
+            user_1, today - datetime.timedelta(days=2), week, "week"
+        )
+        assert cache_control == "private, no-cache"
+
+        # yesterday and the last week are closed
+        _, cache_control = get_statistics_series_of(
+            user_1,
+            today - datetime.timedelta(days=2),
+            today - datetime.timedelta(seconds=1),
+            "day",
+        )
+        assert cache_control.startswith("private, max-age=")
+        _, cache_control = get_statistics_series_of(
+            user_1,
+            week - datetime.timedelta(days=9),
+            week - datetime.timedelta(seconds=1),
+            "week",
+        )
+        assert cache_control.startswith("private, max-age=")
+    finally:
+        delete_all()
+
+
+def test_statistics_series_by_hour_counts_the_posts_of_the_range():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    post_1, content_id = create_post(user_1.id)
+    create_repost(user_2.id, user_1.id, content_id)
+
+    try:
+        hour = post_1.created_at.replace(minute=0, second=0, microsecond=0)
+        past_range = (
+            hour - datetime.timedelta(hours=3),
+            hour - datetime.timedelta(hours=1),
+        )
+        hours, cache_control = get_statistics_series_of(user_1, *past_range, "hour")
+        assert cache_control.startswith("private, max-age=")
+        assert [hour_stats["my_posts_count"] for hour_stats in hours] == [0, 0, 0]
+
+        hours, _ = get_statistics_series_of(
+            user_1,
+            hour - datetime.timedelta(hours=1),
+            in_a_minute(),
+            "hour",
+        )
+        assert hours[0]["start"] == (hour - datetime.timedelta(hours=1)).isoformat()
+        assert hours[1]["my_posts_count"] == 1
+        assert hours[1]["others_reposts_count"] == 1
+    finally:
+        delete_all()
+
+
+def test_statistics_series_with_too_many_buckets_or_unknown_granularity_fail():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    to_date = datetime.datetime.utcnow()
+
+    try:
+        with pytest.raises(HTTPException) as error:
+            get_statistics_series_of(
+                user_1, to_date - datetime.timedelta(days=365), to_date, "hour"
+            )
+        assert error.value.status_code == 400
+
+        with pytest.raises(HTTPException) as error:
+            get_statistics_series_of(user_1, to_date, to_date, "month")
+        assert error.value.status_code == 400
+    finally:
+        delete_all()
@@ -0,0 +1,260 @@
+# pylint: disable=R0801
+"""
+This module tests the async read endpoints from the controller_post_async.py file,
+they must answer exactly the same as the sync ones.
+"""
+import asyncio
+import datetime
+import json
+from fastapi import Header
+
+# pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
+from control.controller_post_async import *
+from control.controller_post import (
+    api_get_feed,
+    api_get_post_by_id,
+    api_get_posts_and_reposts_from_user_visited,
+    api_get_posts_by_hashtags,
+    api_get_posts_by_text,
+)
+from control.common_setup import *
+from repository.queries.common_setup_async import async_engine_posts
+from repository.queries.queries_timeline import timeline_store
+from tests.mock_functions import *
+
+
+def run(coroutine):
+    """
+    Runs the coroutine in a new event loop, the pooled asyncpg connections
+    belong to the loop so they are disposed before it closes.
+    """
+
+    async def run_and_dispose():
+        try:
+            return await coroutine
+        finally:
+            await async_engine_posts.dispose()
+
+    return asyncio.run(run_and_dispose())
+
+
+def tomorrow():
+    return (datetime.datetime.now() + datetime.timedelta(days=1)).strftime(
+        "%Y-%m-%d_%H:%M:%S"
+    )
+
+
+def test_get_feed_async_returns_the_same_as_the_sync_one():
+    """
+    This function tests function api_get_feed_async.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_follow(user_1.id, user_2.id)
+    _, content_id_1 = create_post(user_1.id)
+    create_post(user_2.id, hashtags=[HASHTAG_1])
+    create_repost(user_2.id, user_1.id, content_id_1)
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        result_async = run(
+            api_get_feed_async(
+                oldest_date_str=tomorrow(),
+                amount=AMOUNT_DEFAULT,
+                user=get_user_from_token_mock(),
+            )
+        )
+        result_sync = api_get_feed(
+            oldest_date_str=tomorrow(),
+            amount=AMOUNT_DEFAULT,
+            user=get_user_from_token_mock(),
+        )
+
+        assert len(result_async) == 3
+        assert result_async == result_sync
+    finally:
+        delete_all()
+
+
+def test_get_feed_async_reads_the_timeline():
+    """
+    This function tests that api_get_feed_async builds the timeline of the
+    user and reads the posts pushed into it afterwards.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_follow(user_1.id, user_2.id)
+    post_1, _ = create_post(user_2.id)
+    user = json.loads(generate_user_from_db(user_1).json())
+
+    def feed_post_ids():
+        feed = run(
+            api_get_feed_async(
+                oldest_date_str=tomorrow(), amount=AMOUNT_DEFAULT, user=user
+            )
+        )
+        return [post.post_id for post in feed]
+
+    try:
+        assert timeline_store.page(user_1.id, datetime.datetime.max, 10) is None
+        assert feed_post_ids() == [post_1.post_id]
+        assert timeline_store.page(user_1.id, datetime.datetime.max, 10) is not None
+
+        post_2, _ = create_post(user_2.id)
+        assert feed_post_ids() == [post_2.post_id, post_1.post_id]
+    finally:
+        delete_all()
+
+
+def test_get_posts_from_user_visited_async_returns_the_same_as_the_sync_one():
+    """
+    This function tests function api_get_posts_and_reposts_from_user_visited_async.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_post(user_2.id)
+    create_post(user_2.id)
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        result_async = run(
+            api_get_posts_and_reposts_from_user_visited_async(
+                user_visited_email=EMAIL_2,
+                oldest_date_str=tomorrow(),
+                amount=AMOUNT_DEFAULT,
+                only_reposts=False,
+                user=get_user_from_token_mock(),
+            )
+        )
+        result_sync = api_get_posts_and_reposts_from_user_visited(
+            user_visited_email=EMAIL_2,
+            oldest_date_str=tomorrow(),
+            amount=AMOUNT_DEFAULT,
+            only_reposts=False,
+            user=get_user_from_token_mock(),
+        )
+
+        assert len(result_async) == 2
+        assert result_async == result_sync
+    finally:
+        delete_all()
+
+
+def test_get_post_by_id_and_search_by_text_async():
+    """
+    This function tests functions api_get_post_by_id_async
+    and api_get_posts_by_text_async.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    post_1, _ = create_post(user_1.id, content="hello async world")
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        by_id = run(
+            api_get_post_by_id_async(
+                post_id=post_1.post_id, user=get_user_from_token_mock()
+            )
+        )
+        assert by_id == api_get_post_by_id(
+            post_id=post_1.post_id, user=get_user_from_token_mock()
+        )
+
+        by_text = run(
+            api_get_posts_by_text_async(
+                text="async",
+                offset=OFFSET_DEFAULT,
+                amount=AMOUNT_DEFAULT,
+                user=get_user_from_token_mock(),
+            )
+        )
+        assert [post.post_id for post in by_text] == [post_1.post_id]
+        assert by_text == api_get_posts_by_text(
+            text="async",
+            offset=OFFSET_DEFAULT,
+            amount=AMOUNT_DEFAULT,
+            user=get_user_from_token_mock(),
+        )
+    finally:
+        delete_all()
+
+
+def test_searches_async_with_cursor_return_the_same_pages_as_the_sync_ones():
+    """
+    This function tests that api_get_posts_by_hashtags_async and
+    api_get_posts_by_text_async page with the cursor as the sync ones.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    for _ in range(3):
+        create_post(user_1.id, content="hello async world", hashtags=[HASHTAG_1])
+    user = json.loads(generate_user_from_db(user_1).json())
+
+    def pages(search, **params):
+        result, cursor = [], ""
+        while cursor is not None:
+            page = search(amount=2, cursor=cursor, user=user, **params)
+            if asyncio.iscoroutine(page):
+                page = run(page)
+            result.append([post.post_id for post in page["data"]])
+            cursor = page["next_cursor"]
+        return result
+
+    try:
+        for order in ("recency", "engagement"):
+            by_hashtags = pages(
+                api_get_posts_by_hashtags_async,
+                hashtags=HASHTAG_1,
+                offset=0,
+                order=order,
+            )
+            assert [len(page) for page in by_hashtags] == [2, 1]
+            assert by_hashtags == pages(
+                api_get_posts_by_hashtags,
+                hashtags=HASHTAG_1,
+                offset=0,
+                mode="or",
+                order=order,
+            )
+
+        by_text = pages(api_get_posts_by_text_async, text="async", offset=0)
+        assert [len(page) for page in by_text] == [2, 1]
+        assert by_text == pages(api_get_posts_by_text, text="async", offset=0)
+    finally:
+        delete_all()
+
+
+def test_trending_topics_async():
+    """
+    This function tests function api_get_trending_topics_async.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    create_post(user_1.id, hashtags=["#trending", "#taller2"])
+    create_post(user_1.id, hashtags=["#taller2"])
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        response = run(
+            api_get_trending_topics_async(
+                offset=OFFSET_DEFAULT,
+                amount=2,
+                days=DAYS_DEFAULT,
+                user=get_user_from_token_mock(),
+            )
+        )
+
+        assert len(response) == 2
+        assert response[0].trending_topic == "#taller2"
+        assert response[0].number_of_posts == 2
+    finally:
+        delete_all()
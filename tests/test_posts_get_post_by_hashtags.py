@@ -3,7 +3,8 @@
 This module tests the function api_get_posts_by_hashtags from the controller_post.py file
 """
 import json
-from fastapi import Header
+import pytest
+from fastapi import Header, HTTPException
 
 # pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
 from control.controller_post import *
@@ -39,3 +40,106 @@ def test_get_posts_by_hashtags():
         assert len(result) == 2
     finally:
         delete_all()
+
+
+def search_hashtags(user, hashtags, **parameters):
+    return api_get_posts_by_hashtags(
+        hashtags=hashtags,
+        offset=OFFSET_DEFAULT,
+        amount=parameters.pop("amount", AMOUNT_DEFAULT),
+        user=json.loads(generate_user_from_db(user).json()),
+        **parameters,
+    )
+
+
+def test_hashtags_are_searched_without_case_nor_leading_numeral():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    post_1, _ = create_post(user_1.id, hashtags=["#Football"])
+    post_2, _ = create_post(user_1.id, hashtags=["football"])
+    create_post(user_1.id, hashtags=["#futbol"])
+
+    try:
+        result = search_hashtags(user_1, "FOOTBALL")
+        assert [post.post_id for post in result] == [post_2.post_id, post_1.post_id]
+    finally:
+        delete_all()
+
+
+def test_hashtags_search_by_prefix():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    post_1, _ = create_post(user_1.id, hashtags=["#Football"])
+    post_2, _ = create_post(user_1.id, hashtags=["#footy"])
+    create_post(user_1.id, hashtags=["#afoot"])
+    create_post(user_1.id, hashtags=["#fo_ot"])
+
+    try:
+        result = search_hashtags(user_1, "#foot*")
+        assert [post.post_id for post in result] == [post_2.post_id, post_1.post_id]
+        # the _ and % of the prefix are not wildcards
+        assert not search_hashtags(user_1, "#fo%*")
+        assert len(search_hashtags(user_1, "#fo_*")) == 1
+    finally:
+        delete_all()
+
+
+def test_hashtags_search_with_and_and_or_modes():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    post_1, _ = create_post(user_1.id, hashtags=[HASHTAG_1, HASHTAG_2])
+    post_2, _ = create_post(user_1.id, hashtags=[HASHTAG_1])
+    post_3, _ = create_post(user_1.id, hashtags=[HASHTAG_2])
+
+    try:
+        hashtags = f"{HASHTAG_1},{HASHTAG_2}"
+        assert [post.post_id for post in search_hashtags(user_1, hashtags)] == [
+            post_3.post_id,
+            post_2.post_id,
+            post_1.post_id,
+        ]
+        result = search_hashtags(user_1, hashtags, mode="and")
+        assert [post.post_id for post in result] == [post_1.post_id]
+        result = search_hashtags(user_1, "hashtag*,#HASHTAG_2", mode="and")
+        assert [post.post_id for post in result] == [post_3.post_id, post_1.post_id]
+    finally:
+        delete_all()
+
+
+def test_hashtags_search_ordered_by_engagement_with_cursor():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    post_1, content_id_1 = create_post(user_1.id, hashtags=[HASHTAG_1])
+    post_2, _ = create_post(user_1.id, hashtags=[HASHTAG_1])
+    post_3, content_id_3 = create_post(user_1.id, hashtags=[HASHTAG_1])
+    create_like(user_2.id, content_id_1)
+    create_repost(user_2.id, user_1.id, content_id_1)
+    create_like(user_2.id, content_id_3)
+
+    try:
+        first_page = search_hashtags(
+            user_1, HASHTAG_1, amount=2, order="engagement", cursor=""
+        )
+        assert [post.post_id for post in first_page["data"]] == [
+            post_1.post_id,
+            post_3.post_id,
+        ]
+        second_page = search_hashtags(
+            user_1,
+            HASHTAG_1,
+            amount=2,
+            order="engagement",
+            cursor=first_page["next_cursor"],
+        )
+        assert [post.post_id for post in second_page["data"]] == [post_2.post_id]
+        assert second_page["next_cursor"] is None
+    finally:
+        delete_all()
+
+
+def test_hashtags_search_with_unknown_mode_fails():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+
+    try:
+        with pytest.raises(HTTPException) as error:
+            search_hashtags(user_1, HASHTAG_1, mode="xor")
+        assert error.value.status_code == 400
+    finally:
+        delete_all()
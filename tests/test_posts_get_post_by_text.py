@@ -0,0 +1,114 @@
+# pylint: disable=R0801
+"""
+This module tests the function api_get_posts_by_text from the controller_post.py
+file (full text search, ranking and the substring fallback)
+"""
+import json
+
+# pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
+from control.controller_post import *
+from control.common_setup import *
+from tests.mock_functions import *
+from repository.tables.posts import *
+from repository.errors import *
+
+
+def search_text(user, text, **parameters):
+    return api_get_posts_by_text(
+        text=text,
+        offset=OFFSET_DEFAULT,
+        amount=parameters.pop("amount", AMOUNT_DEFAULT),
+        user=json.loads(generate_user_from_db(user).json()),
+        **parameters,
+    )
+
+
+def test_search_by_text_matches_the_words_in_any_form():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    post_1, _ = create_post(user_1.id, content="Los partidos de futbol de hoy")
+    create_post(user_1.id, content="Hoy llueve")
+
+    try:
+        result = search_text(user_1, "partido futbol")
+        assert [post.post_id for post in result] == [post_1.post_id]
+    finally:
+        delete_all()
+
+
+def test_search_by_text_ranks_the_most_relevant_first():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    post_1, _ = create_post(user_1.id, content="futbol futbol futbol, el mejor futbol")
+    post_2, _ = create_post(user_1.id, content="hoy hay futbol")
+    post_3, _ = create_post(user_1.id, content="ayer hubo futbol")
+
+    try:
+        result = search_text(user_1, "futbol")
+        # post_2 and post_3 have the same rank, the newest goes first
+        assert [post.post_id for post in result] == [
+            post_1.post_id,
+            post_3.post_id,
+            post_2.post_id,
+        ]
+    finally:
+        delete_all()
+
+
+def test_search_by_text_supports_phrases_and_excluded_words():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    post_1, _ = create_post(user_1.id, content="el gato negro duerme")
+    post_2, _ = create_post(user_1.id, content="el perro negro y el gato")
+
+    try:
+        result = search_text(user_1, '"gato negro"')
+        assert [post.post_id for post in result] == [post_1.post_id]
+        result = search_text(user_1, "gato -perro")
+        assert [post.post_id for post in result] == [post_1.post_id]
+        result = search_text(user_1, "duerme or perro")
+        assert {post.post_id for post in result} == {post_1.post_id, post_2.post_id}
+    finally:
+        delete_all()
+
+
+def test_search_by_text_falls_back_to_substrings():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    post_1, _ = create_post(user_1.id, content="el campeonato de basquet")
+    post_2, _ = create_post(user_1.id, content="100% basquet")
+    create_post(user_1.id, content="1000 goles")
+
+    try:
+        result = search_text(user_1, "peona")
+        assert [post.post_id for post in result] == [post_1.post_id]
+        # only when nothing matches the words
+        result = search_text(user_1, "basquet")
+        assert {post.post_id for post in result} == {post_1.post_id, post_2.post_id}
+        result = search_text(user_1, "basq")
+        assert {post.post_id for post in result} == {post_1.post_id, post_2.post_id}
+        # the % is not a wildcard
+        result = search_text(user_1, "100%")
+        assert [post.post_id for post in result] == [post_2.post_id]
+    finally:
+        delete_all()
+
+
+def test_search_by_text_pages_with_cursor_in_rank_order():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    post_1, _ = create_post(user_1.id, content="futbol futbol futbol")
+    post_2, _ = create_post(user_1.id, content="hay futbol")
+    post_3, _ = create_post(user_1.id, content="el futbol de ayer")
+    create_post(user_1.id, content="los xfutbolx")
+
+    try:
+        first_page = search_text(user_1, "futbol", amount=2, cursor="")
+        second_page = search_text(
+            user_1, "futbol", amount=2, cursor=first_page["next_cursor"]
+        )
+
+        # post_2 and post_3 have the same rank, the newest goes first
+        assert [post.post_id for post in first_page["data"]] == [
+            post_1.post_id,
+            post_3.post_id,
+        ]
+        assert [post.post_id for post in second_page["data"]] == [post_2.post_id]
+        assert second_page["next_cursor"] is None
+    finally:
+        delete_all()
@@ -0,0 +1,76 @@
+# pylint: disable=R0801
+"""
+This module tests the two stage queries of the posts (page of ids + hydration)
+and the viewer state
+"""
+# pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
+from tests.mock_functions import *
+from repository.queries.queries_hydration import query_posts_page, hydrate_posts
+from repository.queries.queries_viewer_state import *
+from repository.tables.posts import *
+
+
+def test_hydrate_posts_keeps_the_order_of_the_page_and_the_tuples():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    post_1, content_id_1 = create_post(user_1.id, hashtags=["#uno"], mentions=[])
+    post_2, _ = create_post(user_2.id, hashtags=[], mentions=[user_1.id])
+    create_like(user_2.id, content_id_1)
+    repost = create_repost(user_2.id, user_1.id, content_id_1)
+
+    try:
+        page = (
+            query_posts_page(user_2.id)
+            .order_by(Post.post_id.desc())
+            .filter(Post.post_id.in_([post_1.post_id, post_2.post_id, repost.post_id]))
+            .all()
+        )
+        posts = hydrate_posts(page, user_2.id)
+
+        assert [post[0].post_id for post in posts] == [
+            repost.post_id,
+            post_2.post_id,
+            post_1.post_id,
+        ]
+        reposted, mentioning, original = posts
+        assert len(original) == 11
+        assert original[2].id == user_1.id and original[3].id == user_1.id
+        assert reposted[2].id == user_2.id and reposted[3].id == user_1.id
+        assert original[4] == ["#uno"] and original[5] is None
+        assert mentioning[4] is None and mentioning[5] == [USERNAME_1]
+        assert original[6:] == (1, 1, True, True, False)
+        assert mentioning[6:] == (0, 0, False, False, False)
+    finally:
+        delete_all()
+
+
+def test_hydrate_posts_for_admin_has_no_viewer_flags():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    create_post(user_1.id)
+
+    try:
+        posts = hydrate_posts(query_posts_page().all(), None, viewer_flags=False)
+        assert len(posts) == 1 and len(posts[0]) == 8
+        assert hydrate_posts([], None) == []
+    finally:
+        delete_all()
+
+
+def test_viewer_state_is_cached_and_updated_in_place_by_the_writes():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    _, content_id = create_post(user_1.id)
+
+    try:
+        state = get_viewer_state(user_1.id, [content_id])
+        assert state[content_id] == {LIKED: False, REPOSTED: False, FAVORITED: False}
+
+        create_like(user_1.id, content_id)
+        hits = viewer_state_cache.hits
+        state = get_viewer_state(user_1.id, [content_id])
+        assert viewer_state_cache.hits == hits + 1
+        assert state[content_id] == {LIKED: True, REPOSTED: False, FAVORITED: False}
+
+        update_viewer_state(user_1.id, content_id, LIKED, False)
+        assert not get_viewer_state(user_1.id, [content_id])[content_id][LIKED]
+    finally:
+        delete_all()
@@ -0,0 +1,64 @@
+"""
+This module tests the routing of the reads to the replicas. The replica is
+the same test database under another uri (another application_name), so we
+can tell to which engine each query went.
+"""
+import os
+import pytest
+from sqlalchemy import func, insert
+from sqlalchemy.engine import make_url
+
+# pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116, W0613
+from repository.queries import common_setup
+from repository.queries.common_setup import *
+from repository.queries.queries_hydration import query_posts_page
+from tests.mock_functions import *
+
+
+def current_application_name(user_id=None):
+    query = session.query(func.current_setting("application_name"))
+    return read_from_replica(query, user_id).scalar()
+
+
+@pytest.fixture(name="replica")
+def fixture_replica(monkeypatch):
+    uri = make_url(os.environ.get("DB_URI")).update_query_dict(
+        {"application_name": "replica"}
+    )
+    engine_replica = create_pooled_engine(uri)
+    monkeypatch.setattr(common_setup, "engine_replicas", [engine_replica])
+    monkeypatch.setattr(common_setup, "_last_write_by_user", {})
+    yield engine_replica
+    session.remove()
+    engine_replica.dispose()
+
+
+def test_marked_reads_go_to_the_replica(replica):
+    assert current_application_name() == "replica"
+    statement = query_posts_page(1).statement
+    assert session().get_bind(clause=statement) is replica
+
+
+def test_unmarked_reads_and_writes_go_to_the_primary(replica):
+    unmarked_read = session.query(User).statement
+    write = insert(User).values(username=USERNAME_1)
+    assert session().get_bind(clause=unmarked_read) is engine_posts
+    assert session().get_bind(clause=write) is engine_posts
+    assert replica is not engine_posts
+
+
+def test_reads_of_a_user_that_just_wrote_go_to_the_primary(replica):
+    mark_write(7)
+    statement = query_posts_page(7).statement
+    assert session().get_bind(clause=statement) is engine_posts
+    assert current_application_name(8) == "replica"
+
+
+def test_the_read_your_writes_window_expires(replica, monkeypatch):
+    mark_write(7)
+    monkeypatch.setattr(common_setup, "READ_YOUR_WRITES_SECONDS", 0)
+    assert current_application_name(7) == "replica"
+
+
+def test_without_replicas_everything_goes_to_the_primary():
+    assert current_application_name() != "replica"
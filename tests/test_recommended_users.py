@@ -0,0 +1,219 @@
+"""
+This module tests the recommended users precomputed by the recommended
+users job (repository/jobs/recommend_users.py)
+"""
+import json
+from fastapi import Header
+
+# pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
+from control.controller_recommended_user import (
+    api_get_recommended_users,
+    api_invalidate_recommended_users,
+)
+from control.controller_admin import get_recommended_users_cache_health
+from control.common_setup import *
+from tests.mock_functions import *
+from repository.tables.posts import *
+from repository.jobs.recommend_users import recommend_users
+from repository.queries import queries_get
+from repository.cache import RankingCache
+
+
+def create_users_to_recommend():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    others = [
+        create_user(f"other_{number}", f"other_{number}@gmail.com", True)
+        for number in range(4)
+    ]
+    create_follow(user_1.id, others[0].id)
+    create_follow(others[0].id, others[1].id)
+    create_interest(user_1.id, HASHTAG_1)
+    create_post(others[2].id, hashtags=[HASHTAG_1])
+    return user_1, others
+
+
+def test_recommended_users_read_from_the_job_match_the_live_ones():
+    user_1, others = create_users_to_recommend()
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        live = api_get_recommended_users(
+            offset=0, amount=10, user=get_user_from_token_mock()
+        )
+        assert recommend_users() == 5
+        assert session.query(RecommendedUserRow).filter_by(user_id=user_1.id).count()
+        precomputed = api_get_recommended_users(
+            offset=0, amount=10, user=get_user_from_token_mock()
+        )
+
+        assert precomputed == live
+        assert [recommended.user.id for recommended in precomputed[:2]] == [
+            others[1].id,
+            others[2].id,
+        ]
+        assert precomputed[0].mutual_friends == 1
+        assert precomputed[1].posts_that_match_my_interests == 1
+
+        page = api_get_recommended_users(
+            offset=0, amount=2, cursor="", user=get_user_from_token_mock()
+        )
+        next_page = api_get_recommended_users(
+            offset=0,
+            amount=2,
+            cursor=page["next_cursor"],
+            user=get_user_from_token_mock(),
+        )
+        assert page["data"] + next_page["data"] == live
+
+        # followed after the job ran, it's filtered out when read
+        create_follow(user_1.id, others[1].id)
+        recommended = api_get_recommended_users(
+            offset=0, amount=10, user=get_user_from_token_mock()
+        )
+        assert others[1].id not in [user.user.id for user in recommended]
+    finally:
+        delete_all()
+
+
+def test_recommend_users_only_recomputes_the_users_that_changed():
+    user_1, others = create_users_to_recommend()
+
+    try:
+        assert recommend_users(batch_size=2) == 5
+        assert recommend_users(batch_size=2) == 0
+
+        create_interest(user_1.id, HASHTAG_2)
+        create_follow(others[3].id, others[2].id)
+        assert recommend_users(batch_size=2) == 2
+        assert recommend_users(batch_size=2) == 0
+
+        assert recommend_users(batch_size=2, max_age=0) == 5
+    finally:
+        delete_all()
+
+
+def test_sparse_scorer_recommends_the_same_users_as_the_query():
+    user_1, others = create_users_to_recommend()
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_follow(user_2.id, others[0].id)
+    create_follow(user_2.id, others[2].id)
+    create_follow(others[2].id, others[1].id)
+    create_follow(others[2].id, others[3].id)
+    create_interest(user_2.id, HASHTAG_1)
+    create_interest(user_2.id, HASHTAG_2)
+    _, content_id = create_post(others[1].id, hashtags=[HASHTAG_1, HASHTAG_2])
+    create_repost(others[3].id, others[1].id, content_id)
+    create_like(others[3].id, content_id)
+    create_like(user_1.id, content_id)
+
+    def recommended_rows():
+        return [
+            (
+                row.user_id,
+                row.recommended_id,
+                row.mutual_friends,
+                row.location_shared,
+                row.interest_posts,
+                row.interest_likes,
+            )
+            for row in session.query(RecommendedUserRow).order_by(
+                RecommendedUserRow.user_id, RecommendedUserRow.recommended_id
+            )
+        ]
+
+    try:
+        assert recommend_users(scorer="sql") == 6
+        by_query = recommended_rows()
+        assert (user_2.id, others[1].id, 2, 1, 4, 0) in by_query
+        assert (user_2.id, others[3].id, 1, 1, 0, 2) in by_query
+        assert recommend_users(max_age=0, scorer="sparse") == 6
+        assert recommended_rows() == by_query
+    finally:
+        delete_all()
+
+
+def test_live_recommended_users_are_chosen_from_the_candidates(monkeypatch):
+    user_1, others = create_users_to_recommend()
+    elsewhere = create_user(USERNAME_2, EMAIL_2, True)
+    newest_neighbour = create_user("neighbour", "neighbour@gmail.com", True)
+    for user in others + [elsewhere]:
+        user.location = "Elsewhere"
+    session.commit()
+
+    try:
+
+        def recommended_ids():
+            return [
+                recommended.user.id
+                for recommended in api_get_recommended_users(
+                    offset=0,
+                    amount=10,
+                    user=json.loads(generate_user_from_db(user_1).json()),
+                )
+            ]
+
+        # of my followings, of my interests and of my location
+        assert recommended_ids() == [others[1].id, newest_neighbour.id, others[2].id]
+
+        neighbour = create_user("neighbour_2", "neighbour_2@gmail.com", True)
+        queries_get.invalidate_recommended_users(user_1.id)
+        monkeypatch.setattr(queries_get, "RECOMMENDED_CANDIDATES_PER_SOURCE", 1)
+        assert recommended_ids() == [others[1].id, neighbour.id, others[2].id]
+    finally:
+        delete_all()
+
+
+def test_recommended_users_pages_are_sliced_from_the_cache():
+    user_1, others = create_users_to_recommend()
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        def recommended(offset=0, amount=10):
+            return api_get_recommended_users(
+                offset=offset, amount=amount, user=get_user_from_token_mock()
+            )
+
+        status = get_recommended_users_cache_health()
+        first = recommended()
+        assert get_recommended_users_cache_health()["misses"] == status["misses"] + 1
+        assert recommended(offset=1, amount=2) == first[1:3]
+        page = api_get_recommended_users(
+            offset=0, amount=2, cursor="", user=get_user_from_token_mock()
+        )
+        assert page["data"] == first[:2]
+        assert get_recommended_users_cache_health()["hits"] == status["hits"] + 2
+
+        # followed since it was cached, it's filtered out
+        create_follow(user_1.id, others[1].id)
+        assert [user.user.id for user in recommended()] == [
+            user.user.id for user in first[1:]
+        ]
+
+        # the counts are the cached ones until the hook drops them
+        create_follow(others[0].id, others[3].id)
+        assert recommended()[-1].user.id == others[3].id
+        api_invalidate_recommended_users(user=get_user_from_token_mock())
+        assert recommended()[0].user.id == others[3].id
+        assert recommended()[0].mutual_friends == 1
+    finally:
+        delete_all()
+
+
+def test_ranking_cache_is_capped_by_its_memory_budget():
+    cache = RankingCache(2, 10, 0, 60)
+    cache.set(1, [(3, 1), (2, 2)], True)
+    cache.set(2, [(1, 3)], False)
+    assert cache.get(1) is None
+    assert cache.get(2) == ([(1, 3)], False)
+
+    cache = RankingCache(2, 10, 3 * cache.ranking_bytes, 60)
+    for key in range(5):
+        cache.set(key, [(key, key)] * 20, True)
+    assert cache.status()["entries"] == 3
+    assert cache.get(4) == ([(4, 4)] * 10, False)
@@ -0,0 +1,150 @@
+# pylint: disable=R0801
+"""
+This module tests the home timelines of the feed (fan-out on write), with
+the in-process store and with the Redis one (on tests/redis_stand_in.py)
+"""
+import datetime
+import json
+import pytest
+from fastapi import Header
+
+# pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116, W0621
+from control.controller_post import *
+from control.common_setup import *
+from tests.mock_functions import *
+from tests.redis_stand_in import RedisStandIn
+from repository.queries import queries_timeline
+from repository.queries.queries_posts import delete_post
+from repository.timeline import TimelineEntry, RedisTimelineStore
+
+NOW = datetime.datetime(2026, 10, 18, 12, 0, 0)
+
+
+def feed_post_ids(user, amount=10):
+    def get_user_from_token_mock(_: str = Header(None)):
+        return json.loads(generate_user_from_db(user).json())
+
+    posts = api_get_feed(
+        (datetime.datetime.utcnow() + datetime.timedelta(minutes=1)).strftime(
+            "%Y-%m-%d_%H:%M:%S"
+        ),
+        amount,
+        user=get_user_from_token_mock(),
+    )
+    return [post.post_id for post in posts]
+
+
+def test_posts_made_after_the_timeline_is_built_are_pushed_to_the_followers():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_follow(user_1.id, user_2.id)
+    post_1, _ = create_post(user_2.id)
+
+    try:
+        assert feed_post_ids(user_1) == [post_1.post_id]
+
+        post_2, content_id_2 = create_post(user_2.id)
+        repost = create_repost(user_1.id, user_2.id, content_id_2)
+        timeline = timeline_store.page(user_1.id, datetime.datetime.max, 10)
+
+        assert [entry.post_id for entry in timeline] == [
+            repost.post_id,
+            post_2.post_id,
+            post_1.post_id,
+        ]
+        assert feed_post_ids(user_1) == [
+            repost.post_id,
+            post_2.post_id,
+            post_1.post_id,
+        ]
+    finally:
+        delete_all()
+
+
+def test_deleted_posts_are_removed_from_the_timelines():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_follow(user_1.id, user_2.id)
+    post_1, _ = create_post(user_2.id)
+    post_2, _ = create_post(user_2.id)
+
+    try:
+        assert feed_post_ids(user_1) == [post_2.post_id, post_1.post_id]
+
+        delete_post(post_2.post_id, user_2.id)
+        timeline = timeline_store.page(user_1.id, datetime.datetime.max, 10)
+
+        assert [entry.post_id for entry in timeline] == [post_1.post_id]
+        assert feed_post_ids(user_1) == [post_1.post_id]
+    finally:
+        delete_all()
+
+
+def test_accounts_with_many_followers_are_read_on_the_feed(monkeypatch):
+    monkeypatch.setattr(queries_timeline, "TIMELINE_FAN_OUT_MAX_FOLLOWERS", 1)
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    user_3 = create_user("username3", "user3@gmail.com", True)
+    create_follow(user_1.id, user_2.id)
+    create_follow(user_3.id, user_2.id)
+
+    try:
+        assert not feed_post_ids(user_1)
+
+        post, _ = create_post(user_2.id)
+
+        assert timeline_store.page(user_1.id, datetime.datetime.max, 10) == []
+        assert feed_post_ids(user_1) == [post.post_id]
+    finally:
+        delete_all()
+
+
+@pytest.fixture(name="redis_store")
+def fixture_redis_store():
+    server = RedisStandIn()
+    store = RedisTimelineStore(server.start(), max_entries=3, ttl_seconds=60)
+    yield store
+    server.shutdown()
+    server.server_close()
+
+
+def test_redis_store_keeps_the_newest_entries_of_the_built_timelines(redis_store):
+    entries = [
+        TimelineEntry(NOW + datetime.timedelta(minutes=minute), minute)
+        for minute in range(5)
+    ]
+    assert redis_store.page(1, NOW, 10) is None
+
+    redis_store.build(1, entries[:2])
+    redis_store.push([1, 2], entries[2])
+    redis_store.push([1], entries[3])
+    redis_store.push([1], entries[4])
+    redis_store.remove([1], 3)
+
+    assert redis_store.page(1, datetime.datetime.max, 10) == [
+        entries[4],
+        entries[2],
+    ]
+    assert redis_store.page(1, entries[4].created_at, 1) == [entries[2]]
+    # a push doesn't build the timeline
+    assert redis_store.page(2, datetime.datetime.max, 10) is None
+
+    redis_store.clear()
+    assert redis_store.page(1, datetime.datetime.max, 10) is None
+
+
+def test_redis_store_pushes_expire_only_the_timelines_they_create():
+    server = RedisStandIn()
+    store = RedisTimelineStore(server.start(), max_entries=3, ttl_seconds=60)
+    try:
+        store.build(1, [])
+        built_expires_at = server.expires_at["timeline:1"]
+        store.push([1, 2], TimelineEntry(NOW, 1))
+
+        # a built timeline keeps the expiry of its build
+        assert server.expires_at["timeline:1"] == built_expires_at
+        assert server.run(["TTL", "timeline:2"]) == 60
+        assert server.run(["TTL", "timeline:3"]) == -2
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -2,14 +2,26 @@
 This module tests the functions from the controller_trending_topic.py file
 """
 import json
-from fastapi import Header
+import threading
+import pytest
+from fastapi import Header, HTTPException
+from sqlalchemy import func, select
 
 # pylint: disable=C0114, W0401, W0614, E0401, E0602, C0116
 from control.controller_trending_topic import *
+from control.controller_repost import api_create_repost, api_delete_respost_from_post
 from control.common_setup import *
 from tests.mock_functions import *
+from tests import mock_functions
 from repository.tables.posts import *
 from repository.errors import *
+from repository.queries.queries_posts import delete_post
+from repository.queries import queries_trending_topic
+from repository.trending import TrendingCounters, ApproximateTrendingCounters
+from repository.jobs.trending_snapshots import (
+    SNAPSHOTS_LOCK_KEY,
+    snapshot_trending_topics,
+)
 
 
 def test_trending_topics():
@@ -75,3 +87,548 @@ def test_trending_topics_user_private():
 
     finally:
         delete_all()
+
+
+def test_trending_topics_are_updated_with_posts_reposts_and_deletes():
+    """
+    This function tests if the trending topics (once the counters are
+    built) count the new posts and reposts and stop counting the deleted ones.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_post(user_1.id, hashtags=["#trending"])
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        def trending_topics():
+            return api_get_trending_topics(
+                offset=OFFSET_DEFAULT,
+                amount=AMOUNT_DEFAULT,
+                days=DAYS_DEFAULT,
+                user=get_user_from_token_mock(),
+            )
+
+        response = trending_topics()
+        assert [topic.trending_topic for topic in response] == ["#trending"]
+
+        post, content_id = create_post(user_2.id, hashtags=["#taller2"])
+        create_repost(user_1.id, user_2.id, content_id)
+        create_repost(user_2.id, user_2.id, create_post(user_1.id, [])[1])
+
+        response = trending_topics()
+        assert len(response) == 2
+        assert response[0].trending_topic == "#taller2"
+        assert response[0].number_of_posts == 2
+        assert response[0].score is None
+        assert response[1].trending_topic == "#trending"
+        assert response[1].number_of_posts == 1
+
+        delete_post(post.post_id, user_2.id)
+
+        response = trending_topics()
+        assert [topic.trending_topic for topic in response] == ["#trending"]
+
+    finally:
+        delete_all()
+
+
+def test_unreposting_a_post_takes_its_use_out_of_the_trending_topics():
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    post, _ = create_post(user_2.id, hashtags=["#taller2"])
+    user_1_json = json.loads(generate_user_from_db(user_1).json())
+
+    try:
+
+        def uses_of_taller2():
+            response = api_get_trending_topics(
+                offset=OFFSET_DEFAULT,
+                amount=AMOUNT_DEFAULT,
+                days=DAYS_DEFAULT,
+                user=user_1_json,
+            )
+            return [topic.number_of_posts for topic in response]
+
+        assert uses_of_taller2() == [1]
+        api_create_repost(post_id=post.post_id, user=user_1_json)
+        assert uses_of_taller2() == [2]
+
+        api_delete_respost_from_post(post_id=post.post_id, user=user_1_json)
+        assert uses_of_taller2() == [1]
+    finally:
+        delete_all()
+
+
+def test_trending_topics_keep_the_posts_made_while_the_counters_are_rebuilt(
+    monkeypatch,
+):
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    create_post(user_1.id, hashtags=["#trending"])
+    read_the_database = threading.Event()
+    posted = threading.Event()
+
+    def slow_build():
+        built = queries_trending_topic.build_trending_counters()
+        read_the_database.set()
+        posted.wait(10)
+        return built
+
+    try:
+        trending_counters.get()
+        monkeypatch.setattr(trending_counters, "build", slow_build)
+        rebuild = threading.Thread(target=trending_counters.rebuild)
+        rebuild.start()
+        read_the_database.wait(10)
+
+        create_post(user_1.id, hashtags=["#trending", "#taller2"])
+        posted.set()
+        rebuild.join()
+
+        response = api_get_trending_topics(
+            offset=OFFSET_DEFAULT,
+            amount=AMOUNT_DEFAULT,
+            days=DAYS_DEFAULT,
+            user=json.loads(generate_user_from_db(user_1).json()),
+        )
+        assert [
+            (topic.trending_topic, topic.number_of_posts) for topic in response
+        ] == [
+            ("#trending", 2),
+            ("#taller2", 1),
+        ]
+    finally:
+        posted.set()
+        delete_all()
+
+
+def test_trending_topics_count_once_the_posts_committed_before_a_rebuild_reads(
+    monkeypatch,
+):
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    create_post(user_1.id, hashtags=["#trending"])
+    committed = threading.Event()
+    read_the_database = threading.Event()
+    added = threading.Event()
+
+    def slow_build():
+        committed.wait(10)
+        built = queries_trending_topic.build_trending_counters()
+        read_the_database.set()
+        added.wait(10)
+        return built
+
+    def fan_out_post_once_it_was_read(post):
+        # between the commit of the post and its add_to_trending
+        committed.set()
+        read_the_database.wait(10)
+        fan_out_post(post)
+
+    try:
+        trending_counters.get()
+        monkeypatch.setattr(trending_counters, "build", slow_build)
+        monkeypatch.setattr(
+            mock_functions, "fan_out_post", fan_out_post_once_it_was_read
+        )
+        rebuild = threading.Thread(target=trending_counters.rebuild)
+        rebuild.start()
+
+        create_post(user_1.id, hashtags=["#trending", "#taller2"])
+        added.set()
+        rebuild.join()
+
+        response = api_get_trending_topics(
+            offset=OFFSET_DEFAULT,
+            amount=AMOUNT_DEFAULT,
+            days=DAYS_DEFAULT,
+            user=json.loads(generate_user_from_db(user_1).json()),
+        )
+        assert [
+            (topic.trending_topic, topic.number_of_posts) for topic in response
+        ] == [
+            ("#trending", 2),
+            ("#taller2", 1),
+        ]
+    finally:
+        committed.set()
+        read_the_database.set()
+        added.set()
+        delete_all()
+
+
+def test_trending_topics_decayed_score():
+    """
+    This function tests if the trending topics by decayed score put the
+    recent uses first.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    _, content_id_1 = create_post(user_1.id, hashtags=["#old"])
+    _, content_id_2 = create_post(user_2.id, hashtags=["#old"])
+    create_post(user_2.id, hashtags=["#new"])
+    two_days_ago = datetime.datetime.utcnow() - datetime.timedelta(days=2)
+    session.query(Hashtag).filter(
+        Hashtag.content_id.in_([content_id_1, content_id_2])
+    ).update({Hashtag.created_at: two_days_ago}, synchronize_session=False)
+    session.commit()
+    trending_counters.clear()
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        response = api_get_trending_topics(
+            offset=OFFSET_DEFAULT,
+            amount=AMOUNT_DEFAULT,
+            days=DAYS_DEFAULT,
+            user=get_user_from_token_mock(),
+        )
+        assert [topic.trending_topic for topic in response] == ["#old", "#new"]
+
+        response = api_get_trending_topics(
+            offset=OFFSET_DEFAULT,
+            amount=AMOUNT_DEFAULT,
+            days=DAYS_DEFAULT,
+            score="decayed",
+            user=get_user_from_token_mock(),
+        )
+        assert [topic.trending_topic for topic in response] == ["#new", "#old"]
+        assert [topic.number_of_posts for topic in response] == [1, 2]
+        # two uses of two days ago (two half lives) weigh as half of a use
+        assert 0.9 < response[0].score <= 1
+        assert 0.4 < response[1].score <= 0.5
+
+    finally:
+        delete_all()
+
+
+def test_trending_topics_of_more_days_than_the_counters():
+    """
+    This function tests if the trending topics of more days than the
+    counters keep are counted on the database.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    create_post(user_1.id, hashtags=["#trending", "#taller2"])
+    create_post(user_1.id, hashtags=["#taller2"])
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        response = api_get_trending_topics(
+            offset=OFFSET_DEFAULT,
+            amount=AMOUNT_DEFAULT,
+            days=TRENDING_MAX_DAYS + 1,
+            user=get_user_from_token_mock(),
+        )
+        assert [topic.trending_topic for topic in response] == ["#taller2", "#trending"]
+        assert [topic.number_of_posts for topic in response] == [2, 1]
+
+    finally:
+        delete_all()
+
+
+def test_trending_topics_invalid_score():
+    """
+    This function tests if an unknown score (or a decayed one of more days
+    than the counters keep) is a bad request.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        for days, score in [
+            (DAYS_DEFAULT, "likes"),
+            (TRENDING_MAX_DAYS + 1, "decayed"),
+        ]:
+            with pytest.raises(HTTPException) as error:
+                api_get_trending_topics(
+                    offset=OFFSET_DEFAULT,
+                    amount=AMOUNT_DEFAULT,
+                    days=days,
+                    score=score,
+                    user=get_user_from_token_mock(),
+                )
+            assert error.value.status_code == 400
+
+    finally:
+        delete_all()
+
+
+def test_trending_topics_approximate_backend(monkeypatch):
+    """
+    This function tests if the approximate counters count the trending
+    topics (exactly, with few hashtags) and are updated with the new posts.
+    """
+    monkeypatch.setattr(queries_trending_topic, "TRENDING_BACKEND", "approximate")
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    create_post(user_1.id, hashtags=["#trending", "#topic", "#taller2"])
+    create_post(user_2.id, hashtags=["#trending", "#taller2"])
+    trending_counters.clear()
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        def trending_topics():
+            response = api_get_trending_topics(
+                offset=OFFSET_DEFAULT,
+                amount=AMOUNT_DEFAULT,
+                days=DAYS_DEFAULT,
+                user=get_user_from_token_mock(),
+            )
+            return [(topic.trending_topic, topic.number_of_posts) for topic in response]
+
+        assert isinstance(trending_counters.get(), ApproximateTrendingCounters)
+        assert trending_topics() == [
+            ("#taller2", 2),
+            ("#trending", 2),
+            ("#topic", 1),
+        ]
+
+        create_post(user_2.id, hashtags=["#taller2", "#hi!"])
+
+        assert trending_topics() == [
+            ("#taller2", 3),
+            ("#trending", 2),
+            ("#hi!", 1),
+            ("#topic", 1),
+        ]
+
+    finally:
+        delete_all()
+
+
+def test_approximate_trending_counters_can_be_merged():
+    """
+    This function tests if the approximate counters of two workers, merged,
+    count the same as the exact counters of all the uses.
+    """
+    now = datetime.datetime.utcnow()
+    exact = TrendingCounters(7, 24, now=now)
+    workers = [ApproximateTrendingCounters(7, 24, 1024, 4, 8, now=now) for _ in "ab"]
+    for number in range(200):
+        hashtag = f"#hashtag{number % 7 * number % 11}"
+        moment = now - datetime.timedelta(hours=number % 100)
+        exact.add(hashtag, moment, now=now)
+        workers[number % 2].add(hashtag, moment, now=now)
+
+    workers[0].merge(workers[1])
+
+    for days in (1, 7):
+        assert workers[0].top(days, 0, 5, now=now) == exact.top(days, 0, 5, now=now)
+    with pytest.raises(ValueError):
+        workers[0].merge(ApproximateTrendingCounters(7, 24, 512, 4, 8, now=now))
+
+
+def test_trending_topics_are_served_from_the_snapshot():
+    """
+    This function tests if the trending topics of the standard windows are
+    read from the snapshot of the job, with the time it was computed, and
+    the ones of other windows are computed live.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    create_post(user_1.id, hashtags=["#trending", "#taller2"])
+    create_post(user_1.id, hashtags=["#taller2"])
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        before = datetime.datetime.utcnow()
+        assert snapshot_trending_topics(every_seconds=60)
+        # it's fresh, the next run of any worker doesn't compute it again
+        assert not snapshot_trending_topics(every_seconds=60)
+        create_post(user_1.id, hashtags=["#new"])
+
+        response = api_get_trending_topics(
+            offset=OFFSET_DEFAULT,
+            amount=AMOUNT_DEFAULT,
+            days=DAYS_DEFAULT,
+            user=get_user_from_token_mock(),
+        )
+        assert [topic.trending_topic for topic in response] == ["#taller2", "#trending"]
+        assert [topic.number_of_posts for topic in response] == [2, 1]
+        assert before <= response[0].computed_at < datetime.datetime.utcnow()
+
+        response = api_get_trending_topics(
+            offset=1,
+            amount=1,
+            days=1,
+            score="decayed",
+            user=get_user_from_token_mock(),
+        )
+        assert [topic.trending_topic for topic in response] == ["#trending"]
+        assert 0.9 < response[0].score <= 1
+
+        response = api_get_trending_topics(
+            offset=OFFSET_DEFAULT,
+            amount=AMOUNT_DEFAULT,
+            days=3,
+            user=get_user_from_token_mock(),
+        )
+        assert "#new" in [topic.trending_topic for topic in response]
+        assert response[0].computed_at > before
+
+    finally:
+        delete_all()
+
+
+def test_trending_topics_old_snapshots_are_not_served():
+    """
+    This function tests if the trending topics are computed live when the
+    snapshot is older than TRENDING_SNAPSHOT_MAX_AGE, and if the job does
+    nothing while another worker holds its lock.
+    """
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    create_post(user_1.id, hashtags=["#taller2"])
+
+    try:
+
+        def get_user_from_token_mock(_: str = Header(None)):
+            return json.loads(generate_user_from_db(user_1).json())
+
+        assert snapshot_trending_topics()
+        create_post(user_1.id, hashtags=["#new"])
+        session.query(TrendingSnapshot).update(
+            {
+                TrendingSnapshot.computed_at: datetime.datetime.utcnow()
+                - datetime.timedelta(seconds=TRENDING_SNAPSHOT_MAX_AGE + 1)
+            }
+        )
+        session.commit()
+
+        response = api_get_trending_topics(
+            offset=OFFSET_DEFAULT,
+            amount=AMOUNT_DEFAULT,
+            days=DAYS_DEFAULT,
+            user=get_user_from_token_mock(),
+        )
+        assert "#new" in [topic.trending_topic for topic in response]
+
+        with engine_posts.connect() as other_worker:
+            other_worker.execute(
+                select(func.pg_advisory_lock(SNAPSHOTS_LOCK_KEY))
+            ).scalar()
+            assert not snapshot_trending_topics()
+            other_worker.execute(
+                select(func.pg_advisory_unlock(SNAPSHOTS_LOCK_KEY))
+            ).scalar()
+
+    finally:
+        delete_all()
+
+
+def test_trending_topics_by_location(monkeypatch):
+    """
+    This function tests if the trending topics of a location count the
+    posts and reposts made by its users, from the counters of the hot
+    locations and of the ones built when they are read.
+    """
+    monkeypatch.setattr(queries_trending_topic, "TRENDING_HOT_LOCATIONS", 1)
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    user_1.location = "Buenos Aires"
+    user_2.location = "Cordoba"
+    session.commit()
+    post, _ = create_post(user_1.id, hashtags=["#mate", "#taller2"])
+    create_post(user_1.id, hashtags=["#mate"])
+    create_post(user_2.id, hashtags=["#fernet", "#taller2"])
+    location_counters.clear()
+
+    try:
+
+        def trending_topics_of(location, days=DAYS_DEFAULT):
+            response = api_get_trending_topics(
+                offset=OFFSET_DEFAULT,
+                amount=AMOUNT_DEFAULT,
+                days=days,
+                location=location,
+                user=json.loads(generate_user_from_db(user_1).json()),
+            )
+            return [(topic.trending_topic, topic.number_of_posts) for topic in response]
+
+        assert trending_topics_of("Buenos Aires") == [("#mate", 2), ("#taller2", 1)]
+        assert trending_topics_of("Cordoba") == [("#fernet", 1), ("#taller2", 1)]
+        assert trending_topics_of("Rosario") == []
+        assert list(location_counters.current().hot) == ["Buenos Aires"]
+        assert location_counters.current().current("Cordoba") is not None
+
+        create_post(user_2.id, hashtags=["#fernet"])
+        create_repost(user_2.id, user_1.id, post.content_id)
+
+        assert trending_topics_of("Buenos Aires") == [("#mate", 2), ("#taller2", 1)]
+        assert trending_topics_of("Cordoba") == [
+            ("#fernet", 2),
+            ("#taller2", 2),
+            ("#mate", 1),
+        ]
+        assert sorted(trending_topics_of("Cordoba", TRENDING_MAX_DAYS + 1)) == [
+            ("#fernet", 2),
+            ("#mate", 1),
+            ("#taller2", 2),
+        ]
+
+    finally:
+        delete_all()
+
+
+def test_trending_topics_of_a_location_keep_the_posts_made_while_they_are_built(
+    monkeypatch,
+):
+    monkeypatch.setattr(queries_trending_topic, "TRENDING_HOT_LOCATIONS", 1)
+    user_1 = create_user(USERNAME_1, EMAIL_1, True)
+    user_2 = create_user(USERNAME_2, EMAIL_2, True)
+    user_1.location = "Buenos Aires"
+    user_2.location = "Cordoba"
+    session.commit()
+    create_post(user_1.id, hashtags=["#mate"])
+    create_post(user_1.id, hashtags=["#mate"])
+    create_post(user_2.id, hashtags=["#fernet"])
+    location_counters.clear()
+    read_the_database = threading.Event()
+    posted = threading.Event()
+    real_build = queries_trending_topic.build_counters_of_location
+
+    def slow_build(location):
+        built = real_build(location)
+        read_the_database.set()
+        posted.wait(10)
+        return built
+
+    try:
+        monkeypatch.setattr(
+            queries_trending_topic, "build_counters_of_location", slow_build
+        )
+        assert list(location_counters.get().hot) == ["Buenos Aires"]
+        build = threading.Thread(target=location_counters.get().get, args=["Cordoba"])
+        build.start()
+        read_the_database.wait(10)
+
+        create_post(user_2.id, hashtags=["#fernet", "#asado"])
+        posted.set()
+        build.join()
+
+        response = api_get_trending_topics(
+            offset=OFFSET_DEFAULT,
+            amount=AMOUNT_DEFAULT,
+            days=DAYS_DEFAULT,
+            location="Cordoba",
+            user=json.loads(generate_user_from_db(user_1).json()),
+        )
+        assert [
+            (topic.trending_topic, topic.number_of_posts) for topic in response
+        ] == [("#fernet", 2), ("#asado", 1)]
+    finally:
+        posted.set()
+        delete_all()